@@ -0,0 +1,6 @@
+"""ASGI config for Smart Parking System (required for the /api/stream/ SSE feed)."""
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+application = get_asgi_application()
@@ -4,6 +4,7 @@ Django settings for Smart Car Parking Monitoring & Alert System.
 
 import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -33,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "parking.metrics.MetricsMiddleware",
+    "parking.instrumentation.RequestTimingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -41,6 +44,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "parking.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -62,6 +66,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
 
 # Database configuration
 # Set USE_SQLITE=true in .env for a zero-config local setup (no PostgreSQL needed)
@@ -113,6 +118,9 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # CORS - Allow all origins in development
 CORS_ALLOW_ALL_ORIGINS = True
+# Conditional polling: the frontend reads ETag and sends If-None-Match
+CORS_EXPOSE_HEADERS = ["ETag"]
+CORS_ALLOW_HEADERS = (*default_headers, "if-none-match", "last-event-id")
 
 # Django REST Framework
 REST_FRAMEWORK = {
@@ -124,3 +132,118 @@ REST_FRAMEWORK = {
         "rest_framework.renderers.BrowsableAPIRenderer",
     ],
 }
+
+# Telemetry downsampling & retention (see parking/rollups.py)
+# Days to keep raw samples and each rollup tier; `manage.py compact_telemetry`
+# deletes anything older.
+TELEMETRY_RETENTION_DAYS = {
+    "raw": int(os.environ.get("TELEMETRY_RAW_RETENTION_DAYS", "30")),
+    "1m": int(os.environ.get("TELEMETRY_1M_RETENTION_DAYS", "7")),
+    "15m": int(os.environ.get("TELEMETRY_15M_RETENTION_DAYS", "90")),
+    "1h": int(os.environ.get("TELEMETRY_1H_RETENTION_DAYS", "730")),
+}
+# Nominal seconds between device samples, used for the energy (Wh) estimate
+TELEMETRY_SAMPLE_INTERVAL_SECONDS = int(
+    os.environ.get("TELEMETRY_SAMPLE_INTERVAL_SECONDS", "300")
+)
+
+# Time-series partitioning on PostgreSQL (see parking/partitions.py)
+# "daily", "monthly", or empty for plain tables. Ignored on SQLite.
+TIMESERIES_PARTITIONING = os.environ.get("TIMESERIES_PARTITIONING", "")
+# Days of future partitions `manage.py manage_partitions` keeps created
+TIMESERIES_PARTITION_PREMAKE_DAYS = int(
+    os.environ.get("TIMESERIES_PARTITION_PREMAKE_DAYS", "7")
+)
+# Days to keep parking logs (0 = keep forever)
+PARKING_LOG_RETENTION_DAYS = int(os.environ.get("PARKING_LOG_RETENTION_DAYS", "0"))
+# Days to keep acknowledged alerts, by acknowledged_at (0 = keep forever)
+ACKNOWLEDGED_ALERT_RETENTION_DAYS = int(
+    os.environ.get("ACKNOWLEDGED_ALERT_RETENTION_DAYS", "90")
+)
+
+# Seconds an ingest worker trusts its in-process topology snapshot before
+# re-checking the shared version (see parking/topology.py). Bounds how long
+# an admin edit takes to reach every worker.
+TOPOLOGY_CACHE_TTL_SECONDS = float(os.environ.get("TOPOLOGY_CACHE_TTL_SECONDS", "5"))
+
+# Cache backend for the dashboard/zone response cache (see parking/watermarks.py).
+# The default locmem cache is per-process; point CACHE_BACKEND at a shared
+# backend (file, database, Redis) when running several workers. The profiling
+# rate limit (PROFILE_RATE_LIMIT) is counted in it too, and only spans workers
+# that share it.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "smart-parking"),
+    }
+}
+# Upper bound on how long a live dashboard/zone response is served after a
+# write the cache was not told about (0 disables the response cache). Closed
+# past dates are cached until their data changes.
+RESPONSE_CACHE_TTL_SECONDS = int(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "60"))
+
+# Live change feed, GET /api/stream/ (see parking/stream.py). The in-process
+# broker only reaches streams served by the same ASGI process.
+STREAM_BROKER = os.environ.get("STREAM_BROKER", "parking.stream.InProcessBroker")
+# Events kept for Last-Event-ID replay, and per-connection backlog before a
+# slow client is reset
+STREAM_HISTORY_SIZE = int(os.environ.get("STREAM_HISTORY_SIZE", "1000"))
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", "1000"))
+STREAM_HEARTBEAT_SECONDS = float(os.environ.get("STREAM_HEARTBEAT_SECONDS", "15"))
+STREAM_RETRY_MS = int(os.environ.get("STREAM_RETRY_MS", "3000"))
+
+# Incremental sync, GET /api/sync/ (see parking/sync.py). Each sync re-reads
+# this many seconds before the client's cursor to pick up writes that
+# committed late.
+SYNC_CURSOR_OVERLAP_SECONDS = float(os.environ.get("SYNC_CURSOR_OVERLAP_SECONDS", "5"))
+# Days to keep tombstones of deleted rows; older cursors get a full resync
+# (0 = keep forever)
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get("SYNC_TOMBSTONE_RETENTION_DAYS", "7"))
+
+# Per-request timing (see parking/instrumentation.py): the fraction of
+# requests that get a Server-Timing header and a JSON line on the
+# 'parking.timing' logger, and how many of their slowest statements the line
+# lists
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get("REQUEST_TIMING_SAMPLE_RATE", "0.05"))
+REQUEST_TIMING_SLOW_QUERIES = int(os.environ.get("REQUEST_TIMING_SLOW_QUERIES", "3"))
+
+# Prometheus metrics, GET /metrics (see parking/metrics.py). With several
+# worker processes, point METRICS_MULTIPROCESS_DIR at a directory they share;
+# each writes its counters there at most every METRICS_FLUSH_SECONDS.
+METRICS_MULTIPROCESS_DIR = os.environ.get("METRICS_MULTIPROCESS_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "5"))
+# Who may scrape: clients whose REMOTE_ADDR is in METRICS_ALLOWED_NETWORKS
+# (comma-separated, CIDR or single addresses; empty = nobody by address), or
+# any client sending "Authorization: Bearer <METRICS_TOKEN>" when it is set
+METRICS_ALLOWED_NETWORKS = [
+    net.strip()
+    for net in os.environ.get("METRICS_ALLOWED_NETWORKS", "127.0.0.0/8,::1").split(",")
+    if net.strip()
+]
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# On-demand request profiling (see parking/profiling.py): triggered by a
+# signed X-Profile header (`manage.py profile_token`) or ?profile=1 from a
+# staff session; rate-limited across workers through the cache
+PROFILE_DIR = os.environ.get("PROFILE_DIR", str(BASE_DIR / "profiles"))
+PROFILE_DEFAULT_MODE = os.environ.get("PROFILE_DEFAULT_MODE", "sample")  # sample | cprofile
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_RATE_LIMIT = int(os.environ.get("PROFILE_RATE_LIMIT", "6"))
+PROFILE_RATE_WINDOW_SECONDS = int(os.environ.get("PROFILE_RATE_WINDOW_SECONDS", "60"))
+PROFILE_TOKEN_MAX_AGE = int(os.environ.get("PROFILE_TOKEN_MAX_AGE", "3600"))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "100"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "parking.timing": {
+            "handlers": ["console"],
+            "level": os.environ.get("REQUEST_TIMING_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
@@ -2,7 +2,10 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from parking.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('parking.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
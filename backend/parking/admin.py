@@ -1,17 +1,22 @@
 
+import os
+
 from django.contrib import admin
-from django.utils import timezone
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils.html import format_html
 from .models import (
     ParkingFacility, ParkingZone, ParkingSlot,
-    Device, TelemetryData, ParkingLog,
-    Alert, ParkingTarget,
+    Device, DeviceHealthState, TelemetryData, TelemetryRollup, ParkingLog,
+    SlotOccupancy, HourlyOccupancy, Alert, ParkingTarget, TopologyVersion, Tombstone,
+    RequestProfile,
 )
 
 
 @admin.register(ParkingFacility)
 class ParkingFacilityAdmin(admin.ModelAdmin):
-    list_display = ['name', 'address', 'is_active', 'created_at']
-    list_filter = ['is_active']
+    list_display = ['name', 'address', 'timezone', 'is_active', 'created_at']
+    list_filter = ['is_active', 'timezone']
     search_fields = ['name', 'address']
 
 
@@ -34,7 +39,7 @@ class DeviceAdmin(admin.ModelAdmin):
     list_display = ['device_code', 'get_zone', 'is_active', 'health_score', 'last_seen_at']
     list_filter = ['is_active', 'slot__zone__zone_type', 'slot__zone__facility']
     search_fields = ['device_code', 'slot__slot_number']
-    readonly_fields = ['last_seen_at', 'installed_at']
+    readonly_fields = ['last_seen_at', 'open_alert_count', 'installed_at', 'updated_at']
 
     @admin.display(description='Zone', ordering='slot__zone__name')
     def get_zone(self, obj):
@@ -46,8 +51,31 @@ class TelemetryDataAdmin(admin.ModelAdmin):
     list_display = ['device', 'voltage', 'current', 'power_factor', 'power_consumption', 'timestamp']
     list_filter = ['device__slot__zone', 'timestamp']
     search_fields = ['device__device_code']
-    date_hierarchy = 'timestamp'
     readonly_fields = ['power_consumption', 'received_at']
+    # Raw telemetry is large: no date_hierarchy (it scans the whole table for
+    # distinct dates) and no unfiltered COUNT(*). Browse history through
+    # TelemetryRollup instead.
+    show_full_result_count = False
+
+
+@admin.register(TelemetryRollup)
+class TelemetryRollupAdmin(admin.ModelAdmin):
+    list_display = [
+        'device', 'tier', 'bucket_start', 'sample_count',
+        'voltage_min', 'get_voltage_avg', 'voltage_max',
+        'get_power_avg', 'power_max', 'energy_wh',
+    ]
+    list_filter = ['tier', 'device__slot__zone']
+    search_fields = ['device__device_code']
+    date_hierarchy = 'bucket_start'
+
+    @admin.display(description='Avg voltage')
+    def get_voltage_avg(self, obj):
+        return round(obj.voltage_avg, 2) if obj.sample_count else None
+
+    @admin.display(description='Avg power')
+    def get_power_avg(self, obj):
+        return round(obj.power_avg, 2) if obj.sample_count else None
 
 
 @admin.register(ParkingLog)
@@ -58,21 +86,46 @@ class ParkingLogAdmin(admin.ModelAdmin):
     date_hierarchy = 'timestamp'
 
 
+@admin.register(SlotOccupancy)
+class SlotOccupancyAdmin(admin.ModelAdmin):
+    list_display = ['device', 'zone', 'is_occupied', 'timestamp', 'updated_at']
+    list_filter = ['is_occupied', 'zone']
+    search_fields = ['device__device_code']
+    readonly_fields = ['device', 'zone', 'is_occupied', 'timestamp', 'updated_at']
+
+
+@admin.register(DeviceHealthState)
+class DeviceHealthStateAdmin(admin.ModelAdmin):
+    list_display = ['device', 'get_readings', 'updated_at']
+    search_fields = ['device__device_code']
+    readonly_fields = ['device', 'buckets', 'updated_at']
+
+    @admin.display(description='Readings in window')
+    def get_readings(self, obj):
+        return len(obj.buckets)
+
+
+@admin.register(HourlyOccupancy)
+class HourlyOccupancyAdmin(admin.ModelAdmin):
+    list_display = ['zone', 'date', 'hour', 'occupied_events', 'vacated_events']
+    list_filter = ['zone__facility', 'zone']
+    date_hierarchy = 'date'
+
+
 @admin.register(Alert)
 class AlertAdmin(admin.ModelAdmin):
     list_display = ['alert_type', 'severity', 'device', 'zone', 'is_acknowledged', 'created_at']
     list_filter = ['severity', 'alert_type', 'is_acknowledged']
     search_fields = ['message', 'device__device_code']
     date_hierarchy = 'created_at'
-    readonly_fields = ['created_at', 'acknowledged_at']
+    readonly_fields = ['created_at', 'acknowledged_at', 'updated_at']
     actions = ['acknowledge_alerts']
 
     @admin.action(description='Mark selected alerts as acknowledged')
     def acknowledge_alerts(self, request, queryset):
-        count = queryset.filter(is_acknowledged=False).update(
-            is_acknowledged=True,
-            acknowledged_at=timezone.now()
-        )
+        from .services import acknowledge_alerts
+
+        count = acknowledge_alerts(queryset)
         self.message_user(request, f'{count} alert(s) acknowledged.')
 
 
@@ -81,3 +134,62 @@ class ParkingTargetAdmin(admin.ModelAdmin):
     list_display = ['zone', 'date', 'target_occupancy_count', 'target_usage_hours']
     list_filter = ['zone__facility', 'zone']
     date_hierarchy = 'date'
+
+
+@admin.register(TopologyVersion)
+class TopologyVersionAdmin(admin.ModelAdmin):
+    list_display = ['version', 'updated_at']
+    readonly_fields = ['version', 'updated_at']
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'object_id', 'deleted_at']
+    list_filter = ['kind']
+    readonly_fields = ['kind', 'object_id', 'deleted_at']
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = [
+        'created_at', 'method', 'path', 'status_code', 'duration_ms', 'mode',
+        'requested_by', 'get_download',
+    ]
+    list_filter = ['mode', 'method', 'status_code']
+    search_fields = ['path', 'requested_by']
+    readonly_fields = [field.name for field in RequestProfile._meta.fields] + ['get_download']
+
+    def has_add_permission(self, request):
+        return False  # taken by ProfilingMiddleware only
+
+    @admin.display(description='Profile')
+    def get_download(self, obj):
+        url = reverse('admin:parking_requestprofile_download', args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, obj.file_name)
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/',
+                self.admin_site.admin_view(self.download),
+                name='parking_requestprofile_download',
+            ),
+        ] + super().get_urls()
+
+    def download(self, request, pk):
+        from .profiling import profile_path
+
+        if not self.has_view_permission(request):
+            raise Http404
+        profile = self.get_object(request, pk)
+        if profile is None or not os.path.exists(profile_path(profile)):
+            raise Http404('Profile file not found.')
+        return FileResponse(open(profile_path(profile), 'rb'), as_attachment=True,
+                            filename=profile.file_name)
+
+    def delete_model(self, request, obj):
+        from .profiling import profile_path
+
+        if os.path.exists(profile_path(obj)):
+            os.remove(profile_path(obj))
+        super().delete_model(request, obj)
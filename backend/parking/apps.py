@@ -5,3 +5,10 @@ class ParkingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'parking'
     verbose_name = 'Smart Parking System'
+
+    def ready(self):
+        from . import sync, topology, watermarks
+
+        topology.connect_signals()
+        watermarks.connect_signals()
+        sync.connect_signals()
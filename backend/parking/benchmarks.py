@@ -0,0 +1,356 @@
+"""
+Endpoint benchmarks (`manage.py benchmark`).
+
+For each scale tier, a dataset is generated with the seed_data generator
+into a throwaway test database (an in-memory SQLite database, or
+test_<DB_NAME> on PostgreSQL). Then every route in parking/urls.py is
+driven through the test client, the scheduled jobs in JOBS are run
+directly, and each records:
+
+    p50_ms / p99_ms   latency over `repeat` requests, after one warm-up
+    queries           SQL statements sent by one request (the most seen), as
+                      counted by RequestTimingMiddleware
+    peak_kib          peak Python heap allocated by one request (tracemalloc)
+    status            HTTP status of the last request
+
+Requests run in a rolled-back transaction, like the query-plan probes in
+queryplans.py, so ingest requests do not change what the next request
+sees. The response cache is off so that reads reach the database.
+/api/stream/ is timed up to its first chunk.
+
+Each route and job has a query budget in QUERY_BUDGETS. It fails its budget
+when one request sends more statements than that, or when a larger tier
+needs more statements than the smallest one. The second check is what
+catches an N+1. Results are plain JSON with sorted keys, so two runs can
+be diffed directly or with `benchmark --baseline`.
+"""
+import asyncio
+import logging
+import platform
+import resource
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+
+import django
+import numpy as np
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.utils import timezone
+
+from .instrumentation import RequestTiming, sampled
+from .queryplans import kept_connection, sample_values
+
+Tier = namedtuple('Tier', 'devices facilities')
+
+TIERS = {
+    '50': Tier(devices=50, facilities=1),
+    '5k': Tier(devices=5_000, facilities=4),
+    '50k': Tier(devices=50_000, facilities=20),
+}
+DEFAULT_REPEAT = 30
+BULK_SIZE = 100  # readings per /api/telemetry/bulk/ request
+
+# Statements one request may send, whatever the tier
+QUERY_BUDGETS = {
+    'telemetry-create': 10,
+    'telemetry-bulk': 17,  # incl. locking the health windows (2 statements on SQLite)
+    'parking-log-create': 10,
+    'parking-log-list': 3,
+    'alert-list': 3,
+    'alert-acknowledge': 7,
+    'facility-list': 2,
+    'zone-list': 3,
+    'device-list': 1,
+    'sync': 12,
+    'dashboard-summary': 7,
+    'dashboard-hourly': 2,
+    'target-list': 2,
+    'event-stream': 0,
+    'detect-offline': 8,  # however many devices are stale
+}
+
+
+# ── Requests ──────────────────────────────────────────
+
+
+def _get(path, **params):
+    def request(client, sample):
+        return client.get(path.format(**sample), {key: value.format(**sample) for key, value in params.items()})
+    return request
+
+
+def _post(path, body):
+    def request(client, sample):
+        return client.post(path, body(sample), content_type='application/json')
+    return request
+
+
+def _reading(device_code, timestamp):
+    return {
+        'device_code': device_code, 'voltage': 220.0, 'current': 1.5,
+        'power_factor': 0.9, 'timestamp': timestamp,
+    }
+
+
+def _acknowledge(client, sample):
+    return client.patch(f"/api/alerts/{sample['alert']}/acknowledge/")
+
+
+def _first_chunk(client, sample):
+    async def read():
+        response = await AsyncClient().get('/api/stream/')
+        await anext(aiter(response.streaming_content))
+        await response.streaming_content.aclose()
+        return response
+    return asyncio.run(read())
+
+
+# url name → request(client, sample) → response
+ROUTES = {
+    'telemetry-create': _post(
+        '/api/telemetry/', lambda sample: _reading(sample['device_code'], sample['reading_at']),
+    ),
+    'telemetry-bulk': _post(
+        '/api/telemetry/bulk/',
+        lambda sample: [_reading(code, sample['reading_at']) for code in sample['bulk_codes']],
+    ),
+    'parking-log-create': _post('/api/parking-log/', lambda sample: {
+        'device_code': sample['device_code'], 'is_occupied': True, 'timestamp': sample['now'],
+    }),
+    'parking-log-list': _get('/api/parking-logs/', zone='{zone}'),
+    'alert-list': _get('/api/alerts/'),
+    'alert-acknowledge': _acknowledge,
+    'facility-list': _get('/api/facilities/'),
+    'zone-list': _get('/api/zones/'),
+    'device-list': _get('/api/devices/'),
+    'sync': _get('/api/sync/', cursor='0'),
+    'dashboard-summary': _get('/api/dashboard/summary/'),
+    'dashboard-hourly': _get('/api/dashboard/hourly/', date='{today}'),
+    'target-list': _get('/api/targets/', date='{today}'),
+    'event-stream': _first_chunk,
+}
+
+
+_JobResponse = namedtuple('_JobResponse', 'status_code timing')
+
+
+def _job(function):
+    """Run function(sample) as if it were a request: status 200 and its statements counted."""
+    def request(client, sample):
+        timing = RequestTiming(slow_queries=0)
+
+        def record(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                timing.add_query(sql, time.perf_counter() - start)
+
+        with connection.execute_wrapper(record):
+            function(sample)
+        return _JobResponse(200, timing)
+    return request
+
+
+def _detect_offline(sample):
+    from .services import detect_offline_devices
+
+    # Every seeded device is stale at offline_at, so the scan raises one alert per device
+    detect_offline_devices(auto_resolve=True, now=sample['offline_at'])
+
+
+# scheduled job name → request(client, sample), measured like a route
+JOBS = {
+    'detect-offline': _job(_detect_offline),
+}
+
+
+def uncovered_routes():
+    """Names of parking/urls.py routes that have no entry in ROUTES."""
+    from . import urls
+
+    return [pattern.name for pattern in urls.urlpatterns if pattern.name not in ROUTES]
+
+
+def _sample():
+    from .models import Device, TelemetryData
+    from .services import OFFLINE_TIMEOUT_MINUTES
+
+    sample = sample_values()  # includes reading_at, past the latest reading
+    latest = TelemetryData.objects.aggregate(latest=Max('timestamp'))['latest'] or timezone.now()
+    sample['offline_at'] = latest + timedelta(minutes=OFFLINE_TIMEOUT_MINUTES + 1)
+    sample['bulk_codes'] = list(
+        Device.objects.filter(is_active=True).order_by('id')
+        .values_list('device_code', flat=True)[:BULK_SIZE]
+    )
+    return sample
+
+
+# ── Measuring ─────────────────────────────────────────
+
+
+def _timed(request, client, sample):
+    with transaction.atomic():
+        start = time.perf_counter()
+        response = request(client, sample)
+        elapsed = time.perf_counter() - start
+        transaction.set_rollback(True)
+    return elapsed, response.timing.queries, response.status_code
+
+
+def _peak_allocated(request, client, sample):
+    with transaction.atomic():
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            request(client, sample)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        transaction.set_rollback(True)
+    return peak - baseline
+
+
+def measure_route(request, client, sample, repeat=DEFAULT_REPEAT):
+    """Latency, statement count, peak allocation and status of one route."""
+    _timed(request, client, sample)  # warm-up: imports, topology snapshot
+    timings, queries, status = [], 0, None
+    for _ in range(repeat):
+        elapsed, count, status = _timed(request, client, sample)
+        timings.append(elapsed * 1000)
+        queries = max(queries, count)
+    p50, p99 = np.percentile(timings, [50, 99])
+    return {
+        'p50_ms': round(float(p50), 2),
+        'p99_ms': round(float(p99), 2),
+        'queries': queries,
+        'peak_kib': round(_peak_allocated(request, client, sample) / 1024, 1),
+        'status': status,
+    }
+
+
+def measure_routes(repeat=DEFAULT_REPEAT, names=None):
+    """{route or job name: measurement} for the current database."""
+    results = {}
+    # A 4xx is reported in `status`, and the timings in the results
+    logs = [logging.getLogger(name) for name in ('django.request', 'parking.timing')]
+    levels = [log.level for log in logs]
+    for log in logs:
+        log.setLevel(logging.ERROR)
+    try:
+        with override_settings(RESPONSE_CACHE_TTL_SECONDS=0, ALLOWED_HOSTS=['*']), \
+                kept_connection(), sampled():
+            sample = _sample()
+            client = Client()
+            for name, request in {**ROUTES, **JOBS}.items():
+                if names and name not in names:
+                    continue
+                results[name] = measure_route(request, client, sample, repeat)
+    finally:
+        for log, level in zip(logs, levels):
+            log.setLevel(level)
+    return results
+
+
+# ── Datasets ──────────────────────────────────────────
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """Create, migrate and finally drop the test database."""
+    old_config = setup_databases(
+        verbosity=0, interactive=False, keepdb=keepdb, aliases={'default'}, serialized_aliases=(),
+    )
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+
+
+def build_dataset(tier, seed, days=1):
+    """Replace the database contents with the dataset of `tier`. Returns seconds taken."""
+    start = time.perf_counter()
+    call_command(
+        'seed_data', devices=TIERS[tier].devices, facilities=TIERS[tier].facilities,
+        days=days, seed=seed, stdout=StringIO(),
+    )
+    return round(time.perf_counter() - start, 1)
+
+
+def run(tiers, repeat=DEFAULT_REPEAT, seed=1, days=1, names=None, keepdb=False, progress=None):
+    """Seed and measure each tier; returns the JSON-ready report."""
+    report = {
+        'database': connection.vendor,
+        'django': django.get_version(),
+        'python': platform.python_version(),
+        'started_at': timezone.now().isoformat(timespec='seconds'),
+        'repeat': repeat,
+        'seed': seed,
+        'days': days,
+        'tiers': {},
+    }
+    with benchmark_database(keepdb):
+        for tier in tiers:
+            if progress:
+                progress(f'Seeding {tier} tier ({TIERS[tier].devices} devices)...')
+            seed_seconds = build_dataset(tier, seed, days)
+            if progress:
+                progress(f'Measuring {tier} tier...')
+            report['tiers'][tier] = {
+                'devices': TIERS[tier].devices,
+                'facilities': TIERS[tier].facilities,
+                'seed_seconds': seed_seconds,
+                'routes': measure_routes(repeat, names),
+            }
+    report['max_rss_mib'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return report
+
+
+# ── Budgets & comparison ──────────────────────────────
+
+
+def check_budgets(report, p99_budget_ms=None):
+    """Human-readable budget violations of a report."""
+    violations = []
+    tiers = report['tiers']
+    smallest = min(tiers, key=lambda tier: tiers[tier]['devices'], default=None)
+    for tier, data in tiers.items():
+        for name, result in data['routes'].items():
+            where = f'{tier} {name}'
+            if result['status'] >= 400:
+                violations.append(f'{where}: HTTP {result["status"]}')
+            budget = QUERY_BUDGETS.get(name)
+            if budget is not None and result['queries'] > budget:
+                violations.append(f'{where}: {result["queries"]} queries, budget {budget}')
+            base = tiers[smallest]['routes'].get(name)
+            if base and result['queries'] > base['queries']:
+                violations.append(
+                    f'{where}: {result["queries"]} queries vs {base["queries"]} '
+                    f'at {smallest} devices (grows with data)'
+                )
+            if p99_budget_ms is not None and result['p99_ms'] > p99_budget_ms:
+                violations.append(f'{where}: p99 {result["p99_ms"]} ms, budget {p99_budget_ms} ms')
+    return violations
+
+
+def compare(baseline, report, threshold=0.2):
+    """Lines describing query-count changes and p99 moves beyond `threshold` vs `baseline`."""
+    lines = []
+    for tier, data in report['tiers'].items():
+        old_routes = baseline.get('tiers', {}).get(tier, {}).get('routes', {})
+        for name, result in data['routes'].items():
+            old = old_routes.get(name)
+            if not old:
+                continue
+            if result['queries'] != old['queries']:
+                lines.append(f'{tier} {name}: queries {old["queries"]} → {result["queries"]}')
+            if old['p99_ms'] and abs(result['p99_ms'] / old['p99_ms'] - 1) > threshold:
+                lines.append(f'{tier} {name}: p99 {old["p99_ms"]} → {result["p99_ms"]} ms')
+    return lines
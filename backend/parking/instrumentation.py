@@ -0,0 +1,170 @@
+"""
+Per-request timing: SQL, serialization and rendering (RequestTimingMiddleware).
+
+A sampled request (REQUEST_TIMING_SAMPLE_RATE, 0–1) records:
+
+    db          statements sent and their total time, on every connection
+    serialize   time in serializer.data, via serialized()
+    render      time in DRF's response.render() (JSON encoding)
+    total       time spent in the middleware and the view below this one
+
+The response gets a Server-Timing header, which browser dev tools show
+under Network ▸ Timing:
+
+    Server-Timing: db;dur=12.4;desc="7 queries", serialize;dur=3.1, render;dur=0.8, total;dur=21.0
+
+The 'parking.timing' logger also gets one JSON line per sampled request.
+The line carries the route name, the status, the same timings, and the
+REQUEST_TIMING_SLOW_QUERIES slowest statements. Requests that are not
+sampled pay for one random() call.
+
+Tests read the same numbers from `response.timing` (a RequestTiming)
+after a request with sampling forced on (`sampled()`). `benchmark` uses
+them to check its per-route query budgets.
+"""
+import heapq
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('parking.timing')
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Timings of one request, in seconds."""
+
+    def __init__(self, slow_queries=3):
+        self.queries = 0
+        self.db = 0.0
+        self.spans = {}
+        self.total = 0.0
+        self._slow_queries = slow_queries
+        self._slowest = []  # min-heap of (seconds, n, sql)
+
+    def add_query(self, sql, elapsed):
+        self.queries += 1
+        self.db += elapsed
+        if self._slow_queries:
+            entry = (elapsed, self.queries, sql)
+            if len(self._slowest) < self._slow_queries:
+                heapq.heappush(self._slowest, entry)
+            elif elapsed > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def add_span(self, name, elapsed):
+        self.spans[name] = self.spans.get(name, 0.0) + elapsed
+
+    def slowest(self):
+        """[(seconds, sql)], slowest first."""
+        return [(elapsed, sql) for elapsed, _n, sql in sorted(self._slowest, reverse=True)]
+
+    def server_timing(self):
+        noun = 'query' if self.queries == 1 else 'queries'
+        parts = [f'db;dur={self.db * 1000:.1f};desc="{self.queries} {noun}"']
+        parts += [f'{name};dur={elapsed * 1000:.1f}' for name, elapsed in self.spans.items()]
+        parts.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(parts)
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db * 1000, 2),
+            **{f'{name}_ms': round(elapsed * 1000, 2) for name, elapsed in self.spans.items()},
+            'total_ms': round(self.total * 1000, 2),
+            'slow_queries': [
+                {'ms': round(elapsed * 1000, 2), 'sql': sql[:500]} for elapsed, sql in self.slowest()
+            ],
+        }
+
+
+@contextmanager
+def span(name):
+    """Add the block's duration to the current request's `name` timing (no-op if not sampled)."""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add_span(name, time.perf_counter() - start)
+
+
+def serialized(serializer):
+    """serializer.data, timed as `serialize`."""
+    with span('serialize'):
+        return serializer.data
+
+
+@contextmanager
+def sampled():
+    """Force every request in the block to be sampled (for tests and benchmarks)."""
+    from django.test.utils import override_settings
+
+    with override_settings(REQUEST_TIMING_SAMPLE_RATE=1.0):
+        yield
+
+
+class RequestTimingMiddleware:
+    """Samples requests and reports their timings; see the module docstring."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.REQUEST_TIMING_SAMPLE_RATE
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return self.get_response(request)
+
+        timing = RequestTiming(settings.REQUEST_TIMING_SLOW_QUERIES)
+        token = _current.set(timing)
+
+        def record(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                timing.add_query(sql, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        timing.total = time.perf_counter() - start
+
+        response.timing = timing
+        if not response.streaming:
+            response['Server-Timing'] = timing.server_timing()
+        if logger.isEnabledFor(logging.INFO):
+            match = request.resolver_match
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'route': match.url_name if match else None,
+                'status': response.status_code,
+                **timing.as_dict(),
+            }))
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns; time that from here
+        timing = _current.get()
+        if timing is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: timing.add_span('render', time.perf_counter() - start)
+            )
+        return response
@@ -0,0 +1,93 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from parking import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database at each scale tier and measure latency, query '
+        'count and peak memory of every API route; optionally write the results as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tier', action='append', choices=list(benchmarks.TIERS),
+            help='Devices in the dataset (repeatable). Default: 50.',
+        )
+        parser.add_argument(
+            '--route', action='append', choices=[*benchmarks.ROUTES, *benchmarks.JOBS],
+            help='Measure only this route or job (repeatable). Default: all.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=benchmarks.DEFAULT_REPEAT,
+            help=f'Timed requests per route (default: {benchmarks.DEFAULT_REPEAT})',
+        )
+        parser.add_argument('--seed', type=int, default=1, help='seed_data RNG seed (default: 1)')
+        parser.add_argument(
+            '--days', type=int, default=1, help='Days of history per dataset (default: 1)',
+        )
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='Results JSON of an earlier run to compare with')
+        parser.add_argument(
+            '--p99-budget-ms', type=float, default=None,
+            help='Fail if any route has a p99 latency above this (default: no latency budget)',
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Reuse the test database if it exists and keep it afterwards',
+        )
+
+    def handle(self, *args, **options):
+        uncovered = benchmarks.uncovered_routes()
+        if uncovered:
+            raise CommandError(f'No benchmark request for route(s): {", ".join(uncovered)}')
+        if options['repeat'] < 1 or options['days'] < 1:
+            raise CommandError('--repeat and --days must be at least 1.')
+        tiers = sorted(
+            set(options['tier'] or ['50']), key=lambda tier: benchmarks.TIERS[tier].devices,
+        )
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        report = benchmarks.run(
+            tiers, repeat=options['repeat'], seed=options['seed'], days=options['days'],
+            names=options['route'], keepdb=options['keepdb'], progress=self.stdout.write,
+        )
+        report['violations'] = benchmarks.check_budgets(report, options['p99_budget_ms'])
+
+        for tier, data in report['tiers'].items():
+            self.stdout.write(
+                f'\n{tier} devices ({data["facilities"]} facilities, seeded in {data["seed_seconds"]} s)'
+            )
+            self.stdout.write(
+                f'  {"route":<20} {"status":>6} {"p50 ms":>9} {"p99 ms":>9} {"queries":>8} {"peak KiB":>9}'
+            )
+            for name, result in data['routes'].items():
+                self.stdout.write(
+                    f'  {name:<20} {result["status"]:>6} {result["p50_ms"]:>9} '
+                    f'{result["p99_ms"]:>9} {result["queries"]:>8} {result["peak_kib"]:>9}'
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(f'\nWrote {options["output"]}')
+        if baseline is not None:
+            changes = benchmarks.compare(baseline, report)
+            self.stdout.write(f'\nChanges vs {options["baseline"]}:')
+            for line in changes or ['  none']:
+                self.stdout.write(f'  {line}' if changes else line)
+
+        if report['violations']:
+            for violation in report['violations']:
+                self.stderr.write(violation)
+            raise CommandError(f'{len(report["violations"])} budget violation(s)')
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ {len(tiers)} tier(s), every route within its budgets '
+            f'(peak RSS {report["max_rss_mib"]} MiB)'
+        ))
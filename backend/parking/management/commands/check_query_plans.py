@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from parking.queryplans import GROWTH_TABLES, PROBES, FailedRequest, check_query_plans
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN every statement the hot endpoints and scheduled jobs send and fail '
+        'if any of them reads a whole growth table (run in CI after migrate)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only', action='append', choices=list(PROBES),
+            help='Run only this probe (repeatable). Default: all.',
+        )
+
+    def handle(self, *args, **options):
+        results = check_query_plans(options['only'])
+        failures = []
+        for name, statements, findings in results:
+            if any(isinstance(finding, FailedRequest) for finding in findings):
+                status = self.style.ERROR('FAILED')
+            else:
+                status = self.style.ERROR('FULL SCAN') if findings else 'ok'
+            self.stdout.write(f'  {name:<20} {len(statements):>3} statement(s)  {status}')
+            if options['verbosity'] > 1:
+                for sql, _params in statements:
+                    self.stdout.write(f'      {sql[:200]}')
+            failures.extend(findings)
+
+        if failures:
+            for finding in failures:
+                self.stderr.write(str(finding))
+            failed = sum(isinstance(finding, FailedRequest) for finding in failures)
+            problems = []
+            if failed:
+                problems.append(f'{failed} probe request(s) did not return 2xx')
+            if len(failures) > failed:
+                problems.append(
+                    f'{len(failures) - failed} statement(s) read a whole table of: '
+                    f'{", ".join(GROWTH_TABLES)}'
+                )
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(results)} probe(s), no full scans of growth tables'
+        ))
@@ -0,0 +1,57 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from parking.rollups import apply_retention, rebuild_rollups, retention_days
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild telemetry rollup tiers (1m / 15m / 1h) from raw samples and '
+        'apply per-tier retention'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from', dest='start',
+            help='Rebuild rollups from this date (YYYY-MM-DD). Omit to skip rebuilding.',
+        )
+        parser.add_argument(
+            '--to', dest='end',
+            help='Rebuild rollups up to (excluding) this date (YYYY-MM-DD). Default: now.',
+        )
+        parser.add_argument(
+            '--skip-retention', action='store_true',
+            help='Only rebuild; do not delete expired raw rows or buckets',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report how many rows retention would delete without deleting',
+        )
+
+    def _parse(self, value):
+        try:
+            day = datetime.date.fromisoformat(value)
+        except ValueError:
+            raise CommandError('Invalid date format. Use YYYY-MM-DD.')
+        return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+    def handle(self, *args, **options):
+        # ── 1. Rebuild tiers from raw ─────────────────────────
+        if options['start']:
+            start = self._parse(options['start'])
+            end = self._parse(options['end']) if options['end'] else None
+            self.stdout.write(f'Rebuilding rollups from {start:%Y-%m-%d}...')
+            read, written = rebuild_rollups(start=start, end=end)
+            self.stdout.write(f'  {read} raw sample(s) → {written} bucket write(s)')
+
+        # ── 2. Retention ──────────────────────────────────────
+        if options['skip_retention']:
+            return
+        days = retention_days()
+        verb = 'would delete' if options['dry_run'] else 'deleted'
+        deleted = apply_retention(dry_run=options['dry_run'])
+        for tier, count in deleted.items():
+            self.stdout.write(f'  {tier:>4} (keep {days[tier]}d): {verb} {count} row(s)')
+        self.stdout.write(self.style.SUCCESS('✅ Compaction complete'))
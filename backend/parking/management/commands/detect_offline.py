@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from parking.services import OFFLINE_TIMEOUT_MINUTES, detect_offline_devices
+
+
+class Command(BaseCommand):
+    help = (
+        f'Raise DEVICE_OFFLINE alerts for active devices silent for more than '
+        f'{OFFLINE_TIMEOUT_MINUTES} minutes (schedule every minute or two)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--auto-resolve', action='store_true',
+            help='Acknowledge open DEVICE_OFFLINE alerts of devices that have reported again',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = detect_offline_devices(auto_resolve=options['auto_resolve'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {result['offline']} offline device(s): {result['created']} alert(s) raised, "
+            f"{result['resolved']} resolved in {elapsed * 1000:.0f} ms"
+        ))
@@ -0,0 +1,102 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from parking import partitions
+from parking.models import ParkingLog, TelemetryData
+from parking.rollups import retention_days
+
+
+class Command(BaseCommand):
+    help = (
+        'Maintain PostgreSQL time partitions for telemetry and parking logs: '
+        'pre-create future partitions and detach or drop expired ones'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert', action='store_true',
+            help='Convert plain tables to partitioned tables first (migration path)',
+        )
+        parser.add_argument(
+            '--granularity', choices=partitions.GRANULARITIES,
+            help='Partition size (default: settings.TIMESERIES_PARTITIONING)',
+        )
+        parser.add_argument(
+            '--premake', type=int, default=None,
+            help='Days of future partitions to create (default: TIMESERIES_PARTITION_PREMAKE_DAYS)',
+        )
+        parser.add_argument(
+            '--detach', action='store_true',
+            help='Detach expired partitions instead of dropping them (for archiving)',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='List what would be created or expired without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        if not partitions.is_supported():
+            self.stdout.write('Partitioning requires PostgreSQL — nothing to do.')
+            return
+
+        granularity = options['granularity'] or partitions.configured_granularity()
+        if not granularity:
+            raise CommandError(
+                'Set TIMESERIES_PARTITIONING=daily|monthly or pass --granularity.'
+            )
+        premake = options['premake']
+        if premake is None:
+            premake = settings.TIMESERIES_PARTITION_PREMAKE_DAYS
+        dry_run = options['dry_run']
+
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        retention = {
+            TelemetryData: retention_days()['raw'],
+            ParkingLog: settings.PARKING_LOG_RETENTION_DAYS,
+        }
+
+        for model, keep_days in retention.items():
+            table = model._meta.db_table
+            self.stdout.write(f'{table}:')
+
+            # ── 1. Convert ────────────────────────────────────
+            if not partitions.is_partitioned(table):
+                if not options['convert']:
+                    self.stdout.write('  not partitioned (run with --convert to migrate)')
+                    continue
+                if dry_run:
+                    self.stdout.write('  would convert to partitioned table')
+                    continue
+                with transaction.atomic():
+                    created = partitions.convert_to_partitioned(table, granularity, premake)
+                self.stdout.write(f'  converted; {len(created)} partition(s) created')
+
+            # ── 2. Pre-create future partitions ───────────────
+            last_day = today + datetime.timedelta(days=premake)
+            if dry_run:
+                self.stdout.write(f'  would ensure partitions through {last_day}')
+            else:
+                with transaction.atomic():
+                    created = partitions.create_partitions(table, today, last_day, granularity)
+                for name in created:
+                    self.stdout.write(f'  + {name}')
+
+            # ── 3. Expire old partitions ──────────────────────
+            if not keep_days:
+                continue
+            cutoff = today - datetime.timedelta(days=keep_days)
+            expired = partitions.expired_partitions(table, cutoff)
+            action, done = ('detach', 'detached') if options['detach'] else ('drop', 'dropped')
+            if dry_run:
+                for name in expired:
+                    self.stdout.write(f'  would {action} {name}')
+                continue
+            with transaction.atomic():
+                partitions.drop_partitions(table, expired, detach_only=options['detach'])
+            for name in expired:
+                self.stdout.write(f'  - {name} ({done})')
+
+        self.stdout.write(self.style.SUCCESS('✅ Partition maintenance complete'))
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from parking.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = 'Print a signed X-Profile token that makes a request be profiled (see parking/profiling.py)'
+
+    def handle(self, *args, **options):
+        token = make_token()
+        self.stdout.write(token)
+        self.stderr.write(
+            f'Valid for {settings.PROFILE_TOKEN_MAX_AGE} s. Example:\n'
+            f'  curl -H "X-Profile: {token}" -H "X-Profile-Mode: cprofile" '
+            f'http://localhost:8000/api/dashboard/summary/'
+        )
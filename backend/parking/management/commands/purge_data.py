@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from parking.retention import (
+    DEFAULT_BATCH_SIZE, PURGE_TARGETS, default_retention, expired_rows, purge_queryset,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete raw telemetry, parking logs, acknowledged alerts and sync tombstones '
+        'older than their retention window, in throttled primary-key batches'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only', action='append', choices=list(PURGE_TARGETS),
+            help='Purge only this target (repeatable). Default: all.',
+        )
+        parser.add_argument(
+            '--telemetry-days', type=int,
+            help='Keep this many days of raw telemetry (default: TELEMETRY_RAW_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--log-days', type=int,
+            help='Keep this many days of parking logs (default: PARKING_LOG_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--alert-days', type=int,
+            help='Keep acknowledged alerts this many days (default: ACKNOWLEDGED_ALERT_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--tombstone-days', type=int,
+            help='Keep sync tombstones this many days (default: SYNC_TOMBSTONE_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help=f'Primary-key window per DELETE (default: {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0.0,
+            help='Seconds to pause between batches to limit lock time and replica lag',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report how many rows would be deleted without deleting',
+        )
+
+    def handle(self, *args, **options):
+        retention = default_retention()
+        overrides = {
+            'telemetry': options['telemetry_days'],
+            'logs': options['log_days'],
+            'alerts': options['alert_days'],
+            'tombstones': options['tombstone_days'],
+        }
+        for target, days in overrides.items():
+            if days is not None:
+                retention[target] = days
+
+        now = timezone.now()
+        verb = 'would delete' if options['dry_run'] else 'deleted'
+        for target in options['only'] or PURGE_TARGETS:
+            days = retention[target]
+            if not days:
+                self.stdout.write(f'  {target}: kept forever (retention 0)')
+                continue
+
+            self.stdout.write(f'Purging {target} older than {days} day(s)...')
+            count = purge_queryset(
+                expired_rows(target, days, now),
+                batch_size=options['batch_size'],
+                pause=options['sleep'],
+                dry_run=options['dry_run'],
+                progress=self._progress(target) if options['verbosity'] else None,
+            )
+            self.stdout.write(f'  {target}: {verb} {count} row(s)')
+
+        self.stdout.write(self.style.SUCCESS('✅ Purge complete'))
+
+    def _progress(self, target):
+        def report(deleted, upto, last):
+            self.stdout.write(f'    {target}: {deleted} deleted (id ≤ {upto} of {last})')
+        return report
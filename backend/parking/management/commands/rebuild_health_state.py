@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from parking.models import Device
+from parking.services import (
+    BULK_WRITE_BATCH_SIZE, query_health_scores, rebuild_health_state, streaming_health_score,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the streaming health windows from raw telemetry and the open-alert '
+        'counters, or verify them against the query-based health score'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Compare streaming scores with compute_device_health for every '
+                 'device instead of rebuilding; exits non-zero on any mismatch',
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            return self._verify()
+        self.stdout.write('Rebuilding device health windows from the last hour of telemetry...')
+        written = rebuild_health_state()
+        self.stdout.write(self.style.SUCCESS(f'✅ {written} health window(s) rebuilt'))
+
+    def _verify(self):
+        now = timezone.now()
+        checked = 0
+        mismatches = []
+        devices = Device.objects.select_related('health_state').order_by('id')
+        batch = []
+        for device in devices.iterator(chunk_size=BULK_WRITE_BATCH_SIZE):
+            batch.append(device)
+            if len(batch) == BULK_WRITE_BATCH_SIZE:
+                mismatches += self._compare(batch, now)
+                checked += len(batch)
+                batch = []
+        mismatches += self._compare(batch, now)
+        checked += len(batch)
+
+        for device, streaming, expected in mismatches:
+            self.stdout.write(f'  {device.device_code}: streaming {streaming}, query {expected}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} of {checked} device(s) differ')
+        self.stdout.write(self.style.SUCCESS(f'✅ {checked} device score(s) match'))
+
+    def _compare(self, devices, now):
+        expected = query_health_scores(devices, now)
+        result = []
+        for device in devices:
+            streaming = streaming_health_score(device, now)
+            if streaming != expected[device.id]:
+                result.append((device, streaming, expected[device.id]))
+        return result
@@ -0,0 +1,25 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from parking.services import rebuild_hourly_occupancy
+
+
+class Command(BaseCommand):
+    help = 'Backfill or rebuild the HourlyOccupancy rollup from ParkingLog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First date to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end', help='Last date to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.date.fromisoformat(options['start']) if options['start'] else None
+            end = datetime.date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError:
+            raise CommandError('Invalid date format. Use YYYY-MM-DD.')
+
+        span = f'{start or "beginning"} → {end or "latest"}'
+        self.stdout.write(f'Rebuilding hourly occupancy rollup ({span})...')
+        written = rebuild_hourly_occupancy(start_date=start, end_date=end)
+        self.stdout.write(self.style.SUCCESS(f'✅ {written} hourly bucket(s) written'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from parking.services import rebuild_slot_occupancy
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized SlotOccupancy state from ParkingLog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows per INSERT while rebuilding (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding slot occupancy from parking logs...')
+        written = rebuild_slot_occupancy(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {written} slot state(s) rebuilt'))
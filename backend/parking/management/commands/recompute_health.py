@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from parking.services import BULK_WRITE_BATCH_SIZE, recompute_fleet_health
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the health score of every active device in one vectorized '
+        'pass and raise LOW_HEALTH alerts (schedule every few minutes)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-alerts', action='store_true',
+            help='Only update scores; do not raise LOW_HEALTH alerts',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BULK_WRITE_BATCH_SIZE,
+            help=f'Rows per UPDATE / alert batch (default: {BULK_WRITE_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        result = recompute_fleet_health(
+            raise_alerts=not options['no_alerts'], batch_size=options['batch_size']
+        )
+        for phase, seconds in result['timings'].items():
+            self.stdout.write(f'  {phase:<12} {seconds * 1000:9.1f} ms')
+        total = sum(result['timings'].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {result['devices']} device(s) scored in {total:.2f}s — "
+            f"{result['changed']} updated, {result['alerts_created']} LOW_HEALTH alert(s)"
+        ))
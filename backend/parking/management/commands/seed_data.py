@@ -1,142 +1,142 @@
-import random
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import timedelta
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
 from django.utils import timezone
 
-from parking.models import (
-    ParkingFacility, ParkingZone, ParkingSlot,
-    Device, TelemetryData, ParkingLog,
-    Alert, ParkingTarget,
+from parking import seeding, topology, watermarks
+from parking.models import Alert, Device, ParkingTarget
+from parking.services import (
+    rebuild_health_state, rebuild_hourly_occupancy, rebuild_slot_occupancy,
 )
 
 
 class Command(BaseCommand):
-    help = 'Seed the database with realistic sample parking data'
+    help = (
+        'Seed the database with realistic sample parking data. The defaults give the '
+        'demo dataset; the options scale it up for load tests and benchmarks'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--facilities', type=int, default=1, help='Facilities (default: 1)')
+        parser.add_argument(
+            '--zones', type=int, default=4, help='Zones per facility (default: 4)',
+        )
+        parser.add_argument(
+            '--devices', type=int, default=50,
+            help='Slots/devices in total, spread over facilities and zones (default: 50)',
+        )
+        parser.add_argument(
+            '--days', type=int, default=1, help='Days of telemetry and parking history (default: 1)',
+        )
+        parser.add_argument(
+            '--interval', type=int, default=5,
+            help='Minutes between telemetry samples of a device (default: 5)',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='RNG seed for a reproducible dataset (default: random)',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Processes generating history in parallel, by facility (PostgreSQL only)',
+        )
+        parser.add_argument(
+            '--chunk-rows', type=int, default=seeding.DEFAULT_CHUNK_ROWS,
+            help=f'Telemetry rows generated and loaded per chunk (default: {seeding.DEFAULT_CHUNK_ROWS})',
+        )
 
     def handle(self, *args, **options):
-        self.stdout.write('Clearing existing data...')
-        TelemetryData.objects.all().delete()
-        ParkingLog.objects.all().delete()
-        Alert.objects.all().delete()
-        ParkingTarget.objects.all().delete()
-        Device.objects.all().delete()
-        ParkingSlot.objects.all().delete()
-        ParkingZone.objects.all().delete()
-        ParkingFacility.objects.all().delete()
-
-        # ── 1. Facility ───────────────────────────────────────
-        facility = ParkingFacility.objects.create(
-            name='City Center Mall Parking',
-            address='123 Main Street, Downtown'
-        )
-        self.stdout.write(f'  Created facility: {facility.name}')
-
-        # ── 2. Zones ──────────────────────────────────────────
-        zones_config = [
-            {'name': 'Basement-1', 'zone_type': 'BASEMENT', 'total_slots': 20, 'prefix': 'B1'},
-            {'name': 'Basement-2', 'zone_type': 'BASEMENT', 'total_slots': 15, 'prefix': 'B2'},
-            {'name': 'Outdoor',    'zone_type': 'OUTDOOR',  'total_slots': 10, 'prefix': 'OUT'},
-            {'name': 'VIP',        'zone_type': 'VIP',      'total_slots': 5,  'prefix': 'VIP'},
-        ]
+        for name in ('facilities', 'zones', 'devices', 'days', 'interval', 'workers', 'chunk_rows'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+        if options['devices'] < options['facilities'] * options['zones']:
+            raise CommandError('--devices must give every zone at least one device.')
+        workers = min(options['workers'], options['facilities'])
+        if workers > 1 and connection.vendor != 'postgresql':
+            raise CommandError('--workers needs PostgreSQL; SQLite allows one writer at a time.')
+        started = time.perf_counter()
 
-        zones = []
-        for zc in zones_config:
-            zone = ParkingZone.objects.create(
-                facility=facility,
-                name=zc['name'],
-                zone_type=zc['zone_type'],
-                total_slots=zc['total_slots'],
-            )
-            zones.append({'zone': zone, **zc})
-            self.stdout.write(f'  Created zone: {zone.name} ({zc["total_slots"]} slots)')
-
-        # ── 3. Slots + Devices ─────────────────────────────────
-        all_devices = []
-        for zc in zones:
-            zone = zc['zone']
-            for i in range(1, zc['total_slots'] + 1):
-                slot = ParkingSlot.objects.create(
-                    zone=zone,
-                    slot_number=f'S{i:03d}',
-                )
-                device = Device.objects.create(
-                    slot=slot,
-                    device_code=f'PARK-{zc["prefix"]}-S{i:03d}',
-                    is_active=True,
-                    last_seen_at=timezone.now(),
-                )
-                all_devices.append(device)
-
-        self.stdout.write(f'  Created {len(all_devices)} slots + devices')
-
-        # ── 4. Telemetry Data (last 24h, every 5 min) ─────────
-        now = timezone.now()
-        telemetry_records = []
-        intervals = 288  # 24h × 12 (every 5 min)
-
-        for device in all_devices:
-            for i in range(intervals):
-                ts = now - timedelta(minutes=5 * i)
-                voltage = round(random.uniform(210, 240), 1)
-                current = round(random.uniform(3.0, 7.0), 1)
-                pf = round(random.uniform(0.85, 0.98), 2)
-                power = round(voltage * current * pf, 2)
-
-                telemetry_records.append(TelemetryData(
-                    device=device,
-                    voltage=voltage,
-                    current=current,
-                    power_factor=pf,
-                    power_consumption=power,
-                    timestamp=ts,
-                ))
-
-        # Bulk create in batches to avoid memory issues
-        batch_size = 1000
-        for i in range(0, len(telemetry_records), batch_size):
-            TelemetryData.objects.bulk_create(
-                telemetry_records[i:i + batch_size],
-                ignore_conflicts=True
-            )
+        self.stdout.write('Clearing existing data...')
+        seeding.clear_fleet()
 
-        self.stdout.write(f'  Created {len(telemetry_records)} telemetry records')
+        # ── 1-3. Facilities, zones, slots + devices ───────────
+        now = timezone.now().replace(microsecond=0)
+        layouts = seeding.create_fleet(
+            options['facilities'], options['zones'], options['devices'], now,
+        )
+        # Neither the raw deletes nor bulk_create send the signals that
+        # refresh the ingest topology and the cached responses
+        topology.invalidate()
+        watermarks.reset()
+        zones = [zone for layout in layouts for zone in layout.zones]
+        all_devices = list(
+            Device.objects.filter(slot__zone__facility=layouts[0].facility)
+            .select_related('slot__zone').order_by('id')
+        )
+        device_count = sum(len(layout.device_ids) for layout in layouts)
+        self.stdout.write(
+            f'  Created {len(layouts)} facilities, {len(zones)} zones, '
+            f'{device_count} slots + devices'
+        )
 
-        # ── 5. Parking Logs (last 24h, random occupancy) ──────
-        parking_logs = []
-        for device in all_devices:
-            occupied = False
-            for i in range(random.randint(3, 12)):
-                ts = now - timedelta(hours=random.uniform(0, 24))
-                occupied = not occupied
-                parking_logs.append(ParkingLog(
-                    device=device,
-                    is_occupied=occupied,
-                    timestamp=ts,
-                ))
+        # ── 4-5. Telemetry, rollups and parking logs ──────────
+        seeding.ensure_partitions(*seeding.history_bounds(now, options['days']))
+        jobs = [
+            (
+                layout.number, layout.device_ids.tolist(), layout.device_zone_ids.tolist(),
+                int(now.timestamp()), options['days'], options['interval'], options['seed'],
+                options['chunk_rows'],
+            )
+            for layout in layouts
+        ]
+        if workers > 1:
+            # Children must open their own connections
+            connections.close_all()
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                results = list(pool.map(seeding.seed_history, *zip(*jobs)))
+        else:
+            results = [seeding.seed_history(*job) for job in jobs]
+        telemetry_count, rollup_count, log_count = map(sum, zip(*results))
+        self.stdout.write(
+            f'  Created {telemetry_count} telemetry records, {rollup_count} rollup buckets, '
+            f'{log_count} parking logs'
+        )
 
-        ParkingLog.objects.bulk_create(parking_logs)
-        self.stdout.write(f'  Created {len(parking_logs)} parking logs')
+        # bulk loads bypass ingestion, so derive the current state and
+        # the hourly rollup once
+        rebuild_slot_occupancy()
+        rebuild_hourly_occupancy()
 
         # ── 6. Daily Targets ──────────────────────────────────
         today = now.date()
         yesterday = today - timedelta(days=1)
 
-        for zc in zones:
-            zone = zc['zone']
-            for d in [yesterday, today]:
-                ParkingTarget.objects.create(
+        ParkingTarget.objects.bulk_create(
+            [
+                ParkingTarget(
                     zone=zone,
                     date=d,
-                    target_occupancy_count=int(zc['total_slots'] * 0.8),
-                    target_usage_hours=int(zc['total_slots'] * 10),
+                    target_occupancy_count=int(zone.total_slots * 0.8),
+                    target_usage_hours=int(zone.total_slots * 10),
                 )
+                for zone in zones
+                for d in [yesterday, today]
+            ],
+            batch_size=seeding.BULK_BATCH_SIZE,
+        )
 
         self.stdout.write('  Created daily targets for all zones')
 
         # ── 7. Sample Alerts ──────────────────────────────────
-        # Pick a few devices for alerts
-        offline_device = all_devices[2]
+        # Pick a few devices of the first facility for alerts
+        def pick(index):
+            return all_devices[index % len(all_devices)]
+
+        offline_device = pick(2)
         offline_device.last_seen_at = now - timedelta(minutes=10)
         offline_device.health_score = 40
         offline_device.save()
@@ -149,7 +149,7 @@ class Command(BaseCommand):
             message=f'Device {offline_device.device_code} has not sent data for over 10 minutes',
         )
 
-        high_power_device = all_devices[5]
+        high_power_device = pick(5)
         Alert.objects.create(
             device=high_power_device,
             zone=high_power_device.slot.zone,
@@ -158,7 +158,7 @@ class Command(BaseCommand):
             message=f'Device {high_power_device.device_code} reported power consumption of 1650W',
         )
 
-        invalid_device = all_devices[8]
+        invalid_device = pick(8)
         Alert.objects.create(
             device=invalid_device,
             zone=invalid_device.slot.zone,
@@ -167,7 +167,7 @@ class Command(BaseCommand):
             message=f'Device {invalid_device.device_code} reported voltage of 50V (below 100V threshold)',
         )
 
-        low_health_device = all_devices[15]
+        low_health_device = pick(15)
         low_health_device.health_score = 25
         low_health_device.save()
         Alert.objects.create(
@@ -179,25 +179,32 @@ class Command(BaseCommand):
         )
 
         # One acknowledged alert
+        resolved_device = pick(20)
         Alert.objects.create(
-            device=all_devices[20],
-            zone=all_devices[20].slot.zone,
+            device=resolved_device,
+            zone=resolved_device.slot.zone,
             alert_type='DEVICE_OFFLINE',
             severity='CRITICAL',
-            message=f'Device {all_devices[20].device_code} was offline (resolved)',
+            message=f'Device {resolved_device.device_code} was offline (resolved)',
             is_acknowledged=True,
             acknowledged_at=now - timedelta(hours=2),
         )
 
         self.stdout.write('  Created 5 sample alerts')
 
+        # Alerts above were created directly, so recount open alerts and
+        # seed the streaming health windows from the rollups
+        rebuild_health_state()
+
         # ── Summary ───────────────────────────────────────────
         self.stdout.write(self.style.SUCCESS(
             f'\n✅ Seed complete!\n'
-            f'   Facility: 1\n'
+            f'   Facilities: {len(layouts)}\n'
             f'   Zones: {len(zones)}\n'
-            f'   Slots/Devices: {len(all_devices)}\n'
-            f'   Telemetry records: {len(telemetry_records)}\n'
-            f'   Parking logs: {len(parking_logs)}\n'
+            f'   Slots/Devices: {device_count}\n'
+            f'   Telemetry records: {telemetry_count}\n'
+            f'   Rollup buckets: {rollup_count}\n'
+            f'   Parking logs: {log_count}\n'
             f'   Alerts: 5\n'
+            f'   Took {time.perf_counter() - started:.1f} s\n'
         ))
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from parking import simulator
+from parking.models import Alert
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay device traffic (telemetry with jitter, duplicates, clock skew and bad '
+        'voltages, plus occupancy changes) against the ingest endpoints and report '
+        'throughput, latency, rejection rates and alerts created'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode', choices=['client', 'http'], default='client',
+            help='client: in-process Django test client; http: a running server at --url',
+        )
+        parser.add_argument(
+            '--url', default='http://localhost:8000',
+            help='Server base URL in http mode (default: http://localhost:8000)',
+        )
+        parser.add_argument(
+            '--devices', type=int, default=None,
+            help='Simulate the first N active devices (default: all)',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=60, help='Seconds to run (default: 60)',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=120,
+            help='Seconds between readings of a device (default: 120). Keep interval × '
+                 '(1 - jitter) above 60, or readings fall in the 1-minute duplicate window',
+        )
+        parser.add_argument(
+            '--jitter', type=float, default=0.1,
+            help='Random ± fraction of the interval (default: 0.1)',
+        )
+        parser.add_argument(
+            '--bulk-size', type=int, default=0,
+            help='Send readings to /api/telemetry/bulk/ in batches of N (default: one at a time)',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=16, help='Requests in flight (default: 16)',
+        )
+        parser.add_argument(
+            '--skew', type=float, default=60,
+            help='Max ± seconds a device clock is off (default: 60; over 300 gives future rejections)',
+        )
+        parser.add_argument(
+            '--duplicate-rate', type=float, default=0.01,
+            help='Chance a reading is preceded by a resend of the previous one (default: 0.01)',
+        )
+        parser.add_argument(
+            '--invalid-rate', type=float, default=0.005,
+            help='Chance a reading has an out-of-range voltage (default: 0.005)',
+        )
+        parser.add_argument(
+            '--flip-rate', type=float, default=0.05,
+            help='Chance per reading that the slot changes state (default: 0.05)',
+        )
+        parser.add_argument('--seed', type=int, default=None, help='RNG seed (default: random)')
+        parser.add_argument('--output', help='Write the report as JSON to this file')
+
+    def handle(self, *args, **options):
+        for name in ('duration', 'interval', 'concurrency'):
+            if options[name] <= 0:
+                raise CommandError(f'--{name} must be positive.')
+        for name in ('jitter', 'duplicate_rate', 'invalid_rate', 'flip_rate'):
+            if not 0 <= options[name] <= 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be between 0 and 1.")
+
+        devices = simulator.load_devices(options['devices'], options['skew'])
+        if not devices:
+            raise CommandError('No active devices. Run seed_data first.')
+        if options['devices'] and len(devices) < options['devices']:
+            raise CommandError(
+                f'Only {len(devices)} active devices; seed more with '
+                f'`seed_data --devices {options["devices"]}`.'
+            )
+        if options['mode'] == 'http':
+            try:
+                transport = simulator.HttpTransport(options['url'])
+            except ValueError as e:
+                raise CommandError(str(e))
+        else:
+            transport = simulator.ClientTransport()
+
+        simulation = simulator.Simulation(
+            devices, transport, options['duration'],
+            interval=options['interval'], jitter=options['jitter'],
+            bulk_size=options['bulk_size'], concurrency=options['concurrency'],
+            duplicate_rate=options['duplicate_rate'], invalid_rate=options['invalid_rate'],
+            flip_rate=options['flip_rate'], seed=options['seed'],
+        )
+        offered = len(devices) / options['interval']
+        self.stdout.write(
+            f'Simulating {len(devices)} devices for {options["duration"]:g} s '
+            f'({offered:.1f} readings/s offered, {options["mode"]} mode)...'
+        )
+
+        started_at = timezone.now()
+        start = time.perf_counter()
+        with override_settings(ALLOWED_HOSTS=['*']):
+            stats = asyncio.run(simulation.run())
+        seconds = time.perf_counter() - start
+        # Counted in the database; in http mode this assumes the server uses the same one
+        alerts = Alert.objects.filter(created_at__gte=started_at).count()
+        report = stats.summary(seconds, alerts)
+        report.update(mode=options['mode'], devices=len(devices),
+                      offered_readings_per_second=round(offered, 1))
+
+        self.stdout.write(
+            f'  {"endpoint":<22} {"requests":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}  statuses'
+        )
+        for path, endpoint in report['endpoints'].items():
+            statuses = ' '.join(f'{status}×{count}' for status, count in endpoint['statuses'].items())
+            self.stdout.write(
+                f'  {path:<22} {endpoint["requests"]:>9} {endpoint["p50_ms"]:>8} '
+                f'{endpoint["p95_ms"]:>8} {endpoint["p99_ms"]:>8}  {statuses}'
+            )
+        self.stdout.write(
+            f'  Throughput: {report["requests_per_second"]} requests/s, '
+            f'{report["readings_per_second"]} readings/s (offered {report["offered_readings_per_second"]})\n'
+            f'  Rejected readings: {report["readings_rejected"]}, '
+            f'400 rate: {report["bad_request_rate"]:.2%}, error rate: {report["error_rate"]:.2%}\n'
+            f'  Alerts created: {alerts} ({report["alerts_per_second"]}/s), '
+            f'max schedule lag: {report["max_lag_s"]} s'
+        )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(f'Wrote {options["output"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {report["requests"]} requests in {report["seconds"]} s'
+        ))
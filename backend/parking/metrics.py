@@ -0,0 +1,305 @@
+"""
+Prometheus metrics for the ingest and read paths (GET /metrics).
+
+Counters and histograms are sharded per thread. Each thread increments
+its own dict, created on first use, so the hot path takes no lock and
+costs a few hundred nanoseconds. A scrape sums the shards; a copy of a
+dict is atomic under the GIL.
+
+    parking_telemetry_accepted_total{endpoint}          single | bulk
+    parking_telemetry_rejected_total{endpoint,reason}   unknown_device |
+                                                        future_timestamp |
+                                                        duplicate | invalid
+    parking_logs_accepted_total
+    parking_logs_rejected_total{reason}
+    parking_alerts_created_total{alert_type,severity}
+    parking_http_requests_total{route,method,status}
+    parking_http_request_duration_seconds{route}        histogram
+    parking_devices_by_health_score{le}                 gauge, read from the
+                                                        database at scrape time
+
+Processes: each process counts on its own. With several workers
+(gunicorn, or uvicorn --workers), set METRICS_MULTIPROCESS_DIR to a
+directory shared by them. Every process then writes a snapshot there at
+most every METRICS_FLUSH_SECONDS (after a request) and at exit. /metrics
+sums the snapshots of all processes, so a scrape can be up to that many
+seconds behind for the other workers. A snapshot file is named after its
+process id and stays when the process exits. Clear the directory when
+the server is restarted.
+
+Access: /metrics answers clients whose address is in
+METRICS_ALLOWED_NETWORKS (loopback by default) and, when METRICS_TOKEN is
+set, any client sending it as a bearer token. Everyone else gets a 403.
+"""
+import atexit
+import hmac
+import ipaddress
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HEALTH_BUCKETS = (20, 40, 60, 80, 100)
+
+REGISTRY = []
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards = []
+        REGISTRY.append(self)
+
+    def _new_shard(self):
+        values = self._local.values = {}
+        self._shards.append(values)  # list.append is atomic
+        return values
+
+    def collect(self):
+        """{label values: value} summed over every thread."""
+        merged = {}
+        for shard in list(self._shards):
+            for labels, value in shard.copy().items():
+                merged[labels] = self._merge(merged.get(labels), value)
+        return merged
+
+    def reset(self):
+        for shard in list(self._shards):
+            shard.clear()
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        try:
+            values = self._local.values
+        except AttributeError:
+            values = self._new_shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    @staticmethod
+    def _merge(total, value):
+        return value if total is None else total + value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        try:
+            values = self._local.values
+        except AttributeError:
+            values = self._new_shard()
+        counts = values.get(labels)
+        if counts is None:
+            # one slot per bucket and +Inf (not cumulative), then sum and count
+            counts = values[labels] = [0] * (len(self.buckets) + 3)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    @staticmethod
+    def _merge(total, value):
+        return list(value) if total is None else [a + b for a, b in zip(total, value)]
+
+
+TELEMETRY_ACCEPTED = Counter(
+    'parking_telemetry_accepted_total', 'Telemetry readings stored.', ['endpoint'],
+)
+TELEMETRY_REJECTED = Counter(
+    'parking_telemetry_rejected_total',
+    'Telemetry readings rejected, by the first failed check.', ['endpoint', 'reason'],
+)
+PARKING_LOGS_ACCEPTED = Counter('parking_logs_accepted_total', 'Parking log events stored.')
+PARKING_LOGS_REJECTED = Counter(
+    'parking_logs_rejected_total', 'Parking log events rejected, by the first failed check.',
+    ['reason'],
+)
+ALERTS_CREATED = Counter(
+    'parking_alerts_created_total', 'Alerts created.', ['alert_type', 'severity'],
+)
+HTTP_REQUESTS = Counter(
+    'parking_http_requests_total', 'HTTP requests by route and status.',
+    ['route', 'method', 'status'],
+)
+HTTP_DURATION = Histogram(
+    'parking_http_request_duration_seconds', 'Time to build the response, by route.', ['route'],
+)
+
+
+# ── Multiprocess snapshots ────────────────────────────
+
+_next_flush = 0.0
+
+
+def _snapshot_path(directory, pid=None):
+    return os.path.join(directory, f'{pid or os.getpid()}.json')
+
+
+def flush():
+    """Write this process's values to METRICS_MULTIPROCESS_DIR (no-op when unset)."""
+    directory = settings.METRICS_MULTIPROCESS_DIR
+    if not directory:
+        return
+    snapshot = {
+        metric.name: [[list(labels), value] for labels, value in metric.collect().items()]
+        for metric in REGISTRY
+    }
+    path = _snapshot_path(directory)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def maybe_flush():
+    """flush() if METRICS_FLUSH_SECONDS have passed since the last one."""
+    global _next_flush
+    if settings.METRICS_MULTIPROCESS_DIR:
+        now = time.monotonic()
+        if now >= _next_flush:
+            _next_flush = now + settings.METRICS_FLUSH_SECONDS
+            flush()
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def collect_all():
+    """{metric name: {label values: value}} of this process, or of every process in multiprocess mode."""
+    directory = settings.METRICS_MULTIPROCESS_DIR
+    if not directory:
+        return {metric.name: metric.collect() for metric in REGISTRY}
+
+    flush()
+    merged = {metric.name: {} for metric in REGISTRY}
+    merge = {metric.name: metric._merge for metric in REGISTRY}
+    for entry in os.scandir(directory):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue  # being replaced
+        for name, rows in snapshot.items():
+            if name not in merged:
+                continue
+            for labels, value in rows:
+                key = tuple(labels)
+                merged[name][key] = merge[name](merged[name].get(key), value)
+    return merged
+
+
+# ── Exposition ────────────────────────────────────────
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _health_lines():
+    from django.db.models import Count, Q
+
+    from .models import Device
+
+    counts = Device.objects.filter(is_active=True).aggregate(**{
+        f'le_{bound}': Count('id', filter=Q(health_score__lte=bound)) for bound in HEALTH_BUCKETS
+    })
+    lines = [
+        '# HELP parking_devices_by_health_score Active devices with a health score at most le.',
+        '# TYPE parking_devices_by_health_score gauge',
+    ]
+    lines += [
+        f'parking_devices_by_health_score{{le="{bound}"}} {counts[f"le_{bound}"]}'
+        for bound in HEALTH_BUCKETS
+    ]
+    return lines
+
+
+def exposition():
+    """All metrics in the Prometheus text format."""
+    values = collect_all()
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for labels, value in sorted(values[metric.name].items()):
+            if metric.kind == 'counter':
+                lines.append(f'{metric.name}{_labels(metric.labels, labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip((*metric.buckets, '+Inf'), value):
+                cumulative += count
+                le = ('le', bound if bound == '+Inf' else repr(float(bound)))
+                lines.append(f'{metric.name}_bucket{_labels(metric.labels, labels, [le])} {cumulative}')
+            lines.append(f'{metric.name}_sum{_labels(metric.labels, labels)} {_number(value[-2])}')
+            lines.append(f'{metric.name}_count{_labels(metric.labels, labels)} {value[-1]}')
+    lines += _health_lines()
+    return '\n'.join(lines) + '\n'
+
+
+def scrape_allowed(request):
+    """Whether `request` may read /metrics (see Access above)."""
+    token = settings.METRICS_TOKEN
+    if token:
+        header = request.headers.get('Authorization', '')
+        if hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in settings.METRICS_ALLOWED_NETWORKS
+    )
+
+
+class MetricsMiddleware:
+    """Counts every request and times it by route (the URL pattern name, not the path)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        HTTP_REQUESTS.inc(route, request.method, response.status_code)
+        HTTP_DURATION.observe(elapsed, route)
+        maybe_flush()
+        return response
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_slot_occupancy(apps, schema_editor):
+    """Seed SlotOccupancy from the latest ParkingLog of each device."""
+    Device = apps.get_model('parking', 'Device')
+    ParkingLog = apps.get_model('parking', 'ParkingLog')
+    SlotOccupancy = apps.get_model('parking', 'SlotOccupancy')
+
+    latest = ParkingLog.objects.filter(device=models.OuterRef('pk')).order_by('-timestamp', '-id')
+    rows = (
+        Device.objects.annotate(
+            last_occupied=models.Subquery(latest.values('is_occupied')[:1]),
+            last_timestamp=models.Subquery(latest.values('timestamp')[:1]),
+        )
+        .filter(last_timestamp__isnull=False)
+        .values_list('id', 'slot__zone_id', 'last_occupied', 'last_timestamp')
+        .order_by()
+    )
+    SlotOccupancy.objects.bulk_create(
+        (
+            SlotOccupancy(device_id=device_id, zone_id=zone_id, is_occupied=occupied, timestamp=ts)
+            for device_id, zone_id, occupied, ts in rows.iterator(chunk_size=1000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0002_device_parkinglog_alert_telemetrydata_parkingtarget'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('device', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='occupancy', serialize=False, to='parking.device')),
+                ('is_occupied', models.BooleanField()),
+                ('timestamp', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_occupancy', to='parking.parkingzone')),
+            ],
+            options={
+                'verbose_name_plural': 'Slot Occupancy',
+                'indexes': [models.Index(fields=['zone', 'is_occupied'], name='slotocc_zone_occupied_idx')],
+            },
+        ),
+        migrations.RunPython(populate_slot_occupancy, migrations.RunPython.noop),
+    ]
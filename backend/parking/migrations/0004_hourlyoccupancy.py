@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:47
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_hourly_occupancy(apps, schema_editor):
+    """Backfill HourlyOccupancy from existing ParkingLog rows."""
+    from django.db.models import Count, Q
+    from django.db.models.functions import ExtractHour, TruncDate
+
+    ParkingLog = apps.get_model('parking', 'ParkingLog')
+    HourlyOccupancy = apps.get_model('parking', 'HourlyOccupancy')
+
+    rows = (
+        ParkingLog.objects.annotate(day=TruncDate('timestamp'), hour=ExtractHour('timestamp'))
+        .values('device__slot__zone_id', 'day', 'hour')
+        .annotate(
+            occupied=Count('id', filter=Q(is_occupied=True)),
+            vacated=Count('id', filter=Q(is_occupied=False)),
+        )
+        .order_by()
+    )
+    HourlyOccupancy.objects.bulk_create(
+        (
+            HourlyOccupancy(
+                zone_id=row['device__slot__zone_id'],
+                date=row['day'],
+                hour=row['hour'],
+                occupied_events=row['occupied'],
+                vacated_events=row['vacated'],
+            )
+            for row in rows.iterator(chunk_size=1000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0003_slotoccupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField(validators=[django.core.validators.MaxValueValidator(23)])),
+                ('occupied_events', models.PositiveIntegerField(default=0)),
+                ('vacated_events', models.PositiveIntegerField(default=0)),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_occupancy', to='parking.parkingzone')),
+            ],
+            options={
+                'verbose_name_plural': 'Hourly Occupancy',
+                'ordering': ['date', 'hour'],
+                'indexes': [models.Index(fields=['date', 'hour'], name='hourlyocc_date_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('zone', 'date', 'hour'), name='hourlyocc_zone_date_hour_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_hourly_occupancy, migrations.RunPython.noop),
+    ]
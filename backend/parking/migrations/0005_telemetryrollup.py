@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0004_hourlyoccupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelemetryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tier', models.CharField(choices=[('1m', '1 minute'), ('15m', '15 minutes'), ('1h', '1 hour')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('voltage_min', models.FloatField()),
+                ('voltage_max', models.FloatField()),
+                ('voltage_sum', models.FloatField()),
+                ('current_min', models.FloatField()),
+                ('current_max', models.FloatField()),
+                ('current_sum', models.FloatField()),
+                ('power_min', models.FloatField()),
+                ('power_max', models.FloatField()),
+                ('power_sum', models.FloatField()),
+                ('energy_wh', models.FloatField(default=0, help_text='Σ power × nominal sample interval (Watt-hours)')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='telemetry_rollups', to='parking.device')),
+            ],
+            options={
+                'ordering': ['-bucket_start'],
+                'indexes': [models.Index(fields=['tier', 'bucket_start'], name='telemetryrollup_tier_ts_idx')],
+                'constraints': [models.UniqueConstraint(fields=('device', 'tier', 'bucket_start'), name='telemetryrollup_bucket_uniq')],
+            },
+        ),
+    ]
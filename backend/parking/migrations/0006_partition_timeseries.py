@@ -0,0 +1,149 @@
+"""
+Convert TelemetryData and ParkingLog to range-partitioned tables on
+PostgreSQL when settings.TIMESERIES_PARTITIONING is "daily" or "monthly".
+
+Does nothing on SQLite or when partitioning is disabled; enabling it later
+is done with `manage.py manage_partitions --convert`.
+
+The DDL below is a frozen copy of parking/partitions.py as of this
+migration, so later changes to that module do not alter what the
+migration does. Only the opt-in setting is read at migrate time.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import migrations
+
+TABLES = ('parking_telemetrydata', 'parking_parkinglog')
+PREMAKE_DAYS = 7
+
+
+def _granularity():
+    value = (getattr(settings, 'TIMESERIES_PARTITIONING', '') or '').lower()
+    return value if value in ('daily', 'monthly') else None
+
+
+def _is_partitioned(cursor, table):
+    cursor.execute("SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(%s)", [table])
+    row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def _periods(first_day, last_day, granularity):
+    start = first_day if granularity == 'daily' else first_day.replace(day=1)
+    while start <= last_day:
+        if granularity == 'daily':
+            end = start + datetime.timedelta(days=1)
+            name = f'p{start:%Y%m%d}'
+        else:
+            end = (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+            name = f'p{start:%Y%m}'
+        yield name, start, end
+        start = end
+
+
+def _bound(day):
+    return datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.timezone.utc)
+
+
+def _rebuild_table(cursor, qn, table, partition_clause, primary_key, before_copy=None):
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = to_regclass(%s) AND contype IN ('u', 'f', 'c')
+        ORDER BY conname
+        """,
+        [table],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT pg_get_indexdef(indexrelid) FROM pg_index
+        WHERE indrelid = to_regclass(%s) AND NOT indisprimary
+          AND indexrelid NOT IN (
+              SELECT conindid FROM pg_constraint WHERE conrelid = to_regclass(%s)
+          )
+        """,
+        [table, table],
+    )
+    indexes = [row[0].replace(' ON ONLY ', ' ON ') for row in cursor.fetchall()]
+
+    legacy = f'{table}_legacy'
+    cursor.execute(f'ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}')
+    cursor.execute(
+        f'CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS '
+        f'INCLUDING IDENTITY INCLUDING STORAGE){partition_clause}'
+    )
+    if before_copy:
+        before_copy(legacy)
+    cursor.execute(f'INSERT INTO {qn(table)} OVERRIDING SYSTEM VALUE SELECT * FROM {qn(legacy)}')
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 0) + 1, false) "
+        f'FROM {qn(table)}',
+        [table],
+    )
+    cursor.execute(f'DROP TABLE {qn(legacy)}')
+    cursor.execute(
+        f"ALTER TABLE {qn(table)} ADD PRIMARY KEY ({', '.join(qn(c) for c in primary_key)})"
+    )
+    for name, definition in constraints:
+        cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}')
+    for definition in indexes:
+        cursor.execute(definition)
+
+
+def partition_tables(apps, schema_editor):
+    granularity = _granularity()
+    connection = schema_editor.connection
+    if not granularity or connection.vendor != 'postgresql':
+        return
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for table in TABLES:
+            if _is_partitioned(cursor, table):
+                continue
+
+            def make_partitions(legacy, table=table):
+                cursor.execute(f'SELECT MIN("timestamp"), MAX("timestamp") FROM {qn(legacy)}')
+                first, last = cursor.fetchone()
+                today = datetime.datetime.now(datetime.timezone.utc).date()
+                first_day = first.astimezone(datetime.timezone.utc).date() if first else today
+                last_day = max(last.astimezone(datetime.timezone.utc).date() if last else today, today)
+                cursor.execute(f'CREATE TABLE {qn(table + "_pdefault")} PARTITION OF {qn(table)} DEFAULT')
+                for suffix, start, end in _periods(
+                    first_day, last_day + datetime.timedelta(days=PREMAKE_DAYS), granularity
+                ):
+                    cursor.execute(
+                        f'CREATE TABLE {qn(f"{table}_{suffix}")} PARTITION OF {qn(table)} '
+                        f'FOR VALUES FROM (%s) TO (%s)',
+                        [_bound(start), _bound(end)],
+                    )
+
+            _rebuild_table(
+                cursor, qn, table,
+                partition_clause=' PARTITION BY RANGE ("timestamp")',
+                primary_key=('id', 'timestamp'),
+                before_copy=make_partitions,
+            )
+
+
+def unpartition_tables(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for table in TABLES:
+            if _is_partitioned(cursor, table):
+                _rebuild_table(cursor, qn, table, partition_clause='', primary_key=('id',))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0005_telemetryrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:57
+
+from collections import defaultdict
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def populate_health_state(apps, schema_editor):
+    """Count open alerts per device and seed the health windows from the 1-minute rollups."""
+    Alert = apps.get_model('parking', 'Alert')
+    Device = apps.get_model('parking', 'Device')
+    DeviceHealthState = apps.get_model('parking', 'DeviceHealthState')
+    TelemetryRollup = apps.get_model('parking', 'TelemetryRollup')
+
+    open_alerts = (
+        Alert.objects.filter(device=models.OuterRef('pk'), is_acknowledged=False)
+        .order_by()
+        .values('device')
+        .annotate(count=models.Count('id'))
+        .values('count')
+    )
+    Device.objects.update(
+        open_alert_count=Coalesce(models.Subquery(open_alerts), 0)
+    )
+
+    since = (timezone.now() - timedelta(hours=1)).replace(second=0, microsecond=0)
+    buckets = defaultdict(list)
+    for device_id, start, count, voltage_sum, power_sum in (
+        TelemetryRollup.objects.filter(tier='1m', bucket_start__gte=since)
+        .order_by('device_id', 'bucket_start')
+        .values_list('device_id', 'bucket_start', 'sample_count', 'voltage_sum', 'power_sum')
+    ):
+        buckets[device_id].append([int(start.timestamp()) // 60, count, voltage_sum, power_sum])
+    DeviceHealthState.objects.bulk_create(
+        (
+            DeviceHealthState(device_id=device_id, buckets=buckets.get(device_id, []))
+            for device_id in Device.objects.values_list('id', flat=True).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0006_partition_timeseries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceHealthState',
+            fields=[
+                ('device', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='health_state', serialize=False, to='parking.device')),
+                ('buckets', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Device Health State',
+            },
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='open_alert_count',
+            field=models.PositiveIntegerField(default=0, help_text='Unacknowledged alerts; maintained on alert create/acknowledge'),
+        ),
+        migrations.RunPython(populate_health_state, migrations.RunPython.noop),
+    ]
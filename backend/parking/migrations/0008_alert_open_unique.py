@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:09
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def acknowledge_duplicate_open_alerts(apps, schema_editor):
+    """
+    Keep the oldest open alert per (device, alert_type) and acknowledge the
+    rest so the partial unique index can be built, then recount
+    Device.open_alert_count.
+    """
+    Alert = apps.get_model('parking', 'Alert')
+    Device = apps.get_model('parking', 'Device')
+
+    open_alerts = Alert.objects.filter(is_acknowledged=False, device__isnull=False)
+    keep = (
+        open_alerts.values('device_id', 'alert_type')
+        .annotate(first_id=models.Min('id'))
+        .values_list('first_id', flat=True)
+        .order_by()
+    )
+    duplicates = open_alerts.exclude(id__in=list(keep)).values_list('id', flat=True)
+    duplicate_ids = list(duplicates)
+    for i in range(0, len(duplicate_ids), 1000):
+        Alert.objects.filter(id__in=duplicate_ids[i:i + 1000]).update(
+            is_acknowledged=True, acknowledged_at=timezone.now()
+        )
+
+    counts = (
+        Alert.objects.filter(device=models.OuterRef('pk'), is_acknowledged=False)
+        .order_by()
+        .values('device')
+        .annotate(count=models.Count('id'))
+        .values('count')
+    )
+    Device.objects.update(open_alert_count=Coalesce(models.Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0007_device_health_state'),
+    ]
+
+    operations = [
+        migrations.RunPython(acknowledge_duplicate_open_alerts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='alert',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_acknowledged', False)), fields=('device', 'alert_type'), name='alert_open_device_type_uniq'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:14
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    TopologyVersion = apps.get_model('parking', 'TopologyVersion')
+    TopologyVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0008_alert_open_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopologyVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
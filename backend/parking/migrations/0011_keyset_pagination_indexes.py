@@ -0,0 +1,61 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_log_zone(apps, schema_editor):
+    ParkingLog = apps.get_model('parking', 'ParkingLog')
+    Device = apps.get_model('parking', 'Device')
+    ParkingLog.objects.filter(zone__isnull=True).update(
+        zone_id=Subquery(Device.objects.filter(pk=OuterRef('device_id')).values('slot__zone_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0010_sync_cursors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parkinglog',
+            name='zone',
+            field=models.ForeignKey(db_index=False, editable=False, help_text="Zone of the device's slot when the event was recorded; set on save", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='parking_logs', to='parking.parkingzone'),
+        ),
+        migrations.RunPython(backfill_log_zone, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='parkinglog',
+            name='zone',
+            field=models.ForeignKey(db_index=False, editable=False, help_text="Zone of the device's slot when the event was recorded; set on save", on_delete=django.db.models.deletion.CASCADE, related_name='parking_logs', to='parking.parkingzone'),
+        ),
+        migrations.AlterField(
+            model_name='parkinglog',
+            name='timestamp',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='parkinglog',
+            index=models.Index(fields=['-timestamp', '-id'], name='parkinglog_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkinglog',
+            index=models.Index(fields=['zone', '-timestamp', '-id'], name='parkinglog_zone_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['-created_at', '-id'], name='alert_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['severity', '-created_at', '-id'], name='alert_severity_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['alert_type', '-created_at', '-id'], name='alert_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['is_acknowledged', '-created_at', '-id'], name='alert_ack_created_idx'),
+        ),
+    ]
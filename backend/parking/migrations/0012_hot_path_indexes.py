@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0011_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(condition=models.Q(('is_acknowledged', False)), fields=['severity'], name='alert_open_severity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(condition=models.Q(('is_acknowledged', True)), fields=['acknowledged_at'], name='alert_acked_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkinglog',
+            index=models.Index(fields=['device', '-timestamp', '-id'], name='parkinglog_device_ts_idx'),
+        ),
+        migrations.AlterField(
+            model_name='hourlyoccupancy',
+            name='zone',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='hourly_occupancy', to='parking.parkingzone'),
+        ),
+        migrations.AlterField(
+            model_name='parkinglog',
+            name='device',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='parking_logs', to='parking.device'),
+        ),
+        migrations.AlterField(
+            model_name='slotoccupancy',
+            name='zone',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='slot_occupancy', to='parking.parkingzone'),
+        ),
+        migrations.AlterField(
+            model_name='telemetrydata',
+            name='device',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='telemetry', to='parking.device'),
+        ),
+        migrations.AlterField(
+            model_name='telemetryrollup',
+            name='device',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='telemetry_rollups', to='parking.device'),
+        ),
+    ]
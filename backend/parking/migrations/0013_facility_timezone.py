@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:38
+
+import parking.timeutils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0012_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parkingfacility',
+            name='timezone',
+            field=models.CharField(default=parking.timeutils.default_timezone_name, help_text="IANA time zone of the site (e.g. 'Asia/Kolkata'); dates and hourly buckets of its zones are local to it", max_length=64, validators=[parking.timeutils.validate_timezone]),
+        ),
+    ]
@@ -0,0 +1,72 @@
+"""
+Key the DeviceHealthState window entries by reading timestamp (epoch
+microseconds) instead of epoch minute, so the window starts at exactly
+now - 1h. The windows are re-derived from the last hour of raw telemetry;
+going back re-derives minute buckets from the 1-minute rollups as 0007 did.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import migrations
+from django.utils import timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _epoch_us(moment):
+    delta = moment - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _write_windows(apps, buckets):
+    Device = apps.get_model('parking', 'Device')
+    DeviceHealthState = apps.get_model('parking', 'DeviceHealthState')
+    DeviceHealthState.objects.all().delete()
+    DeviceHealthState.objects.bulk_create(
+        (
+            DeviceHealthState(device_id=device_id, buckets=sorted(buckets.get(device_id, {}).values()))
+            for device_id in Device.objects.values_list('id', flat=True).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+def windows_by_reading(apps, schema_editor):
+    TelemetryData = apps.get_model('parking', 'TelemetryData')
+    buckets = defaultdict(dict)
+    for device_id, timestamp, voltage, power in (
+        TelemetryData.objects.filter(timestamp__gte=timezone.now() - timedelta(hours=1))
+        .order_by()
+        .values_list('device_id', 'timestamp', 'voltage', 'power_consumption')
+    ):
+        moment = _epoch_us(timestamp)
+        bucket = buckets[device_id].setdefault(moment, [moment, 0, 0.0, 0.0])
+        bucket[1] += 1
+        bucket[2] += voltage
+        bucket[3] += power
+    _write_windows(apps, buckets)
+
+
+def windows_by_minute(apps, schema_editor):
+    TelemetryRollup = apps.get_model('parking', 'TelemetryRollup')
+    since = (timezone.now() - timedelta(hours=1)).replace(second=0, microsecond=0)
+    buckets = defaultdict(dict)
+    for device_id, start, count, voltage_sum, power_sum in (
+        TelemetryRollup.objects.filter(tier='1m', bucket_start__gte=since)
+        .order_by()
+        .values_list('device_id', 'bucket_start', 'sample_count', 'voltage_sum', 'power_sum')
+    ):
+        minute = int(start.timestamp()) // 60
+        buckets[device_id][minute] = [minute, count, voltage_sum, power_sum]
+    _write_windows(apps, buckets)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0014_request_profile'),
+    ]
+
+    operations = [
+        migrations.RunPython(windows_by_reading, windows_by_minute),
+    ]
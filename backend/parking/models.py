@@ -1,11 +1,19 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+from .timeutils import default_timezone_name, epoch_us, validate_timezone
 
 
 class ParkingFacility(models.Model):
     """Represents a physical parking facility / site."""
     name = models.CharField(max_length=200)
     address = models.TextField(blank=True, default='')
+    timezone = models.CharField(
+        max_length=64, default=default_timezone_name, validators=[validate_timezone],
+        help_text="IANA time zone of the site (e.g. 'Asia/Kolkata'); dates and hourly "
+                  "buckets of its zones are local to it",
+    )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -73,7 +81,15 @@ class Device(models.Model):
         default=100,
         validators=[MinValueValidator(0), MaxValueValidator(100)]
     )
+    open_alert_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Unacknowledged alerts; maintained on alert create/acknowledge"
+    )
     installed_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True,
+        help_text="Last change to a field served by /api/sync/ (see parking/sync.py)"
+    )
 
     class Meta:
         ordering = ['device_code']
@@ -85,7 +101,8 @@ class Device(models.Model):
 class TelemetryData(models.Model):
     """Time-series telemetry data received from devices."""
     device = models.ForeignKey(
-        Device, on_delete=models.CASCADE, related_name='telemetry'
+        Device, on_delete=models.CASCADE, related_name='telemetry',
+        db_index=False,  # led by the (device, timestamp) unique index
     )
     voltage = models.FloatField(help_text="Voltage in Volts")
     current = models.FloatField(help_text="Current in Amperes")
@@ -103,32 +120,247 @@ class TelemetryData(models.Model):
         unique_together = ['device', 'timestamp']
         verbose_name_plural = 'Telemetry Data'
 
+    def compute_power_consumption(self):
+        """Set power_consumption from voltage × current × power_factor.
+
+        Called by save(); bulk_create() bypasses save(), so bulk ingestion
+        calls this explicitly before inserting.
+        """
+        self.power_consumption = round(self.voltage * self.current * self.power_factor, 2)
+        return self.power_consumption
+
     def save(self, *args, **kwargs):
         """Compute power consumption before saving."""
-        self.power_consumption = round(self.voltage * self.current * self.power_factor, 2)
+        self.compute_power_consumption()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.device.device_code} @ {self.timestamp}"
 
 
+class TelemetryRollup(models.Model):
+    """
+    Downsampled telemetry per device at 1-minute, 15-minute and hourly tiers.
+
+    Sums are stored instead of averages so buckets can be merged
+    incrementally on ingest (see parking/rollups.py); averages are derived
+    as sum / sample_count. Each tier has its own retention window
+    (settings.TELEMETRY_RETENTION_DAYS), so raw samples can expire while the
+    aggregates remain.
+    """
+    TIER_1MIN = '1m'
+    TIER_15MIN = '15m'
+    TIER_HOUR = '1h'
+    TIERS = [
+        (TIER_1MIN, '1 minute'),
+        (TIER_15MIN, '15 minutes'),
+        (TIER_HOUR, '1 hour'),
+    ]
+    TIER_SECONDS = {TIER_1MIN: 60, TIER_15MIN: 15 * 60, TIER_HOUR: 60 * 60}
+
+    device = models.ForeignKey(
+        Device, on_delete=models.CASCADE, related_name='telemetry_rollups',
+        db_index=False,  # led by telemetryrollup_bucket_uniq
+    )
+    tier = models.CharField(max_length=4, choices=TIERS)
+    bucket_start = models.DateTimeField()
+    sample_count = models.PositiveIntegerField(default=0)
+    voltage_min = models.FloatField()
+    voltage_max = models.FloatField()
+    voltage_sum = models.FloatField()
+    current_min = models.FloatField()
+    current_max = models.FloatField()
+    current_sum = models.FloatField()
+    power_min = models.FloatField()
+    power_max = models.FloatField()
+    power_sum = models.FloatField()
+    energy_wh = models.FloatField(
+        default=0,
+        help_text="Σ power × nominal sample interval (Watt-hours)"
+    )
+
+    class Meta:
+        ordering = ['-bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['device', 'tier', 'bucket_start'], name='telemetryrollup_bucket_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['tier', 'bucket_start'], name='telemetryrollup_tier_ts_idx'),
+        ]
+
+    @property
+    def voltage_avg(self):
+        return self.voltage_sum / self.sample_count if self.sample_count else None
+
+    @property
+    def current_avg(self):
+        return self.current_sum / self.sample_count if self.sample_count else None
+
+    @property
+    def power_avg(self):
+        return self.power_sum / self.sample_count if self.sample_count else None
+
+    def __str__(self):
+        return f"{self.device.device_code} [{self.tier}] @ {self.bucket_start}"
+
+
+class DeviceHealthState(models.Model):
+    """
+    Rolling one-hour window of a device's voltage and power, for streaming
+    health scoring.
+
+    `buckets` holds [epoch_microsecond, sample_count, voltage_sum,
+    power_sum] entries, one per reading timestamp, so the window can start
+    at exactly now - 1h like a raw AVG over the hour. The 1-minute
+    duplicate check keeps that to about 60 entries. Folding in a sample
+    and scoring the device are O(1) instead of an aggregate over the last
+    hour. Entries that fall out of the window are dropped on write.
+    Rebuild from raw telemetry with `manage.py rebuild_health_state`.
+    """
+    device = models.OneToOneField(
+        Device, on_delete=models.CASCADE, primary_key=True, related_name='health_state'
+    )
+    buckets = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Device Health State'
+
+    def add_samples(self, samples, window_start):
+        """Fold telemetry samples into the window and drop entries before `window_start` (epoch µs)."""
+        buckets = {b[0]: b for b in self.buckets if b[0] >= window_start}
+        for sample in samples:
+            moment = epoch_us(sample.timestamp)
+            if moment < window_start:
+                continue
+            bucket = buckets.setdefault(moment, [moment, 0, 0.0, 0.0])
+            bucket[1] += 1
+            bucket[2] += sample.voltage
+            bucket[3] += sample.power_consumption
+        self.buckets = sorted(buckets.values())
+
+    def averages(self, window_start):
+        """(avg_voltage, avg_power) over entries from `window_start` (epoch µs), or (None, None)."""
+        count = voltage_sum = power_sum = 0
+        for moment, n, voltage, power in self.buckets:
+            if moment >= window_start:
+                count += n
+                voltage_sum += voltage
+                power_sum += power
+        if not count:
+            return None, None
+        return voltage_sum / count, power_sum / count
+
+    def __str__(self):
+        return f"{self.device_id} health window ({len(self.buckets)} reading(s))"
+
+
 class ParkingLog(models.Model):
     """Records when a parking slot becomes occupied or free."""
     device = models.ForeignKey(
-        Device, on_delete=models.CASCADE, related_name='parking_logs'
+        Device, on_delete=models.CASCADE, related_name='parking_logs',
+        db_index=False,  # led by parkinglog_device_ts_idx
+    )
+    zone = models.ForeignKey(
+        ParkingZone, on_delete=models.CASCADE, related_name='parking_logs', editable=False,
+        db_index=False,  # covered by parkinglog_zone_ts_idx
+        help_text="Zone of the device's slot when the event was recorded; set on save"
     )
     is_occupied = models.BooleanField()
-    timestamp = models.DateTimeField(db_index=True)
+    timestamp = models.DateTimeField()
     received_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination order of GET /api/parking-logs/
+            models.Index(fields=['-timestamp', '-id'], name='parkinglog_ts_id_idx'),
+            models.Index(fields=['zone', '-timestamp', '-id'], name='parkinglog_zone_ts_idx'),
+            # Latest event per device (rebuild_occupancy)
+            models.Index(fields=['device', '-timestamp', '-id'], name='parkinglog_device_ts_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Fill in the zone from the device; bulk_create callers set zone_id themselves."""
+        if self.zone_id is None:
+            self.zone_id = self.device.slot.zone_id
+        super().save(*args, **kwargs)
 
     def __str__(self):
         status = "Occupied" if self.is_occupied else "Free"
         return f"{self.device.device_code} → {status} @ {self.timestamp}"
 
 
+class SlotOccupancy(models.Model):
+    """
+    Materialized current occupancy of a device's slot.
+
+    Maintained by ParkingLog ingestion so that "how many slots are occupied
+    right now" is a grouped COUNT instead of a latest-log lookup per slot.
+    `timestamp` is the event time of the log that set the current state;
+    older (out-of-order) events never overwrite a newer state.
+    Rebuild from ParkingLog with `manage.py rebuild_occupancy`.
+    """
+    device = models.OneToOneField(
+        Device, on_delete=models.CASCADE, primary_key=True, related_name='occupancy'
+    )
+    zone = models.ForeignKey(
+        ParkingZone, on_delete=models.CASCADE, related_name='slot_occupancy',
+        db_index=False,  # led by slotocc_zone_occupied_idx
+    )
+    is_occupied = models.BooleanField()
+    timestamp = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name_plural = 'Slot Occupancy'
+        indexes = [
+            models.Index(fields=['zone', 'is_occupied'], name='slotocc_zone_occupied_idx'),
+        ]
+
+    def __str__(self):
+        status = "Occupied" if self.is_occupied else "Free"
+        return f"{self.device_id} → {status} since {self.timestamp}"
+
+
+class HourlyOccupancy(models.Model):
+    """
+    Hourly rollup of ParkingLog events per zone.
+
+    Incremented on every ParkingLog ingest so the hourly chart, targets and
+    dashboard efficiency read at most zones × 24 rows per day instead of
+    scanning raw logs. Rebuild from ParkingLog with
+    `manage.py rebuild_hourly_rollup`.
+    """
+    zone = models.ForeignKey(
+        ParkingZone, on_delete=models.CASCADE, related_name='hourly_occupancy',
+        db_index=False,  # led by hourlyocc_zone_date_hour_uniq
+    )
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField(
+        validators=[MaxValueValidator(23)]
+    )
+    occupied_events = models.PositiveIntegerField(default=0)
+    vacated_events = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Hourly Occupancy'
+        ordering = ['date', 'hour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['zone', 'date', 'hour'], name='hourlyocc_zone_date_hour_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'hour'], name='hourlyocc_date_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.zone.name} {self.date} {self.hour:02d}:00"
+
+
 class Alert(models.Model):
     """System-generated alerts for abnormal conditions."""
     ALERT_TYPES = [
@@ -157,9 +389,41 @@ class Alert(models.Model):
     is_acknowledged = models.BooleanField(default=False)
     acknowledged_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['-created_at']
+        # Match the keyset pagination order of GET /api/alerts/, alone and
+        # behind each of its equality filters
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='alert_created_id_idx'),
+            models.Index(
+                fields=['severity', '-created_at', '-id'], name='alert_severity_created_idx'
+            ),
+            models.Index(fields=['alert_type', '-created_at', '-id'], name='alert_type_created_idx'),
+            models.Index(
+                fields=['is_acknowledged', '-created_at', '-id'], name='alert_ack_created_idx'
+            ),
+            # Open counts by severity (dashboard summary)
+            models.Index(
+                fields=['severity'], condition=models.Q(is_acknowledged=False),
+                name='alert_open_severity_idx',
+            ),
+            # Retention purge of acknowledged alerts
+            models.Index(
+                fields=['acknowledged_at'], condition=models.Q(is_acknowledged=True),
+                name='alert_acked_at_idx',
+            ),
+        ]
+        constraints = [
+            # At most one open alert per device and type; alert creation
+            # relies on this to deduplicate without a lookup
+            models.UniqueConstraint(
+                fields=['device', 'alert_type'],
+                condition=models.Q(is_acknowledged=False),
+                name='alert_open_device_type_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"[{self.severity}] {self.alert_type} — {self.message[:50]}"
@@ -188,3 +452,74 @@ class ParkingTarget(models.Model):
         return f"{self.zone.name} target for {self.date}"
 
 
+
+
+class TopologyVersion(models.Model):
+    """
+    Single-row counter bumped whenever a facility, zone, slot or device
+    changes. Ingest workers keep an in-process topology snapshot
+    (parking/topology.py) and reload it when this version moves.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Topology v{self.version}"
+
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted device, alert or slot occupancy row, so that
+    /api/sync/ clients holding it can drop it. Kept for
+    SYNC_TOMBSTONE_RETENTION_DAYS; a client whose cursor is older than that
+    is told to resync from scratch.
+    """
+    KIND_DEVICE = 'device'
+    KIND_ALERT = 'alert'
+    KIND_OCCUPANCY = 'occupancy'
+    KINDS = [
+        (KIND_DEVICE, 'Device'),
+        (KIND_ALERT, 'Alert'),
+        (KIND_OCCUPANCY, 'Slot occupancy'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['-deleted_at']
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted @ {self.deleted_at}"
+
+
+class RequestProfile(models.Model):
+    """
+    A profile of one request, taken on demand by ProfilingMiddleware
+    (parking/profiling.py). The profile itself is a file in PROFILE_DIR:
+    pstats for cProfile, collapsed stacks for the sampler. Only the newest
+    PROFILE_KEEP are kept.
+    """
+    MODE_CPROFILE = 'cprofile'
+    MODE_SAMPLE = 'sample'
+    MODES = [
+        (MODE_CPROFILE, 'cProfile (pstats)'),
+        (MODE_SAMPLE, 'Sampler (collapsed stacks)'),
+    ]
+
+    mode = models.CharField(max_length=10, choices=MODES)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    query_string = models.CharField(max_length=1000, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    file_name = models.CharField(max_length=200)
+    requested_by = models.CharField(max_length=150, help_text='Staff username, or "token"')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.mode}) @ {self.created_at}"
@@ -0,0 +1,130 @@
+"""
+Keyset (cursor) pagination for the newest-first log and alert lists.
+
+OFFSET pagination reads and discards every row before the requested page,
+so page N costs N pages. Here a page starts right after the (key, id) of
+the last row the client saw:
+
+    WHERE key <= %s AND NOT (key = %s AND id >= %s)
+    ORDER BY key DESC, id DESC
+    LIMIT page_size + 1
+
+With a composite (key DESC, id DESC) index, optionally led by an equality
+filter column, every page is one index range scan of page_size + 1 rows,
+however deep. The id breaks ties between rows sharing a timestamp (e.g. a
+batch of alerts raised by the same scan).
+
+Responses follow DRF's CursorPagination shape:
+{"next": url|null, "previous": url|null, "results": [...]}. Cursors are
+opaque base64 tokens carrying the boundary key at full precision.
+"""
+from base64 import b64decode, b64encode
+from datetime import datetime
+from urllib import parse
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Newest-first pages over (`key_field`, id); subclasses set key_field."""
+
+    key_field = None
+    page_size = 200
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        key = self.key_field
+
+        if cursor is None:
+            reverse = False
+            rows = queryset.order_by(f'-{key}', '-id')
+        else:
+            value, pk, reverse = cursor
+            if reverse:
+                rows = (
+                    queryset.filter(**{f'{key}__gte': value})
+                    .exclude(**{key: value, 'id__lte': pk})
+                    .order_by(key, 'id')
+                )
+            else:
+                rows = (
+                    queryset.filter(**{f'{key}__lte': value})
+                    .exclude(**{key: value, 'id__gte': pk})
+                    .order_by(f'-{key}', '-id')
+                )
+
+        page = list(rows[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    # ── Cursor encoding ───────────────────────────────
+
+    def encode_cursor(self, row, reverse):
+        value = getattr(row, self.key_field)
+        tokens = {'k': value.isoformat(), 'i': row.pk}
+        if reverse:
+            tokens['r'] = 1
+        encoded = b64encode(parse.urlencode(tokens).encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode()).decode(), keep_blank_values=True)
+            value = datetime.fromisoformat(tokens['k'][0])
+            pk = int(tokens['i'][0])
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, reverse
+
+
+class ParkingLogPagination(KeysetPagination):
+    key_field = 'timestamp'
+
+
+class AlertPagination(KeysetPagination):
+    key_field = 'created_at'
@@ -0,0 +1,282 @@
+"""
+Time-range partitioning for the time-series tables on PostgreSQL.
+
+When settings.TIMESERIES_PARTITIONING is "daily" or "monthly", TelemetryData
+and ParkingLog are declaratively partitioned by RANGE ("timestamp"):
+
+    parking_telemetrydata            (partitioned parent)
+    ├── parking_telemetrydata_p20260217   [2026-02-17, 2026-02-18)
+    ├── parking_telemetrydata_p20260218   ...
+    └── parking_telemetrydata_pdefault    (rows outside every range)
+
+Range filters on "timestamp" prune to the matching partitions, and expiring
+old data is a DETACH/DROP of whole partitions instead of a large DELETE.
+Partition bounds are UTC-aligned. PostgreSQL requires the primary key to
+include the partition key, so partitioned tables use PRIMARY KEY
+(id, "timestamp"); Django still addresses rows by id.
+
+SQLite (and PostgreSQL with partitioning disabled) keeps plain tables; every
+function here is a no-op there. Migration 0006 runs a frozen copy of the
+conversion; run it later with `manage.py manage_partitions --convert`.
+"""
+import datetime
+import re
+
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+
+GRANULARITIES = ('daily', 'monthly')
+DEFAULT_SUFFIX = '_pdefault'
+_SUFFIX_RE = re.compile(r'_p(\d{8}|\d{6})$')
+
+
+def configured_granularity():
+    """'daily', 'monthly' or None, from settings.TIMESERIES_PARTITIONING."""
+    value = (getattr(settings, 'TIMESERIES_PARTITIONING', '') or '').lower()
+    return value if value in GRANULARITIES else None
+
+
+def is_supported(connection=default_connection):
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned(table, connection=default_connection):
+    if not is_supported(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(%s)", [table]
+        )
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+# ── Period arithmetic ─────────────────────────────────
+
+
+def period_start(day, granularity):
+    return day if granularity == 'daily' else day.replace(day=1)
+
+
+def next_period(start, granularity):
+    if granularity == 'daily':
+        return start + datetime.timedelta(days=1)
+    return (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def partition_name(table, start, granularity):
+    return f"{table}_p{start:%Y%m%d}" if granularity == 'daily' else f"{table}_p{start:%Y%m}"
+
+
+def _bound(day):
+    return datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.timezone.utc)
+
+
+def _parse_suffix(name):
+    """(start, granularity) encoded in a partition name, or None."""
+    match = _SUFFIX_RE.search(name)
+    if not match:
+        return None
+    digits = match.group(1)
+    if len(digits) == 8:
+        return datetime.datetime.strptime(digits, '%Y%m%d').date(), 'daily'
+    return datetime.datetime.strptime(digits, '%Y%m').date(), 'monthly'
+
+
+# ── Partition maintenance ─────────────────────────────
+
+
+def list_partitions(table, connection=default_connection):
+    """Names of the partitions attached to `table`."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            ORDER BY c.relname
+            """,
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_partitions(table, first_day, last_day, granularity, connection=default_connection):
+    """
+    Create any missing partitions covering [first_day, last_day] plus the
+    default partition. Returns the names of the partitions created.
+
+    Rows of a new range that already landed in the default partition are
+    moved into it first; PostgreSQL refuses to create the partition while
+    the default one holds rows in its range.
+    """
+    qn = connection.ops.quote_name
+    existing = set(list_partitions(table, connection))
+    default = table + DEFAULT_SUFFIX
+    created = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        if default not in existing:
+            cursor.execute(f"CREATE TABLE {qn(default)} PARTITION OF {qn(table)} DEFAULT")
+            created.append(default)
+
+        start = period_start(first_day, granularity)
+        while start <= last_day:
+            end = next_period(start, granularity)
+            name = partition_name(table, start, granularity)
+            if name not in existing:
+                bounds = [_bound(start), _bound(end)]
+                cursor.execute(
+                    f'SELECT EXISTS (SELECT 1 FROM {qn(default)} '
+                    f'WHERE "timestamp" >= %s AND "timestamp" < %s)',
+                    bounds,
+                )
+                if cursor.fetchone()[0]:
+                    _attach_with_rows(cursor, qn, table, default, name, bounds)
+                else:
+                    cursor.execute(
+                        f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} "
+                        f"FOR VALUES FROM (%s) TO (%s)",
+                        bounds,
+                    )
+                created.append(name)
+            start = end
+    return created
+
+
+def _attach_with_rows(cursor, qn, table, default, name, bounds):
+    """Create partition `name` as a plain table, move its rows out of `default`, then attach it."""
+    cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS)")
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {qn(default)} '
+        f'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+        f'INSERT INTO {qn(name)} SELECT * FROM moved',
+        bounds,
+    )
+    # Attaching builds the parent's indexes and constraints on the new table
+    cursor.execute(
+        f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES FROM (%s) TO (%s)",
+        bounds,
+    )
+
+
+def expired_partitions(table, cutoff_day, connection=default_connection):
+    """Partitions whose whole range lies before `cutoff_day`."""
+    expired = []
+    for name in list_partitions(table, connection):
+        parsed = _parse_suffix(name)
+        if parsed and next_period(*parsed) <= cutoff_day:
+            expired.append(name)
+    return expired
+
+
+def drop_partitions(table, names, detach_only=False, connection=default_connection):
+    """Detach `names` from `table` and, unless `detach_only`, drop them."""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for name in names:
+            cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}")
+            if not detach_only:
+                cursor.execute(f"DROP TABLE {qn(name)}")
+    return list(names)
+
+
+# ── Conversion ────────────────────────────────────────
+
+
+def _table_definitions(table, cursor):
+    """Constraint and standalone index DDL of `table`, excluding the primary key."""
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = to_regclass(%s) AND contype IN ('u', 'f', 'c')
+        ORDER BY conname
+        """,
+        [table],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT pg_get_indexdef(indexrelid) FROM pg_index
+        WHERE indrelid = to_regclass(%s) AND NOT indisprimary
+          AND indexrelid NOT IN (
+              SELECT conindid FROM pg_constraint WHERE conrelid = to_regclass(%s)
+          )
+        """,
+        [table, table],
+    )
+    indexes = [row[0].replace(' ON ONLY ', ' ON ') for row in cursor.fetchall()]
+    return constraints, indexes
+
+
+def _rebuild_table(table, connection, partition_clause, primary_key, before_copy=None):
+    """
+    Recreate `table` with the same columns, constraints and indexes, an
+    optional PARTITION BY clause and the given primary key columns, copying
+    every row across. Runs inside the caller's transaction.
+    """
+    qn = connection.ops.quote_name
+    legacy = f"{table}_legacy"
+    with connection.cursor() as cursor:
+        constraints, indexes = _table_definitions(table, cursor)
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS "
+            f"INCLUDING IDENTITY INCLUDING STORAGE){partition_clause}"
+        )
+        if before_copy:
+            before_copy(cursor, legacy)
+        cursor.execute(f"INSERT INTO {qn(table)} OVERRIDING SYSTEM VALUE SELECT * FROM {qn(legacy)}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 0) + 1, false) "
+            f"FROM {qn(table)}",
+            [table],
+        )
+        cursor.execute(f"DROP TABLE {qn(legacy)}")
+        # Added after the legacy table is gone so the key keeps its usual name
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ADD PRIMARY KEY ({', '.join(qn(c) for c in primary_key)})"
+        )
+        for name, definition in constraints:
+            cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}")
+        for definition in indexes:
+            cursor.execute(definition)
+
+
+def convert_to_partitioned(table, granularity, premake_days=7, connection=default_connection):
+    """
+    Convert a plain table into a RANGE ("timestamp") partitioned table,
+    creating partitions for every period that holds data plus `premake_days`
+    into the future. No-op if the table is already partitioned.
+    Returns the names of the partitions created.
+    """
+    if not is_supported(connection) or is_partitioned(table, connection):
+        return []
+    created = []
+
+    def make_partitions(cursor, legacy):
+        cursor.execute(
+            f'SELECT MIN("timestamp"), MAX("timestamp") FROM {connection.ops.quote_name(legacy)}'
+        )
+        first, last = cursor.fetchone()
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        first_day = first.astimezone(datetime.timezone.utc).date() if first else today
+        last_day = max(last.astimezone(datetime.timezone.utc).date() if last else today, today)
+        created.extend(create_partitions(
+            table, first_day, last_day + datetime.timedelta(days=premake_days),
+            granularity, connection,
+        ))
+
+    _rebuild_table(
+        table, connection,
+        partition_clause=' PARTITION BY RANGE ("timestamp")',
+        primary_key=('id', 'timestamp'),
+        before_copy=make_partitions,
+    )
+    return created
+
+
+def convert_to_plain(table, connection=default_connection):
+    """Reverse of convert_to_partitioned: fold all partitions back into one table."""
+    if not is_partitioned(table, connection):
+        return
+    _rebuild_table(table, connection, partition_clause='', primary_key=('id',))
@@ -0,0 +1,260 @@
+"""
+On-demand request profiling (ProfilingMiddleware).
+
+A request is profiled when it asks to be and is allowed to:
+
+    X-Profile: <token>      a token from `manage.py profile_token`, signed
+                            with SECRET_KEY and valid for
+                            PROFILE_TOKEN_MAX_AGE seconds
+    ?profile=1              from a logged-in staff user (admin session)
+
+Two profilers are available. The header X-Profile-Mode, or the query
+value (?profile=sample), picks one; the default is PROFILE_DEFAULT_MODE.
+
+    cprofile  cProfile around the rest of the middleware chain, the view
+              and DRF's rendering. Saved as a .prof pstats file, for
+              `python -m pstats` or snakeviz.
+    sample    a thread that reads the request thread's stack every
+              PROFILE_SAMPLE_INTERVAL_MS. The overhead stays low and does
+              not grow with call counts. Saved as a .collapsed file (one
+              "frame;frame;frame count" line per stack), for flamegraph.pl
+              or speedscope.
+
+The file goes to PROFILE_DIR, a RequestProfile row records it, and the
+response carries X-Profile-Id. Admin ▸ Request profiles lists them and
+downloads the files. Only the newest PROFILE_KEEP are kept.
+
+Two limits keep profiling from being used to load the server. At most
+PROFILE_RATE_LIMIT profiles are taken per PROFILE_RATE_WINDOW_SECONDS,
+counted in the cache, and one at a time per process. A request over a
+limit is served normally, with `X-Profile: skipped`.
+
+The rate limit spans all workers only if they share the cache. The
+default LocMemCache is per-process, so each worker gets its own
+PROFILE_RATE_LIMIT. The middleware logs a warning at startup when it
+finds one outside DEBUG.
+"""
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import RequestProfile
+
+TOKEN_SALT = 'parking.profile'
+_active = threading.Lock()
+_warned_per_process_cache = False
+logger = logging.getLogger(__name__)
+
+
+# ── Authorization ─────────────────────────────────────
+
+
+def make_token():
+    """A signed X-Profile token, valid for PROFILE_TOKEN_MAX_AGE seconds."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def requester(request):
+    """Who asked for a profile of `request` ('token' or a staff username); None if nobody did."""
+    token = request.headers.get('X-Profile')
+    if token:
+        try:
+            signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+                token, max_age=settings.PROFILE_TOKEN_MAX_AGE
+            )
+        except signing.BadSignature:
+            return None
+        return 'token'
+    if 'profile' in request.GET:
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_active and user.is_staff:
+            return user.get_username()
+    return None
+
+
+def requested_mode(request):
+    mode = request.headers.get('X-Profile-Mode') or request.GET.get('profile')
+    if mode in (RequestProfile.MODE_CPROFILE, RequestProfile.MODE_SAMPLE):
+        return mode
+    return settings.PROFILE_DEFAULT_MODE
+
+
+def _warn_per_process_cache():
+    """Log once per process if the rate limit cannot span workers."""
+    global _warned_per_process_cache
+    if _warned_per_process_cache or settings.DEBUG or not isinstance(caches['default'], LocMemCache):
+        return
+    _warned_per_process_cache = True
+    logger.warning(
+        'Profiling rate limit is per-process: the default cache is LocMemCache, so each '
+        'worker may take PROFILE_RATE_LIMIT profiles per window. Point CACHE_BACKEND at a '
+        'shared backend (database, Redis) to limit them across workers.'
+    )
+
+
+def _within_rate_limit():
+    window = settings.PROFILE_RATE_WINDOW_SECONDS
+    key = f'parking:profile-rate:{int(time.time() // window)}'
+    cache.add(key, 0, timeout=window * 2)
+    try:
+        return cache.incr(key) <= settings.PROFILE_RATE_LIMIT
+    except ValueError:  # expired between add and incr
+        return False
+
+
+# ── Profilers ─────────────────────────────────────────
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.counts.most_common())
+
+
+def _short_path(filename):
+    for marker in ('site-packages/', 'backend/'):
+        head, found, tail = filename.rpartition(marker)
+        if found:
+            return tail
+    return os.path.basename(filename)
+
+
+def _profile_cprofile(get_response, request):
+    profiler = cProfile.Profile()
+    response = profiler.runcall(get_response, request)
+    return response, profiler.dump_stats, '.prof'
+
+
+def _profile_sample(get_response, request):
+    sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+    sampler.start()
+    try:
+        response = get_response(request)
+    finally:
+        sampler.stop()
+
+    def save(path):
+        with open(path, 'w') as f:
+            f.write(sampler.collapsed())
+    return response, save, '.collapsed'
+
+
+PROFILERS = {
+    RequestProfile.MODE_CPROFILE: _profile_cprofile,
+    RequestProfile.MODE_SAMPLE: _profile_sample,
+}
+
+
+# ── Storage ───────────────────────────────────────────
+
+
+def profile_path(profile):
+    return os.path.join(settings.PROFILE_DIR, profile.file_name)
+
+
+def prune(keep=None):
+    """Delete all but the newest `keep` (default PROFILE_KEEP) profiles and their files."""
+    keep = settings.PROFILE_KEEP if keep is None else keep
+    stale = list(RequestProfile.objects.order_by('-created_at', '-id')[keep:])
+    for profile in stale:
+        try:
+            os.remove(profile_path(profile))
+        except FileNotFoundError:
+            pass
+    RequestProfile.objects.filter(pk__in=[profile.pk for profile in stale]).delete()
+    return len(stale)
+
+
+def _save(request, response, mode, who, elapsed, write, suffix):
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    match = request.resolver_match
+    name = (match.url_name if match and match.url_name else 'request').replace(':', '-')
+    file_name = f'{time.strftime("%Y%m%d-%H%M%S")}-{name}-{uuid.uuid4().hex[:8]}{suffix}'
+    write(os.path.join(settings.PROFILE_DIR, file_name))
+    profile = RequestProfile.objects.create(
+        mode=mode,
+        method=request.method,
+        path=request.path[:500],
+        query_string=request.META.get('QUERY_STRING', '')[:1000],
+        status_code=response.status_code,
+        duration_ms=round(elapsed * 1000, 2),
+        file_name=file_name,
+        requested_by=who[:150],
+    )
+    prune()
+    return profile
+
+
+# ── Middleware ────────────────────────────────────────
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests that ask for it; see the module docstring. Goes after
+    AuthenticationMiddleware (for the staff check), and last, so that the
+    profile covers the view and its rendering rather than other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _warn_per_process_cache()
+
+    def __call__(self, request):
+        if 'HTTP_X_PROFILE' not in request.META and 'profile' not in request.GET:
+            return self.get_response(request)
+        who = requester(request)
+        if who is None:
+            return self.get_response(request)
+        profile = None
+        if _active.acquire(blocking=False):
+            try:
+                if _within_rate_limit():
+                    mode = requested_mode(request)
+                    start = time.perf_counter()
+                    response, write, suffix = PROFILERS[mode](self.get_response, request)
+                    elapsed = time.perf_counter() - start
+                    profile = _save(request, response, mode, who, elapsed, write, suffix)
+            finally:
+                _active.release()
+        if profile is None:
+            response = self.get_response(request)
+            response['X-Profile'] = 'skipped'
+        else:
+            response['X-Profile-Id'] = str(profile.pk)
+        return response
@@ -0,0 +1,391 @@
+"""
+Query-plan regression checks for the hot paths (`manage.py check_query_plans`).
+
+Each probe drives one endpoint or service the way production does (through
+the test client, or by calling the service) while every statement it sends
+is recorded. Each recorded statement is then EXPLAINed, and the check fails
+if any of them reads a whole growth table:
+
+    PostgreSQL  EXPLAIN (FORMAT JSON) with enable_seqscan = off, flagging
+                any "Seq Scan" node. With sequential scans priced out, the
+                planner only keeps one when no index can serve the query,
+                so the verdict does not depend on how much data the
+                database holds.
+    SQLite      EXPLAIN QUERY PLAN, flagging a bare "SCAN <table>". A
+                "SEARCH" or "SCAN ... USING INDEX" is fine.
+
+Growth tables are the ones that grow with traffic (telemetry, rollups,
+parking logs, hourly buckets, alerts, tombstones). Full reads of the fleet
+tables (facilities, zones, slots, devices, one occupancy/health row per
+device) are expected and are not flagged.
+
+Every probe runs in a transaction that is rolled back, so the check can be
+pointed at a populated database. The response cache is switched off so
+that every probe reaches the database. A probe request that does not
+succeed fails the check too, since its write path was never EXPLAINed. An
+empty database (CI right after migrate) gets a small fixture first, rolled
+back with everything else.
+"""
+import json
+import re
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from . import topology
+from .models import (
+    Alert, Device, HourlyOccupancy, ParkingLog, TelemetryData, TelemetryRollup, Tombstone,
+)
+
+GROWTH_TABLES = tuple(
+    model._meta.db_table
+    for model in (TelemetryData, TelemetryRollup, ParkingLog, HourlyOccupancy, Alert, Tombstone)
+)
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+# Django's table aliases: FROM "parking_alert" U0, INNER JOIN "parking_device" T3
+_ALIAS_RE = re.compile(r'"(\w+)"\s+(?:AS\s+)?"?([A-Z]\d+)"?\b')
+
+
+class Finding:
+    """One statement of a probe that reads a whole growth table."""
+
+    def __init__(self, probe, table, sql, plan):
+        self.probe = probe
+        self.table = table
+        self.sql = sql
+        self.plan = plan
+
+    def __str__(self):
+        return f'[{self.probe}] full scan of {self.table}\n    {self.sql[:300]}\n    {self.plan}'
+
+
+class FailedRequest:
+    """A probe request that did not return 2xx, so the path it probes was not exercised."""
+
+    def __init__(self, probe, response):
+        self.probe = probe
+        self.method = response.request['REQUEST_METHOD']
+        self.path = response.request['PATH_INFO']
+        self.status = response.status_code
+        self.body = response.content.decode(errors='replace')
+
+    def __str__(self):
+        return f'[{self.probe}] {self.method} {self.path} returned HTTP {self.status}\n    {self.body[:300]}'
+
+
+def growth_table(name):
+    """The growth table `name` is, or is a partition of; None for other tables."""
+    for table in GROWTH_TABLES:
+        if name == table or name.startswith(table + '_p'):
+            return table
+    return None
+
+
+# ── EXPLAIN ───────────────────────────────────────────
+
+
+def full_scans(sql, params):
+    """(table, plan line) for each growth table that `sql` reads in full."""
+    if connection.vendor == 'postgresql':
+        return _postgresql_full_scans(sql, params)
+    if connection.vendor == 'sqlite':
+        return _sqlite_full_scans(sql, params)
+    return []
+
+
+def _postgresql_full_scans(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        document = cursor.fetchone()[0]
+    if isinstance(document, str):
+        document = json.loads(document)
+
+    found = []
+
+    def walk(node):
+        if node.get('Node Type') == 'Seq Scan':
+            table = growth_table(node.get('Relation Name', ''))
+            if table:
+                line = f"Seq Scan on {node['Relation Name']}"
+                if node.get('Filter'):
+                    line += f" Filter: {node['Filter']}"
+                found.append((table, line))
+        for child in node.get('Plans', ()):
+            walk(child)
+
+    for entry in document:
+        walk(entry['Plan'])
+    return found
+
+
+def _sqlite_full_scans(sql, params):
+    aliases = {alias: table for table, alias in _ALIAS_RE.findall(sql)}
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        rows = cursor.fetchall()
+    found = []
+    for row in rows:
+        detail = row[-1]
+        words = detail.split()
+        if len(words) != 2 or words[0] != 'SCAN':
+            continue  # SEARCH, SCAN ... USING INDEX, subquery markers
+        table = growth_table(aliases.get(words[1], words[1]))
+        if table:
+            found.append((table, detail))
+    return found
+
+
+@contextmanager
+def recorded_statements():
+    """Collect (sql, params) of every single statement executed in the block."""
+    statements = []
+
+    def record(execute, sql, params, many, context):
+        if not many and sql.lstrip().split(None, 1)[0].upper() in _EXPLAINABLE:
+            statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(record):
+        yield statements
+
+
+# ── Probes ────────────────────────────────────────────
+
+
+def sample_values():
+    """Ids and codes the probes use, taken from the current data."""
+    device = (
+        Device.objects.filter(is_active=True)
+        .select_related('slot__zone')
+        .order_by('id')
+        .first()
+    )
+    alert = Alert.objects.filter(is_acknowledged=False).order_by('id').first()
+    # Past the latest reading's 1-minute duplicate window, inside the 5-minute future limit
+    latest = TelemetryData.objects.aggregate(latest=Max('timestamp'))['latest'] or timezone.now()
+    return {
+        'device_code': device.device_code if device else 'UNKNOWN',
+        'zone': device.slot.zone_id if device else 0,
+        'facility': device.slot.zone.facility_id if device else 0,
+        'alert': alert.pk if alert else 0,
+        'today': str(timezone.localdate()),
+        'now': timezone.now().isoformat(),
+        'reading_at': (latest + timedelta(minutes=2)).isoformat(),
+    }
+
+
+def minimal_fixture():
+    """
+    A facility with two zones, four devices, an hour of readings, parking
+    events, targets and open alerts: enough for every probe to succeed
+    on an empty database. Call it inside a transaction that is rolled back.
+    """
+    from . import services
+    from .models import ParkingTarget, ParkingZone
+    from .rollups import record_telemetry_rollups
+    from .seeding import create_fleet
+
+    now = timezone.now()
+    create_fleet(1, 2, 4, now - timedelta(minutes=10))
+    topology.clear_local()
+    devices = list(Device.objects.select_related('slot__zone').order_by('id'))
+    readings = TelemetryData.objects.bulk_create([
+        TelemetryData(
+            device=device, voltage=225.0, current=1.5, power_factor=0.9, power_consumption=303.75,
+            timestamp=now - timedelta(minutes=minutes),
+        )
+        for device in devices
+        for minutes in (70, 40, 10)
+    ])
+    record_telemetry_rollups(readings)
+    for i, device in enumerate(devices):
+        # An arrival and a departure each, so every zone has a second page of logs
+        for is_occupied, minutes in ((True, 30 - i), (False, 20 - i)):
+            moment = now - timedelta(minutes=minutes)
+            ParkingLog.objects.create(
+                device=device, zone=device.slot.zone, is_occupied=is_occupied, timestamp=moment,
+            )
+            services.apply_occupancy_event(device, is_occupied, moment)
+            services.record_hourly_event(device.slot.zone_id, moment, is_occupied)
+    services._create_alerts_if_new([
+        services._high_power_alert(device, device.slot.zone, 1800.0) for device in devices[:3]
+    ])
+    ParkingTarget.objects.bulk_create([
+        ParkingTarget(zone=zone, date=timezone.localdate(), target_occupancy_count=10, target_usage_hours=8)
+        for zone in ParkingZone.objects.all()
+    ])
+
+
+def _get(path, **params):
+    def probe(client, sample):
+        return client.get(path, {key: value.format(**sample) for key, value in params.items()})
+    return probe
+
+
+def _second_page(path, **params):
+    def probe(client, sample):
+        query = {key: value.format(**sample) for key, value in params.items()}
+        first = client.get(path, dict(query, page_size='2'))
+        if first.status_code != 200 or not first.json().get('next'):
+            return [first]
+        return [first, client.get(first.json()['next'])]
+    return probe
+
+
+def _post(path, payload):
+    def probe(client, sample):
+        body = _fill(payload, sample)
+        return client.post(path, json.dumps(body), content_type='application/json')
+    return probe
+
+
+def _fill(value, sample):
+    if isinstance(value, str):
+        return value.format(**sample)
+    if isinstance(value, list):
+        return [_fill(item, sample) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill(item, sample) for key, item in value.items()}
+    return value
+
+
+def _acknowledge(client, sample):
+    return client.patch(f"/api/alerts/{sample['alert']}/acknowledge/")
+
+
+def _sync_delta(client, sample):
+    full = client.get('/api/sync/', {'cursor': '0'})
+    if full.status_code != 200:
+        return [full]
+    return [full, client.get('/api/sync/', {'cursor': full.json()['cursor']})]
+
+
+def _service(name, *args, **kwargs):
+    def probe(client, sample):
+        from . import services
+
+        getattr(services, name)(*args, **kwargs)
+    return probe
+
+
+def _purge_count(target):
+    def probe(client, sample):
+        from .retention import expired_rows, purge_queryset
+
+        purge_queryset(expired_rows(target, 1), dry_run=True)
+    return probe
+
+
+_TELEMETRY = {
+    'device_code': '{device_code}', 'voltage': 220.0, 'current': 1.5,
+    'power_factor': 0.9, 'timestamp': '{reading_at}',
+}
+
+PROBES = {
+    # Ingest
+    'telemetry': _post('/api/telemetry/', _TELEMETRY),
+    'telemetry-bulk': _post('/api/telemetry/bulk/', [_TELEMETRY]),
+    'parking-log': _post('/api/parking-log/', {
+        'device_code': '{device_code}', 'is_occupied': True, 'timestamp': '{now}',
+    }),
+    # Dashboard
+    'summary': _get('/api/dashboard/summary/'),
+    'summary-facility': _get('/api/dashboard/summary/', facility='{facility}'),
+    'hourly': _get('/api/dashboard/hourly/', date='{today}'),
+    'hourly-zone': _get('/api/dashboard/hourly/', date='{today}', zone='{zone}'),
+    'targets': _get('/api/targets/', date='{today}'),
+    'zones': _get('/api/zones/'),
+    'devices': _get('/api/devices/'),
+    # Alerts
+    'alerts': _get('/api/alerts/'),
+    'alerts-severity': _get('/api/alerts/', severity='CRITICAL'),
+    'alerts-type': _get('/api/alerts/', type='DEVICE_OFFLINE'),
+    'alerts-open': _get('/api/alerts/', acknowledged='false'),
+    'alerts-page-2': _second_page('/api/alerts/', severity='WARNING'),
+    'acknowledge': _acknowledge,
+    # Parking logs
+    'logs': _get('/api/parking-logs/'),
+    'logs-zone-date': _get('/api/parking-logs/', zone='{zone}', date='{today}'),
+    'logs-page-2': _second_page('/api/parking-logs/', zone='{zone}'),
+    # Sync
+    'sync-delta': _sync_delta,
+    # Scheduled jobs
+    'detect-offline': _service('detect_offline_devices', auto_resolve=True),
+    'rebuild-occupancy': _service('rebuild_slot_occupancy'),
+    'purge-telemetry': _purge_count('telemetry'),
+    'purge-logs': _purge_count('logs'),
+    'purge-alerts': _purge_count('alerts'),
+    'purge-tombstones': _purge_count('tombstones'),
+}
+
+
+@contextmanager
+def kept_connection():
+    # The test client fires request_started/finished, whose handler closes
+    # a connection that is inside a transaction; the probes need it open.
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    try:
+        yield
+    finally:
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+
+
+def run_probe(name, probe, sample, client=None):
+    """
+    Run `probe` in a rolled-back transaction and EXPLAIN what it sent.
+    Returns (statements, findings); a request that did not return 2xx is a
+    FailedRequest finding.
+    """
+    client = client or Client()
+    findings = []
+    with transaction.atomic():
+        with recorded_statements() as statements:
+            responses = probe(client, sample)
+        if responses is not None and not isinstance(responses, list):
+            responses = [responses]
+        for response in responses or ():
+            if not 200 <= response.status_code < 300:
+                findings.append(FailedRequest(name, response))
+        for sql, params in statements:
+            for table, plan in full_scans(sql, params):
+                findings.append(Finding(name, table, sql, plan))
+        transaction.set_rollback(True)
+    return statements, findings
+
+
+def check_query_plans(names=None):
+    """
+    Run the named probes (default: all). Returns [(name, statements,
+    findings)] in PROBES order.
+    """
+    results = []
+    quiet = override_settings(
+        RESPONSE_CACHE_TTL_SECONDS=0, REQUEST_TIMING_SAMPLE_RATE=0, ALLOWED_HOSTS=['*'],
+    )
+    with quiet, kept_connection(), transaction.atomic():
+        empty = not Device.objects.filter(is_active=True).exists()
+        try:
+            if empty:
+                minimal_fixture()
+            sample = sample_values()
+            client = Client()
+            for name, probe in PROBES.items():
+                if names and name not in names:
+                    continue
+                statements, findings = run_probe(name, probe, sample, client)
+                results.append((name, statements, findings))
+        finally:
+            # Rolled back as a whole, fixture included; each probe also rolls back its own writes
+            transaction.set_rollback(True)
+    if empty:
+        topology.clear_local()  # drop the rolled-back fixture's snapshot
+    return results
@@ -0,0 +1,120 @@
+"""
+Batched purging of aged-out rows.
+
+QuerySet.delete() loads every matching row (and everything that cascades
+from it) into memory and sends signals before deleting, all in one
+transaction. On a table with millions of rows that means a long-held lock
+and a burst of WAL that replicas fall behind on. purge_queryset() instead
+walks the matching rows in primary-key windows of a fixed number of rows,
+finding each window's end with an index lookup, and issues one plain
+DELETE per window:
+
+    SELECT id FROM parking_telemetrydata
+    WHERE id >= %s AND "timestamp" < %s ORDER BY id LIMIT 1 OFFSET 5000
+    DELETE FROM parking_telemetrydata
+    WHERE id >= %s AND id < %s AND "timestamp" < %s
+
+Each window is its own short transaction, and an optional pause between
+windows throttles the load further. Nothing cascades from the purged
+models, so skipping the collector loses nothing.
+"""
+import time
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Alert, ParkingLog, TelemetryData, Tombstone
+
+DEFAULT_BATCH_SIZE = 5000
+# [first, last) Django versions whose QuerySet._raw_delete(using) is known to work
+_RAW_DELETE_CHECKED = ((4, 2), (7, 0))
+
+# target → (model, age field, extra filter)
+PURGE_TARGETS = {
+    'telemetry': (TelemetryData, 'timestamp', {}),
+    'logs': (ParkingLog, 'timestamp', {}),
+    'alerts': (Alert, 'acknowledged_at', {'is_acknowledged': True}),
+    'tombstones': (Tombstone, 'deleted_at', {}),
+}
+
+
+def default_retention():
+    """Days to keep for each purge target (0 = keep forever)."""
+    from .rollups import retention_days
+
+    return {
+        'telemetry': retention_days()['raw'],
+        'logs': settings.PARKING_LOG_RETENTION_DAYS,
+        'alerts': settings.ACKNOWLEDGED_ALERT_RETENTION_DAYS,
+        'tombstones': settings.SYNC_TOMBSTONE_RETENTION_DAYS,
+    }
+
+
+def expired_rows(target, days, now=None):
+    """Queryset of `target` rows older than `days`."""
+    model, field, extra = PURGE_TARGETS[target]
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    return model.objects.filter(**extra, **{f'{field}__lt': cutoff})
+
+
+def _raw_delete(queryset):
+    """
+    One DELETE ... WHERE for `queryset`, without the collector or signals.
+
+    QuerySet._raw_delete is private, so it is only used on the Django
+    versions it has been checked against. Elsewhere the same statement is
+    built from the queryset's SELECT as DELETE ... WHERE pk IN (...).
+    """
+    if _RAW_DELETE_CHECKED[0] <= django.VERSION[:2] < _RAW_DELETE_CHECKED[1]:
+        return queryset._raw_delete(queryset.db)
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    meta = queryset.model._meta
+    select_sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {qn(meta.db_table)} WHERE {qn(meta.pk.column)} IN ({select_sql})', params
+        )
+        return cursor.rowcount
+
+
+def purge_queryset(queryset, batch_size=DEFAULT_BATCH_SIZE, pause=0.0, dry_run=False,
+                   progress=None):
+    """
+    Delete the rows of `queryset` in primary-key windows of `batch_size`
+    matching rows, without collecting related objects or sending signals.
+    Each window ends at the next matching primary key, so sparse id ranges
+    cost no empty DELETEs. Sleeps `pause` seconds after every window.
+    `progress`, if given, is called as progress(deleted_so_far, window_end,
+    last_pk) after each window.
+    Returns the number of rows deleted (or matched, when dry_run).
+    """
+    queryset = queryset.order_by()
+    if dry_run:
+        return queryset.count()
+    last = queryset.aggregate(last=Max('pk'))['last']
+    if last is None:
+        return 0
+
+    deleted = 0
+    remaining = queryset
+    while True:
+        # First pk of the next window, or None when this one is the last
+        high = (
+            remaining.order_by('pk').values_list('pk', flat=True)[batch_size:batch_size + 1].first()
+        )
+        window = remaining if high is None else remaining.filter(pk__lt=high)
+        with transaction.atomic(using=queryset.db):
+            count = _raw_delete(window)
+        deleted += count
+        if progress:
+            progress(deleted, last if high is None else high - 1, last)
+        if high is None:
+            return deleted
+        remaining = queryset.filter(pk__gte=high)
+        if pause and count:
+            time.sleep(pause)
@@ -0,0 +1,192 @@
+"""
+Telemetry downsampling tiers.
+
+Raw TelemetryData samples are folded into TelemetryRollup buckets
+(1-minute, 15-minute, hourly) per device. Buckets carry count, min, max and
+sum for voltage, current and power plus an energy estimate, so merging a new
+sample into a bucket is a single upsert:
+
+    INSERT ... ON CONFLICT (device_id, tier, bucket_start) DO UPDATE
+        SET sample_count = sample_count + excluded.sample_count,
+            voltage_min = LEAST(voltage_min, excluded.voltage_min), ...
+
+Ingestion calls record_telemetry_rollups() with the rows it just inserted;
+the compact_telemetry command rebuilds buckets from raw data and applies the
+per-tier retention windows.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import TelemetryData, TelemetryRollup
+from .retention import purge_queryset
+
+DEFAULT_RETENTION_DAYS = {
+    'raw': 30,
+    TelemetryRollup.TIER_1MIN: 7,
+    TelemetryRollup.TIER_15MIN: 90,
+    TelemetryRollup.TIER_HOUR: 730,
+}
+DEFAULT_SAMPLE_INTERVAL_SECONDS = 300
+
+_METRICS = ('voltage', 'current', 'power')
+_COLUMNS = (
+    'device_id', 'tier', 'bucket_start', 'sample_count',
+    'voltage_min', 'voltage_max', 'voltage_sum',
+    'current_min', 'current_max', 'current_sum',
+    'power_min', 'power_max', 'power_sum',
+    'energy_wh',
+)
+# Rows per INSERT statement; keeps the parameter count under SQLite's limit.
+_UPSERT_CHUNK = 500
+
+
+def retention_days():
+    """Per-tier retention in days ('raw' plus each rollup tier)."""
+    return {**DEFAULT_RETENTION_DAYS, **getattr(settings, 'TELEMETRY_RETENTION_DAYS', {})}
+
+
+def sample_interval_hours():
+    seconds = getattr(settings, 'TELEMETRY_SAMPLE_INTERVAL_SECONDS', DEFAULT_SAMPLE_INTERVAL_SECONDS)
+    return seconds / 3600
+
+
+def bucket_start(timestamp, tier):
+    """Start of the `tier` bucket containing `timestamp` (UTC-aligned)."""
+    seconds = TelemetryRollup.TIER_SECONDS[tier]
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=dt_timezone.utc)
+
+
+def aggregate_samples(samples):
+    """
+    Fold telemetry samples into partial buckets for every tier.
+
+    `samples` is an iterable of objects with device_id, timestamp, voltage,
+    current and power_consumption. Returns {(device_id, tier, bucket_start):
+    [count, v_min, v_max, v_sum, c_min, c_max, c_sum, p_min, p_max, p_sum]}.
+    """
+    buckets = {}
+    for sample in samples:
+        values = (sample.voltage, sample.current, sample.power_consumption)
+        for tier in TelemetryRollup.TIER_SECONDS:
+            key = (sample.device_id, tier, bucket_start(sample.timestamp, tier))
+            acc = buckets.get(key)
+            if acc is None:
+                acc = buckets[key] = [0]
+                for value in values:
+                    acc.extend((value, value, 0.0))
+            acc[0] += 1
+            for i, value in enumerate(values):
+                base = 1 + i * 3
+                if value < acc[base]:
+                    acc[base] = value
+                if value > acc[base + 1]:
+                    acc[base + 1] = value
+                acc[base + 2] += value
+    return buckets
+
+
+def _upsert_sql(row_count):
+    if connection.vendor == 'postgresql':
+        least, greatest = 'LEAST', 'GREATEST'
+    else:
+        least, greatest = 'MIN', 'MAX'
+    table = connection.ops.quote_name(TelemetryRollup._meta.db_table)
+    row = '(' + ', '.join(['%s'] * len(_COLUMNS)) + ')'
+    updates = ['sample_count = {t}.sample_count + excluded.sample_count']
+    for metric in _METRICS:
+        updates += [
+            f'{metric}_min = {least}({{t}}.{metric}_min, excluded.{metric}_min)',
+            f'{metric}_max = {greatest}({{t}}.{metric}_max, excluded.{metric}_max)',
+            f'{metric}_sum = {{t}}.{metric}_sum + excluded.{metric}_sum',
+        ]
+    updates.append('energy_wh = {t}.energy_wh + excluded.energy_wh')
+    return (
+        f'INSERT INTO {table} ({", ".join(_COLUMNS)}) '
+        f'VALUES {", ".join([row] * row_count)} '
+        f'ON CONFLICT (device_id, tier, bucket_start) DO UPDATE SET '
+        + ', '.join(u.format(t=table) for u in updates)
+    )
+
+
+def upsert_buckets(buckets):
+    """Merge partial buckets (from aggregate_samples) into TelemetryRollup."""
+    if not buckets:
+        return 0
+    interval_hours = sample_interval_hours()
+    rows = []
+    for (device_id, tier, start), acc in buckets.items():
+        rows.append((
+            device_id, tier, connection.ops.adapt_datetimefield_value(start),
+            *acc, acc[9] * interval_hours,
+        ))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(0, len(rows), _UPSERT_CHUNK):
+            chunk = rows[i:i + _UPSERT_CHUNK]
+            cursor.execute(_upsert_sql(len(chunk)), [value for row in chunk for value in row])
+    return len(rows)
+
+
+def record_telemetry_rollups(samples):
+    """Fold freshly ingested telemetry rows into every rollup tier."""
+    return upsert_buckets(aggregate_samples(samples))
+
+
+def rebuild_rollups(start=None, end=None, chunk_size=5000):
+    """
+    Recompute rollup buckets from raw telemetry in [start, end).
+
+    Bounds are widened to whole hours so no bucket of any tier is only
+    partially rebuilt. Raw rows are streamed and flushed every `chunk_size`
+    rows; buckets spanning two chunks are merged by the upsert, so memory
+    stays flat.
+    Returns (raw rows read, buckets written).
+    """
+    raw = TelemetryData.objects.order_by()
+    rollups = TelemetryRollup.objects.all()
+    if start is not None:
+        start = bucket_start(start, TelemetryRollup.TIER_HOUR)
+        raw = raw.filter(timestamp__gte=start)
+        rollups = rollups.filter(bucket_start__gte=start)
+    if end is not None:
+        end_bucket = bucket_start(end, TelemetryRollup.TIER_HOUR)
+        if end_bucket < end:
+            end_bucket += timedelta(hours=1)
+        raw = raw.filter(timestamp__lt=end_bucket)
+        rollups = rollups.filter(bucket_start__lt=end_bucket)
+
+    read = written = 0
+    with transaction.atomic():
+        rollups.delete()
+        pending = []
+        for sample in raw.only(
+            'device_id', 'timestamp', 'voltage', 'current', 'power_consumption'
+        ).iterator(chunk_size=chunk_size):
+            pending.append(sample)
+            if len(pending) >= chunk_size:
+                written += upsert_buckets(aggregate_samples(pending))
+                read += len(pending)
+                pending = []
+        written += upsert_buckets(aggregate_samples(pending))
+        read += len(pending)
+    return read, written
+
+
+def apply_retention(now=None, dry_run=False):
+    """
+    Delete raw telemetry and rollup buckets older than their tier's retention,
+    in primary-key batches (see retention.purge_queryset). Returns {tier: rows deleted (or matched, when dry_run)}.
+    """
+    now = now or timezone.now()
+    days = retention_days()
+    querysets = {'raw': TelemetryData.objects.filter(timestamp__lt=now - timedelta(days=days['raw']))}
+    for tier in TelemetryRollup.TIER_SECONDS:
+        querysets[tier] = TelemetryRollup.objects.filter(
+            tier=tier, bucket_start__lt=now - timedelta(days=days[tier])
+        )
+
+    return {tier: purge_queryset(qs, dry_run=dry_run) for tier, qs in querysets.items()}
@@ -0,0 +1,327 @@
+"""
+Synthetic fleet and history generation for `manage.py seed_data`.
+
+The default run reproduces the demo dataset (one facility, four zones, 50
+devices, 24 hours of 5-minute telemetry). Larger runs are meant for load
+testing and benchmarks, e.g. 10k devices x 30 days:
+
+    facilities, zones, slots, devices   bulk_create, one statement per batch
+    telemetry, parking logs, rollups    NumPy arrays for a chunk of devices,
+                                        streamed with COPY (PostgreSQL) or
+                                        executemany (SQLite)
+
+Telemetry is generated for whole devices at a time, so every rollup bucket
+is complete within one chunk and is written directly instead of being
+re-aggregated from raw rows. Memory stays proportional to the chunk, not to
+the dataset. Values come from one NumPy generator per facility, seeded from
+(seed, facility number), so a seeded dataset is identical however many
+worker processes built it.
+"""
+import io
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+from django.db import connection, transaction
+
+from . import partitions, sync
+from .models import (
+    Alert, Device, DeviceHealthState, HourlyOccupancy, ParkingFacility, ParkingLog, ParkingSlot,
+    ParkingTarget, ParkingZone, SlotOccupancy, TelemetryData, TelemetryRollup, Tombstone,
+)
+from .retention import purge_queryset
+from .rollups import retention_days, sample_interval_hours
+
+DEFAULT_FACILITY = ('City Center Mall Parking', '123 Main Street, Downtown')
+# Zone templates, repeated when a facility has more zones; the weights
+# split the facility's devices (4:3:2:1 → 20/15/10/5 of 50)
+ZONE_TEMPLATES = [
+    {'name': 'Basement-1', 'zone_type': 'BASEMENT', 'prefix': 'B1', 'weight': 4},
+    {'name': 'Basement-2', 'zone_type': 'BASEMENT', 'prefix': 'B2', 'weight': 3},
+    {'name': 'Outdoor', 'zone_type': 'OUTDOOR', 'prefix': 'OUT', 'weight': 2},
+    {'name': 'VIP', 'zone_type': 'VIP', 'prefix': 'VIP', 'weight': 1},
+]
+BULK_BATCH_SIZE = 2000
+DEFAULT_CHUNK_ROWS = 500_000
+
+FacilityLayout = namedtuple('FacilityLayout', 'number facility zones device_ids device_zone_ids')
+
+
+def split(total, weights):
+    """Split `total` into integer parts proportional to `weights` (largest remainder)."""
+    weights = np.asarray(weights, dtype=float)
+    exact = total * weights / weights.sum()
+    parts = np.floor(exact).astype(int)
+    for i in np.argsort(parts - exact)[:total - parts.sum()]:
+        parts[i] += 1
+    return parts.tolist()
+
+
+# ── Fleet ─────────────────────────────────────────────
+
+# Every table seed_data fills, dependents first
+SEEDED_MODELS = (
+    TelemetryData, TelemetryRollup, ParkingLog, HourlyOccupancy, Alert,
+    DeviceHealthState, SlotOccupancy, ParkingTarget,
+    Device, ParkingSlot, ParkingZone, ParkingFacility,
+)
+
+
+def clear_fleet():
+    """
+    Empty SEEDED_MODELS with batched raw deletes: no cascade collection and
+    no post_delete per row. Sync clients still get one tombstone per
+    device, written in bulk.
+    """
+    sync.record_deleted(Tombstone.KIND_DEVICE, Device.objects.values_list('pk', flat=True))
+    for model in SEEDED_MODELS:
+        purge_queryset(model.objects.all())
+
+
+def create_fleet(facilities, zones_per_facility, devices, now):
+    """
+    Create `facilities` facilities of `zones_per_facility` zones sharing
+    `devices` slot+device pairs. Returns one FacilityLayout per facility.
+    """
+    layouts = []
+    for number, device_count in enumerate(split(devices, [1] * facilities), start=1):
+        if number == 1:
+            name, address = DEFAULT_FACILITY
+        else:
+            name, address = f'Parking Site {number}', f'{number} Main Street'
+        facility = ParkingFacility.objects.create(name=name, address=address)
+
+        templates = [ZONE_TEMPLATES[i % len(ZONE_TEMPLATES)] for i in range(zones_per_facility)]
+        sizes = split(device_count, [t['weight'] for t in templates])
+        zones = []
+        for i, (template, size) in enumerate(zip(templates, sizes)):
+            round_ = i // len(ZONE_TEMPLATES)
+            suffix = f'-{round_ + 1}' if round_ else ''
+            zones.append((
+                ParkingZone(
+                    facility=facility, name=template['name'] + suffix,
+                    zone_type=template['zone_type'], total_slots=size,
+                ),
+                template['prefix'] + suffix.replace('-', '_'),
+            ))
+        ParkingZone.objects.bulk_create([zone for zone, _ in zones])
+
+        code_prefix = 'PARK' if number == 1 else f'PARK-F{number}'
+        slots, codes = [], []
+        for zone, prefix in zones:
+            width = max(3, len(str(zone.total_slots)))
+            for i in range(1, zone.total_slots + 1):
+                slots.append(ParkingSlot(zone=zone, slot_number=f'S{i:0{width}d}'))
+                codes.append(f'{code_prefix}-{prefix}-S{i:0{width}d}')
+        ParkingSlot.objects.bulk_create(slots, batch_size=BULK_BATCH_SIZE)
+        created = Device.objects.bulk_create(
+            [
+                Device(slot=slot, device_code=code, is_active=True, last_seen_at=now)
+                for slot, code in zip(slots, codes)
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        layouts.append(FacilityLayout(
+            number, facility, [zone for zone, _ in zones],
+            np.array([device.pk for device in created], dtype=np.int64),
+            np.array([slot.zone_id for slot in slots], dtype=np.int64),
+        ))
+    return layouts
+
+
+def ensure_partitions(first_day, last_day):
+    """Create the daily/monthly partitions the history will land in (PostgreSQL)."""
+    granularity = partitions.configured_granularity()
+    if not granularity:
+        return  # plain tables, or everything goes to the default partition
+    for model in (TelemetryData, ParkingLog):
+        table = model._meta.db_table
+        if partitions.is_partitioned(table):
+            partitions.create_partitions(table, first_day, last_day, granularity)
+
+
+# ── History ───────────────────────────────────────────
+
+
+def generator(seed, facility_number):
+    return np.random.default_rng(None if seed is None else [seed, facility_number])
+
+
+def seed_history(layout_number, device_ids, device_zone_ids, now_epoch, days,
+                 interval_minutes, seed=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Generate and load telemetry, its rollups and parking logs for one
+    facility's devices. Runs in worker processes, so it takes plain values.
+    Returns (telemetry rows, rollup rows, parking logs).
+    """
+    rng = generator(seed, layout_number)
+    device_ids = np.asarray(device_ids, dtype=np.int64)
+    device_zone_ids = np.asarray(device_zone_ids, dtype=np.int64)
+    step = interval_minutes * 60
+    samples = days * 86400 // step
+    timestamps = now_epoch - step * np.arange(samples - 1, -1, -1, dtype=np.int64)
+    per_chunk = max(1, chunk_rows // max(samples, 1))
+
+    telemetry = rollups = logs = 0
+    for first in range(0, len(device_ids), per_chunk):
+        ids = device_ids[first:first + per_chunk]
+        t, r = _load_telemetry(rng, ids, timestamps, now_epoch)
+        telemetry += t
+        rollups += r
+        logs += _load_parking_logs(
+            rng, ids, device_zone_ids[first:first + per_chunk], now_epoch, days,
+        )
+    return telemetry, rollups, logs
+
+
+def _load_telemetry(rng, device_ids, timestamps, now_epoch):
+    shape = (len(device_ids), len(timestamps))
+    voltage = rng.uniform(210, 240, shape).round(1)
+    current = rng.uniform(3.0, 7.0, shape).round(1)
+    power_factor = rng.uniform(0.85, 0.98, shape).round(2)
+    power = (voltage * current * power_factor).round(2)
+
+    stamps = _datetimes(timestamps)
+    written = write_rows(
+        TelemetryData,
+        ['device_id', 'voltage', 'current', 'power_factor', 'power_consumption',
+         'timestamp', 'received_at'],
+        [
+            np.repeat(device_ids, shape[1]), voltage.ravel(), current.ravel(),
+            power_factor.ravel(), power.ravel(), np.tile(stamps, shape[0]),
+            np.tile(stamps, shape[0]),
+        ],
+    )
+
+    rollups = 0
+    retention = retention_days()
+    energy_per_watt = sample_interval_hours()
+    for tier, seconds in TelemetryRollup.TIER_SECONDS.items():
+        buckets = timestamps // seconds * seconds
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        if retention.get(tier):
+            # Older buckets of this tier would be expired right away
+            starts = starts[buckets[starts] >= now_epoch - retention[tier] * 86400]
+        if not len(starts):
+            continue
+        counts = np.diff(np.r_[starts, len(timestamps)])
+        offsets = starts - starts[0]
+        columns = [
+            np.repeat(device_ids, len(starts)),
+            np.full(len(device_ids) * len(starts), tier),
+            np.tile(_datetimes(buckets[starts]), len(device_ids)),
+            np.tile(counts, len(device_ids)),
+        ]
+        for values in (voltage, current, power):
+            kept = values[:, starts[0]:]
+            columns += [
+                np.minimum.reduceat(kept, offsets, axis=1).ravel(),
+                np.maximum.reduceat(kept, offsets, axis=1).ravel(),
+                np.add.reduceat(kept, offsets, axis=1).ravel(),
+            ]
+        columns.append(columns[-1] * energy_per_watt)
+        rollups += write_rows(
+            TelemetryRollup,
+            ['device_id', 'tier', 'bucket_start', 'sample_count',
+             'voltage_min', 'voltage_max', 'voltage_sum',
+             'current_min', 'current_max', 'current_sum',
+             'power_min', 'power_max', 'power_sum', 'energy_wh'],
+            columns,
+        )
+    return written, rollups
+
+
+def _load_parking_logs(rng, device_ids, device_zone_ids, now_epoch, days):
+    # 3-12 occupancy changes per device and day, alternating occupied /
+    # vacated in time order
+    per_device = rng.integers(3, 13, (len(device_ids), days)).sum(axis=1)
+    total = int(per_device.sum())
+    owner = np.repeat(np.arange(len(device_ids)), per_device)
+    moments = now_epoch - rng.integers(0, days * 86400, total)
+    order = np.lexsort((moments, owner))
+    owner, moments = owner[order], moments[order]
+    rank = np.arange(total) - np.repeat(np.cumsum(per_device) - per_device, per_device)
+    stamps = _datetimes(moments)
+    return write_rows(
+        ParkingLog,
+        ['device_id', 'zone_id', 'is_occupied', 'timestamp', 'received_at'],
+        [device_ids[owner], device_zone_ids[owner], rank % 2 == 0, stamps, stamps],
+    )
+
+
+# ── Bulk loading ──────────────────────────────────────
+
+_PG_EPOCH = np.datetime64('2000-01-01T00:00:00', 'us')
+# COPY BINARY encodings by column type
+_PG_BINARY = {
+    'bigint': '>i8',
+    'integer': '>i4',
+    'double precision': '>f8',
+    'boolean': '?',
+    'timestamp with time zone': '>i8',
+}
+
+
+def _datetimes(epoch_seconds):
+    return np.asarray(epoch_seconds).astype('datetime64[s]')
+
+
+def write_rows(model, columns, values):
+    """
+    Insert column arrays into `model`'s table. Returns the number of rows.
+
+    PostgreSQL gets one COPY ... (FORMAT binary): the rows are laid out in a
+    NumPy structured array, so encoding costs no Python work per row. Other
+    backends get executemany. Timestamp columns are datetime64 arrays (UTC).
+    """
+    rows = len(values[0])
+    if not rows:
+        return 0
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ', '.join(connection.ops.quote_name(column) for column in columns)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.copy_expert(
+                f'COPY {table} ({names}) FROM STDIN WITH (FORMAT binary)',
+                io.BytesIO(_copy_binary(model, columns, values)),
+            )
+        else:
+            converted = []
+            for array in map(np.asarray, values):
+                if array.dtype.kind == 'M':
+                    array = np.char.replace(np.datetime_as_string(array, unit='s'), 'T', ' ')
+                converted.append(array.tolist())
+            placeholders = ', '.join(['%s'] * len(columns))
+            cursor.executemany(
+                f'INSERT INTO {table} ({names}) VALUES ({placeholders})', list(zip(*converted)),
+            )
+    return rows
+
+
+def _copy_binary(model, columns, values):
+    fields = {field.column: field for field in model._meta.concrete_fields}
+    layout = [('count', '>i2')]
+    encoded = []
+    for i, (column, array) in enumerate(zip(columns, map(np.asarray, values))):
+        db_type = fields[column].db_type(connection)
+        if array.dtype.kind == 'M':
+            array = (array.astype('datetime64[us]') - _PG_EPOCH).astype(np.int64)
+        if db_type.startswith('varchar'):
+            array = np.char.encode(array, 'utf-8')
+            fmt = array.dtype.str  # all values of a column have the same length
+        else:
+            fmt = _PG_BINARY[db_type.split('(')[0]]
+        layout += [(f'size{i}', '>i4'), (f'value{i}', fmt)]
+        encoded.append(array)
+    data = np.empty(len(encoded[0]), dtype=np.dtype(layout))
+    data['count'] = len(encoded)
+    for i, array in enumerate(encoded):
+        data[f'size{i}'] = data.dtype[f'value{i}'].itemsize
+        data[f'value{i}'] = array
+    header = b'PGCOPY\n\xff\r\n\x00' + bytes(8)
+    return header + data.tobytes() + b'\xff\xff'
+
+
+def history_bounds(now, days):
+    """First and last UTC day the history covers (for partitions)."""
+    return (now - timedelta(days=days)).date(), now.date()
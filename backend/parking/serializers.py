@@ -1,5 +1,11 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
 from .models import (
     Device,
@@ -11,9 +17,44 @@ from .models import (
     ParkingSlot,
     ParkingTarget,
 )
+from . import metrics, stream, watermarks
+from .sync import device_reconnected
+from .timeutils import zone_timezone
+from .topology import resolve_devices
+
+DUPLICATE_WINDOW = timedelta(minutes=1)
+DUPLICATE_TELEMETRY_MESSAGE = (
+    "Duplicate telemetry: a record for this device already exists within a 1-minute window."
+)
+
+
+class _CountsRejections:
+    """
+    Counts failed validations in `rejected_metric`, by the first reason a
+    validator gave through reject() ('invalid' for any other error).
+    """
+
+    rejected_metric = None
+    _rejection = "invalid"
 
+    def reject(self, reason, message):
+        if self._rejection == "invalid":
+            self._rejection = reason
+        raise serializers.ValidationError(message)
 
-class TelemetrySerializer(serializers.Serializer):
+    def rejection_labels(self):
+        return (self._rejection,)
+
+    def is_valid(self, *, raise_exception=False):
+        valid = super().is_valid()
+        if not valid:
+            self.rejected_metric.inc(*self.rejection_labels())
+            if raise_exception:
+                raise serializers.ValidationError(self.errors)
+        return valid
+
+
+class TelemetrySerializer(_CountsRejections, serializers.Serializer):
     """
     Validates and creates a single telemetry record.
 
@@ -21,8 +62,19 @@ class TelemetrySerializer(serializers.Serializer):
     - device_code must exist in the database
     - timestamp must not be in the future
     - duplicate (device, timestamp) is rejected
+
+    Device codes are resolved against the in-process topology snapshot
+    (parking/topology.py) without queries; create() loads the device's
+    per-message state by primary key.
+
+    Bulk ingestion passes a pre-resolved `devices` map (device_code → Device)
+    in the context and sets `defer_duplicate_check`, so validating a record
+    costs no queries; BulkTelemetrySerializer runs the duplicate check for
+    the whole batch at once.
     """
 
+    rejected_metric = metrics.TELEMETRY_REJECTED
+
     device_code = serializers.CharField(max_length=50)
     voltage = serializers.FloatField()
     current = serializers.FloatField()
@@ -30,43 +82,46 @@ class TelemetrySerializer(serializers.Serializer):
     timestamp = serializers.DateTimeField()
 
     def validate_device_code(self, value):
+        devices = self.context.get("devices")
+        if devices is None:
+            devices = resolve_devices([value])
         try:
-            device = Device.objects.get(device_code=value, is_active=True)
-        except Device.DoesNotExist:
-            raise serializers.ValidationError(
-                f"Device with code '{value}' does not exist or is inactive."
+            device = devices[value]
+        except KeyError:
+            self.reject(
+                "unknown_device", f"Device with code '{value}' does not exist or is inactive."
             )
         self._device = device
         return value
 
-    def validate_timestamp(self, value):
-        from datetime import timedelta
+    def rejection_labels(self):
+        return (self.context.get("endpoint", "single"), self._rejection)
 
+    def validate_timestamp(self, value):
         # Allow up to 5 minutes of clock skew (common for IoT devices)
         if value > timezone.now() + timedelta(minutes=5):
-            raise serializers.ValidationError("Timestamp cannot be in the future.")
+            self.reject("future_timestamp", "Timestamp cannot be in the future.")
         return value
 
     def validate(self, data):
         device = getattr(self, "_device", None)
-        if device:
+        if device and not self.context.get("defer_duplicate_check"):
             # PRD: Reject duplicates within a 1-minute window
-            from datetime import timedelta
-
-            window_start = data["timestamp"] - timedelta(minutes=1)
-            window_end = data["timestamp"] + timedelta(minutes=1)
+            window_start = data["timestamp"] - DUPLICATE_WINDOW
+            window_end = data["timestamp"] + DUPLICATE_WINDOW
             if TelemetryData.objects.filter(
                 device=device,
                 timestamp__gte=window_start,
                 timestamp__lte=window_end,
             ).exists():
-                raise serializers.ValidationError(
-                    "Duplicate telemetry: a record for this device already exists within a 1-minute window."
-                )
+                self.reject("duplicate", DUPLICATE_TELEMETRY_MESSAGE)
         return data
 
     def create(self, validated_data):
+        from .services import load_ingest_state, run_all_detections, record_device_health
+
         device = self._device
+        load_ingest_state([device])
         telemetry = TelemetryData(
             device=device,
             voltage=validated_data["voltage"],
@@ -76,18 +131,25 @@ class TelemetrySerializer(serializers.Serializer):
         )
         telemetry.save()  # triggers power_consumption computation
 
-        # Update device last_seen_at
+        from .rollups import record_telemetry_rollups
+
+        record_telemetry_rollups([telemetry])
+
+        # Update device last_seen_at (a sync change only when it reconnects)
+        fields = ["last_seen_at"]
+        if device_reconnected(device.last_seen_at, validated_data["timestamp"]):
+            fields.append("updated_at")
         device.last_seen_at = validated_data["timestamp"]
-        device.save(update_fields=["last_seen_at"])
+        device.save(update_fields=fields)
 
         # Run alert detections
-        from .services import run_all_detections, compute_device_health
-
         telemetry.alerts_triggered = run_all_detections(telemetry)
 
-        # Update device health score
-        telemetry.health_score = compute_device_health(device)
+        # Update device health score from its rolling window
+        telemetry.health_score = record_device_health([telemetry])[device.id]
 
+        watermarks.touch([device.slot.zone.facility_id])
+        metrics.TELEMETRY_ACCEPTED.inc("single")
         return telemetry
 
 
@@ -96,80 +158,228 @@ class BulkTelemetrySerializer(serializers.Serializer):
     Validates and creates multiple telemetry records.
     Accepts a list of telemetry payloads, validates each one,
     creates valid records, and returns a summary.
+
+    The batch is processed set-wise so the number of queries does not grow
+    with the number of records:
+    - device codes are resolved from the in-process topology snapshot, and
+      the touched devices' per-message state is loaded with one query
+    - the 1-minute duplicate window is checked against the database with one
+      range query and against earlier records of the same batch in memory
+    - valid rows are inserted with bulk_create and folded into the
+      TelemetryRollup tiers with one upsert
+    - each device's last_seen_at is advanced once per batch
+    - alert detections and health scoring run once per device per batch,
+      LOW_HEALTH after scoring so it sees the batch's own samples
+    The per-index error report is identical to validating each record with
+    TelemetrySerializer on its own.
     """
 
     def to_internal_value(self, data):
+        # Keyed like Serializer's own errors: run_validation does not wrap
+        # what to_internal_value raises, and a bare list breaks .errors
         if not isinstance(data, list):
-            raise serializers.ValidationError("Expected a list of telemetry records.")
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: ["Expected a list of telemetry records."]}
+            )
         if len(data) == 0:
-            raise serializers.ValidationError("The list cannot be empty.")
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: ["The list cannot be empty."]}
+            )
         return data
 
+    def save(self, **kwargs):
+        # Serializer.save() merges validated_data into a dict, which fails
+        # for a list payload; the batch has no extra kwargs to merge anyway.
+        self.instance = self.create(self.validated_data)
+        return self.instance
+
     def create(self, validated_data):
-        created = []
+        from .services import (
+            BULK_WRITE_BATCH_SIZE,
+            load_ingest_state,
+            record_device_health,
+            run_batch_detections,
+            run_batch_low_health,
+        )
+        from .rollups import record_telemetry_rollups
+
+        codes = {
+            record.get("device_code")
+            for record in validated_data
+            if isinstance(record, dict) and isinstance(record.get("device_code"), str)
+        }
+        devices = resolve_devices(codes)
+
+        # ── Per-record field validation (no queries) ──────
+        context = {"devices": devices, "defer_duplicate_check": True, "endpoint": "bulk"}
+        candidates = []
         errors = []
-
         for index, record in enumerate(validated_data):
-            serializer = TelemetrySerializer(data=record)
+            serializer = TelemetrySerializer(data=record, context=context)
             if serializer.is_valid():
-                telemetry = serializer.save()
-                created.append(
-                    {
-                        "device_code": telemetry.device.device_code,
-                        "timestamp": str(telemetry.timestamp),
-                        "power_consumption": telemetry.power_consumption,
-                    }
-                )
+                candidates.append((index, record, serializer))
             else:
-                errors.append(
-                    {
-                        "index": index,
-                        "data": record,
-                        "errors": serializer.errors,
-                    }
+                errors.append({"index": index, "data": record, "errors": serializer.errors})
+
+        # ── 1-minute duplicate window, batch-wide ─────────
+        accepted = []
+        if candidates:
+            timestamps = [s.validated_data["timestamp"] for _, _, s in candidates]
+            seen = defaultdict(list)  # device_id → sorted timestamps
+            for device_id, ts in TelemetryData.objects.filter(
+                device_id__in={s._device.id for _, _, s in candidates},
+                timestamp__gte=min(timestamps) - DUPLICATE_WINDOW,
+                timestamp__lte=max(timestamps) + DUPLICATE_WINDOW,
+            ).values_list("device_id", "timestamp"):
+                seen[device_id].append(ts)
+            for stamps in seen.values():
+                stamps.sort()
+
+            for index, record, serializer in candidates:
+                ts = serializer.validated_data["timestamp"]
+                stamps = seen[serializer._device.id]
+                pos = bisect_left(stamps, ts - DUPLICATE_WINDOW)
+                if pos < len(stamps) and stamps[pos] <= ts + DUPLICATE_WINDOW:
+                    metrics.TELEMETRY_REJECTED.inc("bulk", "duplicate")
+                    errors.append(
+                        {
+                            "index": index,
+                            "data": record,
+                            "errors": {
+                                api_settings.NON_FIELD_ERRORS_KEY: [DUPLICATE_TELEMETRY_MESSAGE]
+                            },
+                        }
+                    )
+                    continue
+                insort(stamps, ts)
+                accepted.append(serializer)
+            errors.sort(key=lambda error: error["index"])
+
+        # ── Insert + last_seen_at ─────────────────────────
+        rows = []
+        touched = {}
+        latest = {}
+        for serializer in accepted:
+            data = serializer.validated_data
+            device = serializer._device
+            telemetry = TelemetryData(
+                device=device,
+                voltage=data["voltage"],
+                current=data["current"],
+                power_factor=data["power_factor"],
+                timestamp=data["timestamp"],
+            )
+            telemetry.compute_power_consumption()
+            rows.append(telemetry)
+            touched[device.id] = device
+            if device.id not in latest or data["timestamp"] > latest[device.id]:
+                latest[device.id] = data["timestamp"]
+
+        load_ingest_state(touched.values())
+        advanced = []
+        reconnected = []
+        now = timezone.now()
+        for device in touched.values():
+            if device.last_seen_at is None or latest[device.id] > device.last_seen_at:
+                if device_reconnected(device.last_seen_at, latest[device.id]):
+                    device.updated_at = now
+                    reconnected.append(device)
+                device.last_seen_at = latest[device.id]
+                advanced.append(device)
+
+        if rows:
+            with transaction.atomic():
+                TelemetryData.objects.bulk_create(rows, batch_size=BULK_WRITE_BATCH_SIZE)
+                record_telemetry_rollups(rows)
+                Device.objects.bulk_update(
+                    advanced, ["last_seen_at"], batch_size=BULK_WRITE_BATCH_SIZE
+                )
+                Device.objects.bulk_update(
+                    reconnected, ["updated_at"], batch_size=BULK_WRITE_BATCH_SIZE
                 )
 
+            # ── Detections + health, once per device ──────
+            run_batch_detections(rows)
+            record_device_health(rows)
+            run_batch_low_health(touched.values())
+            watermarks.touch({device.slot.zone.facility_id for device in touched.values()})
+            metrics.TELEMETRY_ACCEPTED.inc("bulk", amount=len(rows))
+
+        created = [
+            {
+                "device_code": telemetry.device.device_code,
+                "timestamp": str(telemetry.timestamp),
+                "power_consumption": telemetry.power_consumption,
+            }
+            for telemetry in rows
+        ]
         return {"created": created, "errors": errors}
 
 
-class ParkingLogSerializer(serializers.Serializer):
+class ParkingLogSerializer(_CountsRejections, serializers.Serializer):
     """
     Validates and creates a parking occupancy event.
 
     Validation rules:
     - device_code must exist
     - timestamp must not be in the future
+
+    The log row, the slot's materialized SlotOccupancy state and the zone's
+    HourlyOccupancy bucket are written in one transaction.
     """
 
+    rejected_metric = metrics.PARKING_LOGS_REJECTED
+
     device_code = serializers.CharField(max_length=50)
     is_occupied = serializers.BooleanField()
     timestamp = serializers.DateTimeField()
 
     def validate_device_code(self, value):
-        try:
-            device = Device.objects.get(device_code=value, is_active=True)
-        except Device.DoesNotExist:
-            raise serializers.ValidationError(
-                f"Device with code '{value}' does not exist or is inactive."
+        device = resolve_devices([value]).get(value)
+        if device is None:
+            self.reject(
+                "unknown_device", f"Device with code '{value}' does not exist or is inactive."
             )
         self._device = device
         return value
 
     def validate_timestamp(self, value):
-        from datetime import timedelta
-
         # Allow up to 5 minutes of clock skew (common for IoT devices)
         if value > timezone.now() + timedelta(minutes=5):
-            raise serializers.ValidationError("Timestamp cannot be in the future.")
+            self.reject("future_timestamp", "Timestamp cannot be in the future.")
         return value
 
     def create(self, validated_data):
+        from .services import apply_occupancy_event, record_hourly_event
+
         device = self._device
-        log = ParkingLog.objects.create(
-            device=device,
-            is_occupied=validated_data["is_occupied"],
-            timestamp=validated_data["timestamp"],
-        )
+        with transaction.atomic():
+            log = ParkingLog.objects.create(
+                device=device,
+                is_occupied=validated_data["is_occupied"],
+                timestamp=validated_data["timestamp"],
+            )
+            changed = apply_occupancy_event(device, log.is_occupied, log.timestamp)
+            record_hourly_event(device.slot.zone_id, log.timestamp, log.is_occupied)
+            if changed:
+                stream.publish(
+                    "occupancy",
+                    {
+                        "device_id": device.id,
+                        "slot_id": device.slot_id,
+                        "is_occupied": log.is_occupied,
+                        "timestamp": log.timestamp,
+                    },
+                    facility_id=device.slot.zone.facility_id,
+                    zone_id=device.slot.zone_id,
+                )
+            tz = zone_timezone(device.slot.zone_id)
+            watermarks.touch(
+                [device.slot.zone.facility_id],
+                dates=[timezone.localtime(log.timestamp, tz).date()],
+                tz=tz,
+            )
+        metrics.PARKING_LOGS_ACCEPTED.inc()
         return log
 
 
@@ -219,7 +429,7 @@ class FacilitySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ParkingFacility
-        fields = ["id", "name", "address", "is_active", "zone_count", "created_at"]
+        fields = ["id", "name", "address", "timezone", "is_active", "zone_count", "created_at"]
 
     def get_zone_count(self, obj):
         return obj.zones.count()
@@ -243,15 +453,18 @@ class ZoneSerializer(serializers.ModelSerializer):
         ]
 
     def get_occupied_count(self, obj):
-        """Count slots with latest parking log showing is_occupied=True."""
-        count = 0
-        for slot in obj.slots.filter(is_active=True).select_related("device"):
-            device = getattr(slot, "device", None)
-            if device:
-                last_log = device.parking_logs.first()  # ordered by -timestamp
-                if last_log and last_log.is_occupied:
-                    count += 1
-        return count
+        """
+        Count active slots whose current state is occupied.
+
+        Views pass `occupied_counts` ({zone_id: count}, one grouped query for
+        all zones) in the context; otherwise the zone is counted on its own.
+        """
+        counts = self.context.get("occupied_counts")
+        if counts is None:
+            from .services import occupied_counts_by_zone
+
+            counts = occupied_counts_by_zone([obj.id])
+        return counts.get(obj.id, 0)
 
 
 class DeviceSerializer(serializers.ModelSerializer):
@@ -295,12 +508,17 @@ class ParkingTargetSerializer(serializers.ModelSerializer):
         ]
 
     def get_actual_usage(self, obj):
-        """Count unique occupied events for the zone on the target date."""
-        return ParkingLog.objects.filter(
-            device__slot__zone=obj.zone,
-            timestamp__date=obj.date,
-            is_occupied=True,
-        ).count()
+        """
+        Occupied events for the zone on the target date, from the hourly
+        rollup. Views pass `actual_usage` ({(zone_id, date): count}, one
+        grouped query for all targets) in the context.
+        """
+        usage = self.context.get("actual_usage")
+        if usage is None:
+            from .services import usage_by_zone
+
+            usage = usage_by_zone([obj.date], [obj.zone_id])
+        return usage.get((obj.zone_id, obj.date), 0)
 
     def get_efficiency(self, obj):
         """Efficiency = (actual_usage / target_occupancy_count) * 100."""
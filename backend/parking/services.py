@@ -1,9 +1,44 @@
-from datetime import timedelta
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-from django.db.models import Avg, Count
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    DateTimeField,
+    Exists,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Concat, ExtractHour, Greatest, TruncDate
 from django.utils import timezone
 
-from .models import Alert, Device, TelemetryData
+from .models import (
+    Alert,
+    Device,
+    DeviceHealthState,
+    HourlyOccupancy,
+    ParkingFacility,
+    ParkingLog,
+    ParkingSlot,
+    ParkingTarget,
+    ParkingZone,
+    SlotOccupancy,
+    TelemetryData,
+    TelemetryRollup,
+    Tombstone,
+)
+from .rollups import bucket_start
+from . import metrics, stream, sync, watermarks
+from .timeutils import day_bounds, epoch_us, facility_timezone, get_timezone, zone_timezone
+from .topology import INGEST_FIELDS, get_topology
 
 # ── Thresholds ────────────────────────────────────────
 OFFLINE_TIMEOUT_MINUTES = 2
@@ -18,58 +53,386 @@ HEALTH_WEIGHT_VOLTAGE = 0.20
 HEALTH_WEIGHT_POWER = 0.20
 HEALTH_WEIGHT_ALERTS = 0.20
 
+# ── Batch sizes ───────────────────────────────────────
+BULK_WRITE_BATCH_SIZE = 1000
+
+
+_ALERT_INSERT_FIELDS = (
+    'device', 'zone', 'alert_type', 'severity', 'message', 'is_acknowledged', 'created_at',
+    'updated_at',
+)
+
+
+def _insert_alerts_on_conflict(alerts):
+    """
+    PostgreSQL path of _insert_alerts: one multi-row
+    INSERT ... ON CONFLICT DO NOTHING RETURNING per batch. Rows that collide
+    with an open alert (or an earlier row of the same batch) are skipped by
+    the database. Returns the alerts that were inserted, with pk set.
+    """
+    qn = connection.ops.quote_name
+    table = qn(Alert._meta.db_table)
+    fields = [Alert._meta.get_field(name) for name in _ALERT_INSERT_FIELDS]
+    columns = ', '.join(qn(field.column) for field in fields)
+    row = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    now = timezone.now()
+
+    created = []
+    with connection.cursor() as cursor:
+        for i in range(0, len(alerts), BULK_WRITE_BATCH_SIZE):
+            batch = alerts[i:i + BULK_WRITE_BATCH_SIZE]
+            params = []
+            for alert in batch:
+                alert.is_acknowledged = False
+                alert.created_at = alert.updated_at = now
+                params += [field.get_db_prep_save(getattr(alert, field.attname), connection)
+                           for field in fields]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([row] * len(batch))} '
+                f'ON CONFLICT (device_id, alert_type) WHERE NOT is_acknowledged DO NOTHING '
+                f'RETURNING id, device_id, alert_type',
+                params,
+            )
+            inserted = {(device_id, alert_type): pk for pk, device_id, alert_type in cursor.fetchall()}
+            for alert in batch:
+                pk = inserted.pop((alert.device_id, alert.alert_type), None)
+                if pk is not None:
+                    alert.pk = pk
+                    created.append(alert)
+    return created
+
+
+def _insert_alerts(alerts):
+    """
+    Insert unsaved Alert instances, skipping any that would duplicate an
+    open alert of the same (device, alert_type).
+
+    The alert_open_device_type_uniq partial unique index makes this
+    race-free across workers. PostgreSQL resolves conflicts in the INSERT
+    itself; elsewhere the batch is inserted in a savepoint and, if it hits
+    the index, retried row by row.
+    Returns the alerts actually inserted.
+    """
+    if not alerts:
+        return []
+    if connection.vendor == 'postgresql':
+        return _insert_alerts_on_conflict(alerts)
+    try:
+        with transaction.atomic():
+            Alert.objects.bulk_create(alerts, batch_size=BULK_WRITE_BATCH_SIZE)
+        return alerts
+    except IntegrityError:
+        created = []
+        for alert in alerts:
+            alert.pk = None
+            try:
+                with transaction.atomic():
+                    alert.save(force_insert=True)
+            except IntegrityError:
+                continue
+            created.append(alert)
+        return created
+
+
+def _publish_alerts(alerts):
+    """Push newly created alerts to /api/stream/ subscribers on commit."""
+    for alert in alerts:
+        stream.publish(
+            'alert',
+            {
+                'id': alert.pk,
+                'alert_type': alert.alert_type,
+                'severity': alert.severity,
+                'message': alert.message,
+                'device_id': alert.device_id,
+                'created_at': alert.created_at,
+            },
+            facility_id=alert.zone.facility_id if alert.zone else None,
+            zone_id=alert.zone_id,
+        )
+
 
 def _create_alert_if_new(device, zone, alert_type, severity, message):
     """
     Create an alert only if there is no existing unacknowledged alert
     of the same type for the same device (dedup).
+    Returns True if an alert was created.
     """
-    exists = Alert.objects.filter(
+    alert = Alert(
         device=device,
+        zone=zone,
         alert_type=alert_type,
-        is_acknowledged=False,
-    ).exists()
+        severity=severity,
+        message=message,
+    )
+    with transaction.atomic():
+        if not _insert_alerts([alert]):
+            return False
+        _adjust_open_alert_counts({device.id: 1}, [device])
+        _publish_alerts([alert])
+    metrics.ALERTS_CREATED.inc(alert_type, severity)
+    return True
 
-    if not exists:
-        Alert.objects.create(
-            device=device,
-            zone=zone,
-            alert_type=alert_type,
-            severity=severity,
-            message=message,
+
+def _create_alerts_if_new(alerts):
+    """
+    Bulk counterpart of _create_alert_if_new.
+
+    `alerts` is a list of kwargs dicts (device, zone, alert_type, severity,
+    message). Duplicates within `alerts` itself are collapsed to the first
+    occurrence and the rest are inserted in one statement per batch,
+    skipping (device, alert_type) pairs that already have an open alert.
+    Off PostgreSQL the open pairs are looked up first so a routine
+    duplicate does not force the row-by-row retry.
+    Returns the list of created Alert instances.
+    """
+    if not alerts:
+        return []
+
+    open_pairs = set()
+    if connection.vendor != 'postgresql':
+        open_pairs = set(
+            Alert.objects.filter(
+                device_id__in={a['device'].id for a in alerts},
+                alert_type__in={a['alert_type'] for a in alerts},
+                is_acknowledged=False,
+            ).values_list('device_id', 'alert_type')
         )
-        return True
-    return False
+
+    new_alerts = []
+    for kwargs in alerts:
+        key = (kwargs['device'].id, kwargs['alert_type'])
+        if key in open_pairs:
+            continue
+        open_pairs.add(key)
+        new_alerts.append(Alert(**kwargs))
+
+    with transaction.atomic():
+        new_alerts = _insert_alerts(new_alerts)
+        deltas = defaultdict(int)
+        for alert in new_alerts:
+            deltas[alert.device.id] += 1
+        _adjust_open_alert_counts(deltas, [alert.device for alert in new_alerts])
+        _publish_alerts(new_alerts)
+    for alert in new_alerts:
+        metrics.ALERTS_CREATED.inc(alert.alert_type, alert.severity)
+    return new_alerts
 
 
-def detect_offline_devices():
+def _adjust_open_alert_counts(deltas, devices=()):
     """
-    Flag devices that have not sent data within OFFLINE_TIMEOUT_MINUTES.
-    Only active devices are checked.
+    Apply {device_id: delta} to Device.open_alert_count with one UPDATE per
+    distinct delta (and batch of ids), mirroring the change on the given
+    in-memory `devices`.
     """
-    cutoff = timezone.now() - timedelta(minutes=OFFLINE_TIMEOUT_MINUTES)
-    offline_devices = Device.objects.filter(
-        is_active=True,
-        last_seen_at__lt=cutoff,
-    ).select_related('slot__zone')
+    by_delta = defaultdict(list)
+    for device_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(device_id)
+    now = timezone.now()
+    for delta, device_ids in by_delta.items():
+        for i in range(0, len(device_ids), BULK_WRITE_BATCH_SIZE):
+            Device.objects.filter(pk__in=device_ids[i:i + BULK_WRITE_BATCH_SIZE]).update(
+                open_alert_count=Greatest(F('open_alert_count') + delta, 0), updated_at=now
+            )
+    for device in {id(d): d for d in devices}.values():
+        device.open_alert_count = max(0, device.open_alert_count + deltas.get(device.id, 0))
 
-    created_count = 0
-    for device in offline_devices:
-        zone = device.slot.zone
-        created = _create_alert_if_new(
-            device=device,
-            zone=zone,
-            alert_type='DEVICE_OFFLINE',
-            severity='CRITICAL',
-            message=(
-                f'Device {device.device_code} has not sent data '
-                f'for over {OFFLINE_TIMEOUT_MINUTES} minutes.'
+
+def acknowledge_alerts(alerts):
+    """
+    Acknowledge the open alerts in the `alerts` queryset and decrement the
+    owning devices' open_alert_count. The rows are locked first so two
+    concurrent acknowledgements cannot decrement twice.
+    Returns the number of alerts acknowledged.
+    """
+    with transaction.atomic():
+        pending = list(
+            alerts.filter(is_acknowledged=False)
+            .select_for_update(of=('self',))
+            .values_list('id', 'device_id', 'zone_id')
+        )
+        if not pending:
+            return 0
+        now = timezone.now()
+        for i in range(0, len(pending), BULK_WRITE_BATCH_SIZE):
+            Alert.objects.filter(
+                pk__in=[pk for pk, _, _ in pending[i:i + BULK_WRITE_BATCH_SIZE]]
+            ).update(is_acknowledged=True, acknowledged_at=now, updated_at=now)
+        deltas = defaultdict(int)
+        for _, device_id, _ in pending:
+            if device_id is not None:
+                deltas[device_id] -= 1
+        _adjust_open_alert_counts(deltas)
+        watermarks.touch()
+
+        topology = get_topology()
+        for pk, device_id, zone_id in pending:
+            stream.publish(
+                'alert_acknowledged',
+                {'id': pk, 'device_id': device_id, 'acknowledged_at': now},
+                facility_id=topology.facility_of_zone(zone_id),
+                zone_id=zone_id,
+            )
+    return len(pending)
+
+
+def refresh_open_alert_counts():
+    """
+    Recount Device.open_alert_count with one UPDATE of the devices whose
+    count drifted. Returns the number of devices corrected.
+    """
+    open_alerts = (
+        Alert.objects.filter(device=OuterRef('pk'), is_acknowledged=False)
+        .order_by()
+        .values('device')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    actual = Coalesce(Subquery(open_alerts), 0)
+    updated = Device.objects.exclude(open_alert_count=actual).update(
+        open_alert_count=actual, updated_at=timezone.now()
+    )
+    watermarks.touch()
+    return updated
+
+
+def _high_power_alert(device, zone, power_consumption):
+    return {
+        'device': device,
+        'zone': zone,
+        'alert_type': 'HIGH_POWER',
+        'severity': 'WARNING',
+        'message': (
+            f'Device {device.device_code} reported power consumption '
+            f'of {power_consumption}W '
+            f'(threshold: {HIGH_POWER_THRESHOLD_WATTS}W).'
+        ),
+    }
+
+
+def _invalid_data_alert(device, zone, voltage):
+    return {
+        'device': device,
+        'zone': zone,
+        'alert_type': 'INVALID_DATA',
+        'severity': 'WARNING',
+        'message': (
+            f'Device {device.device_code} reported voltage of {voltage}V '
+            f'(valid range: {MIN_VOLTAGE_THRESHOLD}–{MAX_VOLTAGE_THRESHOLD}V).'
+        ),
+    }
+
+
+def _low_health_alert(device, zone):
+    return {
+        'device': device,
+        'zone': zone,
+        'alert_type': 'LOW_HEALTH',
+        'severity': 'INFO',
+        'message': (
+            f'Device {device.device_code} health score '
+            f'dropped to {device.health_score} '
+            f'(threshold: {LOW_HEALTH_THRESHOLD}).'
+        ),
+    }
+
+
+def _is_invalid_voltage(voltage):
+    return voltage < MIN_VOLTAGE_THRESHOLD or voltage > MAX_VOLTAGE_THRESHOLD
+
+
+def detect_offline_devices(auto_resolve=False, now=None):
+    """
+    Flag active devices that have not sent data within OFFLINE_TIMEOUT_MINUTES,
+    including devices that have never reported once they are older than the
+    timeout.
+
+    Set-based regardless of fleet size: the stale devices without an open
+    DEVICE_OFFLINE alert are selected with one anti-join and their alerts
+    inserted by the same INSERT ... SELECT statement, then open_alert_count
+    is bumped with one UPDATE.
+    With `auto_resolve`, open DEVICE_OFFLINE alerts of devices that have
+    reported again are acknowledged in bulk.
+
+    Returns {'offline': stale devices, 'created': alerts raised,
+    'resolved': alerts auto-acknowledged}.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(minutes=OFFLINE_TIMEOUT_MINUTES)
+    open_offline = Alert.objects.filter(alert_type='DEVICE_OFFLINE', is_acknowledged=False)
+
+    stale = Device.objects.filter(is_active=True).filter(
+        Q(last_seen_at__lt=cutoff) | Q(last_seen_at__isnull=True, installed_at__lt=cutoff)
+    )
+    result = {'offline': stale.count(), 'created': 0, 'resolved': 0}
+
+    # INSERT ... SELECT over the anti-join, so no Alert objects are built in
+    # Python however many devices drop out at once
+    new_alerts = (
+        stale.exclude(Exists(open_offline.filter(device=OuterRef('pk'))))
+        .order_by()
+        .annotate(
+            alert_zone=F('slot__zone_id'),
+            alert_type=Value('DEVICE_OFFLINE'),
+            alert_severity=Value('CRITICAL'),
+            alert_message=Case(
+                When(
+                    last_seen_at__isnull=True,
+                    then=Concat(
+                        Value('Device '), 'device_code',
+                        Value(' has not sent any data since installation.'),
+                    ),
+                ),
+                default=Concat(
+                    Value('Device '), 'device_code',
+                    Value(f' has not sent data for over {OFFLINE_TIMEOUT_MINUTES} minutes.'),
+                ),
             ),
+            alert_acknowledged=Value(False),
+            alert_created_at=Value(now, output_field=DateTimeField()),
         )
-        if created:
-            created_count += 1
+        .values_list(
+            'id', 'alert_zone', 'alert_type', 'alert_severity', 'alert_message',
+            'alert_acknowledged', 'alert_created_at', 'alert_created_at',
+        )
+    )
+    select_sql, params = new_alerts.query.sql_with_params()
+    qn = connection.ops.quote_name
+    columns = ', '.join(
+        qn(Alert._meta.get_field(name).column)
+        for name in (
+            'device', 'zone', 'alert_type', 'severity', 'message',
+            'is_acknowledged', 'created_at', 'updated_at',
+        )
+    )
 
-    return created_count
+    with transaction.atomic(), connection.cursor() as cursor:
+        # ON CONFLICT covers a concurrent scan or ingest racing this one
+        cursor.execute(
+            f'INSERT INTO {qn(Alert._meta.db_table)} ({columns}) {select_sql} '
+            f'ON CONFLICT DO NOTHING',
+            params,
+        )
+        result['created'] = cursor.rowcount
+        # The alerts just inserted are exactly the open DEVICE_OFFLINE rows
+        # stamped with this scan's `now`. A rerun with the same `now` that
+        # inserted nothing must not bump the earlier scan's devices again.
+        if result['created']:
+            Device.objects.filter(
+                pk__in=open_offline.filter(created_at=now).values('device_id')
+            ).update(open_alert_count=F('open_alert_count') + 1, updated_at=now)
+
+    if auto_resolve:
+        result['resolved'] = acknowledge_alerts(
+            open_offline.filter(device__last_seen_at__gte=cutoff)
+        )
+    if result['created']:
+        watermarks.touch()
+        stream.publish(
+            'alerts_raised', {'alert_type': 'DEVICE_OFFLINE', 'count': result['created']}
+        )
+    return result
 
 
 def detect_high_power(telemetry):
@@ -79,17 +442,8 @@ def detect_high_power(telemetry):
     """
     if telemetry.power_consumption > HIGH_POWER_THRESHOLD_WATTS:
         device = telemetry.device
-        zone = device.slot.zone
         return _create_alert_if_new(
-            device=device,
-            zone=zone,
-            alert_type='HIGH_POWER',
-            severity='WARNING',
-            message=(
-                f'Device {device.device_code} reported power consumption '
-                f'of {telemetry.power_consumption}W '
-                f'(threshold: {HIGH_POWER_THRESHOLD_WATTS}W).'
-            ),
+            **_high_power_alert(device, device.slot.zone, telemetry.power_consumption)
         )
     return False
 
@@ -99,19 +453,10 @@ def detect_invalid_data(telemetry):
     Check if telemetry voltage is outside the valid range.
     Called inline after telemetry ingestion.
     """
-    v = telemetry.voltage
-    if v < MIN_VOLTAGE_THRESHOLD or v > MAX_VOLTAGE_THRESHOLD:
+    if _is_invalid_voltage(telemetry.voltage):
         device = telemetry.device
-        zone = device.slot.zone
         return _create_alert_if_new(
-            device=device,
-            zone=zone,
-            alert_type='INVALID_DATA',
-            severity='WARNING',
-            message=(
-                f'Device {device.device_code} reported voltage of {v}V '
-                f'(valid range: {MIN_VOLTAGE_THRESHOLD}–{MAX_VOLTAGE_THRESHOLD}V).'
-            ),
+            **_invalid_data_alert(device, device.slot.zone, telemetry.voltage)
         )
     return False
 
@@ -121,18 +466,7 @@ def detect_low_health(device):
     Check if device health score is below the threshold.
     """
     if device.health_score < LOW_HEALTH_THRESHOLD:
-        zone = device.slot.zone
-        return _create_alert_if_new(
-            device=device,
-            zone=zone,
-            alert_type='LOW_HEALTH',
-            severity='INFO',
-            message=(
-                f'Device {device.device_code} health score '
-                f'dropped to {device.health_score} '
-                f'(threshold: {LOW_HEALTH_THRESHOLD}).'
-            ),
-        )
+        return _create_alert_if_new(**_low_health_alert(device, device.slot.zone))
     return False
 
 
@@ -151,24 +485,70 @@ def run_all_detections(telemetry):
     return triggered
 
 
-def compute_device_health(device):
+def run_batch_detections(telemetry_records):
     """
-    Compute a 0–100 health score for a device based on:
-      - Recency of last data (40%): full marks if seen < 5 min ago, 0 if > 60 min
-      - Voltage stability (20%): based on avg voltage in last hour
-      - Power normality (20%): based on avg power in last hour
-      - Open alerts (20%): 100 if 0 alerts, decreases with more alerts
+    Batch counterpart of run_all_detections used by bulk ingestion, minus
+    LOW_HEALTH (see run_batch_low_health).
 
-    Updates device.health_score in the database.
-    Returns the computed score.
+    Each device is evaluated once per batch: its highest-power sample is
+    checked against the power threshold and its first out-of-range sample
+    raises INVALID_DATA. All resulting alerts are deduplicated and inserted
+    with one lookup and one INSERT, regardless of batch size. Run it before
+    record_device_health, so the new alerts count in the open-alert factor.
+
+    Returns {device_id: [alert types triggered]}.
     """
-    now = timezone.now()
-    one_hour_ago = now - timedelta(hours=1)
+    by_device = defaultdict(list)
+    for telemetry in telemetry_records:
+        by_device[telemetry.device_id].append(telemetry)
+
+    candidates = []
+    for samples in by_device.values():
+        device = samples[0].device
+        zone = device.slot.zone
+
+        peak = max(samples, key=lambda t: t.power_consumption)
+        if peak.power_consumption > HIGH_POWER_THRESHOLD_WATTS:
+            candidates.append(_high_power_alert(device, zone, peak.power_consumption))
+
+        invalid = next((t for t in samples if _is_invalid_voltage(t.voltage)), None)
+        if invalid is not None:
+            candidates.append(_invalid_data_alert(device, zone, invalid.voltage))
 
+    triggered = defaultdict(list)
+    for alert in _create_alerts_if_new(candidates):
+        triggered[alert.device_id].append(alert.alert_type)
+    return dict(triggered)
+
+
+def run_batch_low_health(devices):
+    """
+    LOW_HEALTH detection for bulk ingestion, against each device's
+    health_score as record_device_health left it, so the batch's own
+    samples count. One lookup and one INSERT, and no queries when no
+    device is below the threshold.
+    Returns the device ids that got a new LOW_HEALTH alert.
+    """
+    return [
+        alert.device_id
+        for alert in _create_alerts_if_new([
+            _low_health_alert(device, device.slot.zone)
+            for device in devices
+            if device.health_score < LOW_HEALTH_THRESHOLD
+        ])
+    ]
+
+
+def _health_score(now, last_seen_at, avg_voltage, avg_power, open_alert_count):
+    """
+    Weighted 0–100 health score from the four factors described in
+    compute_device_health. Pure function shared by the per-device and
+    batch code paths.
+    """
     # ── Factor 1: Recency (40%) ──────────────────────
     recency_score = 0
-    if device.last_seen_at:
-        minutes_since = (now - device.last_seen_at).total_seconds() / 60
+    if last_seen_at:
+        minutes_since = (now - last_seen_at).total_seconds() / 60
         if minutes_since <= OFFLINE_TIMEOUT_MINUTES:
             recency_score = 100
         elif minutes_since <= 60:
@@ -177,37 +557,27 @@ def compute_device_health(device):
         # else: 0
 
     # ── Factor 2: Voltage stability (20%) ─────────────
-    recent_telemetry = TelemetryData.objects.filter(
-        device=device, timestamp__gte=one_hour_ago
-    )
-    stats = recent_telemetry.aggregate(avg_voltage=Avg('voltage'), avg_power=Avg('power_consumption'))
-
     voltage_score = 100
-    avg_v = stats.get('avg_voltage')
-    if avg_v is not None:
+    if avg_voltage is not None:
         # Ideal range: 200–250V
-        if 200 <= avg_v <= 250:
+        if 200 <= avg_voltage <= 250:
             voltage_score = 100
-        elif 150 <= avg_v < 200 or 250 < avg_v <= 300:
+        elif 150 <= avg_voltage < 200 or 250 < avg_voltage <= 300:
             voltage_score = 60
         else:
             voltage_score = 20
 
     # ── Factor 3: Power normality (20%) ───────────────
     power_score = 100
-    avg_p = stats.get('avg_power')
-    if avg_p is not None:
-        if avg_p <= HIGH_POWER_THRESHOLD_WATTS:
+    if avg_power is not None:
+        if avg_power <= HIGH_POWER_THRESHOLD_WATTS:
             power_score = 100
-        elif avg_p <= HIGH_POWER_THRESHOLD_WATTS * 1.5:
+        elif avg_power <= HIGH_POWER_THRESHOLD_WATTS * 1.5:
             power_score = 50
         else:
             power_score = 10
 
     # ── Factor 4: Open alerts (20%) ───────────────────
-    open_alert_count = Alert.objects.filter(
-        device=device, is_acknowledged=False
-    ).count()
     if open_alert_count == 0:
         alert_score = 100
     elif open_alert_count <= 2:
@@ -222,9 +592,821 @@ def compute_device_health(device):
         + power_score * HEALTH_WEIGHT_POWER
         + alert_score * HEALTH_WEIGHT_ALERTS
     )
-    score = max(0, min(100, score))
+    return max(0, min(100, score))
+
+
+def _hourly_averages(now, **devices):
+    """
+    {device_id: (avg_voltage, avg_power)} over the telemetry of the hour
+    ending at `now` (timestamp >= now - 1h, like a raw AVG): whole 1-minute
+    rollup buckets from the first minute boundary of the hour, plus the raw
+    rows of the partial minute before it. `devices` filters both tables
+    (e.g. device_id__in=...). Two grouped queries; devices without
+    telemetry in the hour are left out.
+    """
+    since = now - timedelta(hours=1)
+    first_minute = bucket_start(since, TelemetryRollup.TIER_1MIN)
+    if first_minute < since:
+        first_minute += timedelta(minutes=1)
+
+    sums = defaultdict(lambda: [0, 0.0, 0.0])
+    whole_minutes = (
+        TelemetryRollup.objects.filter(
+            tier=TelemetryRollup.TIER_1MIN, bucket_start__gte=first_minute, **devices
+        )
+        .values('device_id')
+        .annotate(count=Sum('sample_count'), voltage=Sum('voltage_sum'), power=Sum('power_sum'))
+        .values_list('device_id', 'count', 'voltage', 'power')
+        .order_by()
+    )
+    partial_minute = (
+        TelemetryData.objects.filter(timestamp__gte=since, timestamp__lt=first_minute, **devices)
+        .values('device_id')
+        .annotate(count=Count('id'), voltage=Sum('voltage'), power=Sum('power_consumption'))
+        .values_list('device_id', 'count', 'voltage', 'power')
+        .order_by()
+    )
+    for rows in (whole_minutes, partial_minute):
+        for device_id, count, voltage, power in rows:
+            acc = sums[device_id]
+            acc[0] += count
+            acc[1] += voltage
+            acc[2] += power
+    return {
+        device_id: (voltage / count, power / count)
+        for device_id, (count, voltage, power) in sums.items()
+        if count
+    }
+
+
+def _health_window_start(now):
+    """Start of the one-hour scoring window ending at `now`, in epoch microseconds."""
+    return epoch_us(now - timedelta(hours=1))
 
-    device.health_score = score
-    device.save(update_fields=['health_score'])
 
+def compute_device_health(device):
+    """
+    Compute a 0–100 health score for a device based on:
+      - Recency of last data (40%): full marks if seen < 5 min ago, 0 if > 60 min
+      - Voltage stability (20%): based on avg voltage in last hour
+      - Power normality (20%): based on avg power in last hour
+      - Open alerts (20%): 100 if 0 alerts, decreases with more alerts
+
+    Hourly averages come from the 1-minute TelemetryRollup tier (at most 60
+    buckets) plus the raw rows of the hour's partial first minute, so they
+    equal a raw AVG over the hour without scanning it. Ingestion uses the
+    streaming record_device_health instead; this query-based version is the
+    reference it is verified against.
+
+    Updates device.health_score in the database if it changed.
+    Returns the computed score.
+    """
+    score = query_health_scores([device])[device.id]
+    if score != device.health_score:
+        device.health_score = score
+        device.save(update_fields=['health_score', 'updated_at'])
     return score
+
+
+def query_health_scores(devices, now=None):
+    """
+    Score `devices` from the hour's averages (see _hourly_averages) and an
+    open-alert COUNT. Nothing is written.
+    Returns {device_id: score}.
+    """
+    devices = list(devices)
+    if not devices:
+        return {}
+
+    now = now or timezone.now()
+    device_ids = [d.id for d in devices]
+
+    averages = _hourly_averages(now, device_id__in=device_ids)
+    open_alerts = dict(
+        Alert.objects.filter(device_id__in=device_ids, is_acknowledged=False)
+        .values('device_id')
+        .annotate(count=Count('id'))
+        .values_list('device_id', 'count')
+    )
+
+    scores = {}
+    for device in devices:
+        avg_voltage, avg_power = averages.get(device.id, (None, None))
+        scores[device.id] = _health_score(
+            now,
+            device.last_seen_at,
+            avg_voltage,
+            avg_power,
+            open_alerts.get(device.id, 0),
+        )
+    return scores
+
+
+def compute_device_health_bulk(devices):
+    """
+    Batch counterpart of compute_device_health.
+
+    Pulls the last hour's voltage/power averages (1-minute rollup tier) and
+    the open-alert counts for all `devices` with one grouped query each,
+    then writes back only the scores that changed with a single bulk_update.
+
+    Returns {device_id: score}.
+    """
+    devices = list(devices)
+    scores = query_health_scores(devices)
+
+    now = timezone.now()
+    changed = []
+    for device in devices:
+        if scores[device.id] != device.health_score:
+            device.health_score = scores[device.id]
+            device.updated_at = now
+            changed.append(device)
+
+    Device.objects.bulk_update(
+        changed, ['health_score', 'updated_at'], batch_size=BULK_WRITE_BATCH_SIZE
+    )
+    return scores
+
+
+# ── Streaming health ──────────────────────────────────
+
+
+def _health_state(device):
+    """The device's DeviceHealthState (cached by select_related), or a new unsaved one."""
+    try:
+        return device.health_state
+    except DeviceHealthState.DoesNotExist:
+        state = DeviceHealthState(device=device)
+        device.health_state = state
+        return state
+
+
+def load_ingest_state(devices):
+    """
+    Load last_seen_at, health_score, open_alert_count and the health window
+    onto device stubs from parking.topology, with one primary-key query.
+    These change with every message, so unlike the topology they are never
+    cached.
+    """
+    by_id = {device.id: device for device in devices}
+    if not by_id:
+        return
+    rows = (
+        Device.objects.filter(pk__in=by_id)
+        .select_related('health_state')
+        .only('id', *INGEST_FIELDS, 'health_state__buckets', 'health_state__updated_at')
+    )
+    for row in rows:
+        device = by_id[row.id]
+        for field in INGEST_FIELDS:
+            setattr(device, field, getattr(row, field))
+        try:
+            device.health_state = row.health_state
+        except DeviceHealthState.DoesNotExist:
+            device.health_state = DeviceHealthState(device=device)
+
+
+def streaming_health_score(device, now=None):
+    """
+    Score `device` from its rolling window and open_alert_count — no
+    queries when health_state was loaded with select_related.
+    """
+    now = now or timezone.now()
+    avg_voltage, avg_power = _health_state(device).averages(_health_window_start(now))
+    return _health_score(now, device.last_seen_at, avg_voltage, avg_power, device.open_alert_count)
+
+
+def record_device_health(samples):
+    """
+    Fold freshly ingested telemetry into each device's DeviceHealthState
+    and rescore the device from that window and Device.open_alert_count.
+
+    The cost per sample is constant: the windows are written back with one
+    upsert and health_score is only written for devices whose score
+    changed. Each device's last_seen_at and open_alert_count must already
+    reflect the batch. The window rows are locked and re-read first (see
+    _lock_health_states), so concurrent writers for the same device merge
+    their samples instead of overwriting each other's.
+
+    Returns {device_id: score}.
+    """
+    by_device = defaultdict(list)
+    devices = {}
+    for sample in samples:
+        by_device[sample.device_id].append(sample)
+        devices[sample.device_id] = sample.device
+    if not devices:
+        return {}
+
+    now = timezone.now()
+    window_start = _health_window_start(now)
+    states = []
+    changed = []
+    scores = {}
+    # No savepoint when nested: a failure here fails the caller's transaction anyway
+    with transaction.atomic(savepoint=False):
+        _lock_health_states(devices, now)
+        for device_id, device in devices.items():
+            state = _health_state(device)
+            state.add_samples(by_device[device_id], window_start)
+            states.append(state)
+
+            scores[device_id] = streaming_health_score(device, now)
+            if scores[device_id] != device.health_score:
+                device.health_score = scores[device_id]
+                device.updated_at = now
+                changed.append(device)
+
+        DeviceHealthState.objects.bulk_create(
+            states,
+            batch_size=BULK_WRITE_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['device'],
+            update_fields=['buckets', 'updated_at'],
+        )
+        Device.objects.bulk_update(
+            changed, ['health_score', 'updated_at'], batch_size=BULK_WRITE_BATCH_SIZE
+        )
+    return scores
+
+
+def _lock_health_states(devices, now):
+    """
+    Lock the DeviceHealthState rows of `devices` ({device_id: device}) for
+    the rest of the transaction and reload their buckets onto the devices,
+    replacing what load_ingest_state read before the lock.
+
+    Missing rows are inserted first so there is always a row to lock. Rows
+    are locked in id order, so two batches cannot deadlock. SQLite has no
+    row locks; there a no-op UPDATE takes the database write lock instead.
+    """
+    device_ids = sorted(devices)
+    missing = [
+        DeviceHealthState(device_id=device_id)
+        for device_id in device_ids
+        if _health_state(devices[device_id])._state.adding
+    ]
+    if missing:
+        DeviceHealthState.objects.bulk_create(
+            missing, batch_size=BULK_WRITE_BATCH_SIZE, ignore_conflicts=True
+        )
+    rows = DeviceHealthState.objects.filter(pk__in=device_ids)
+    if connection.features.has_select_for_update:
+        rows = rows.select_for_update()
+    else:
+        rows.update(updated_at=now)
+    buckets = dict(rows.order_by('pk').values_list('device_id', 'buckets'))
+    for device_id, device in devices.items():
+        state = _health_state(device)
+        state.buckets = buckets.get(device_id, [])
+        state._state.adding = False
+
+
+def rebuild_health_state():
+    """
+    Re-derive every device's health window from the last hour of raw
+    telemetry and recount open_alert_count. Used after bulk loads that
+    bypass ingestion and to repair drift.
+    Returns the number of windows written.
+    """
+    now = timezone.now()
+    window_start = _health_window_start(now)
+    samples = defaultdict(list)
+    for row in (
+        TelemetryData.objects.filter(timestamp__gte=now - timedelta(hours=1))
+        .values_list('device_id', 'timestamp', 'voltage', 'power_consumption', named=True)
+        .order_by()
+    ):
+        samples[row.device_id].append(row)
+
+    def window(device_id):
+        state = DeviceHealthState(device_id=device_id)
+        state.add_samples(samples.get(device_id, ()), window_start)
+        return state
+
+    with transaction.atomic():
+        refresh_open_alert_counts()
+        DeviceHealthState.objects.all().delete()
+        DeviceHealthState.objects.bulk_create(
+            (
+                window(device_id)
+                for device_id in Device.objects.values_list('id', flat=True).iterator()
+            ),
+            batch_size=BULK_WRITE_BATCH_SIZE,
+        )
+    watermarks.reset()
+    return DeviceHealthState.objects.count()
+
+
+# ── Fleet-wide recomputation ──────────────────────────
+
+
+def _health_scores_array(now_us, last_seen_us, avg_voltage, avg_power, open_alerts):
+    """
+    Vectorized _health_score over NumPy arrays. Times are epoch
+    microseconds; missing last_seen_at and missing averages are NaN. The
+    thresholds, weights and truncation are the same as the scalar version.
+    """
+    import numpy as np
+
+    minutes = (now_us - last_seen_us) / 1e6 / 60
+    recency = np.where(
+        minutes <= OFFLINE_TIMEOUT_MINUTES,
+        100.0,
+        np.where(
+            minutes <= 60,
+            np.maximum(0, 100 - (minutes - OFFLINE_TIMEOUT_MINUTES) * (100 / 55)),
+            0.0,
+        ),
+    )
+    voltage = np.select(
+        [
+            np.isnan(avg_voltage),
+            (avg_voltage >= 200) & (avg_voltage <= 250),
+            ((avg_voltage >= 150) & (avg_voltage < 200)) | ((avg_voltage > 250) & (avg_voltage <= 300)),
+        ],
+        [100, 100, 60],
+        default=20,
+    )
+    power = np.select(
+        [
+            np.isnan(avg_power),
+            avg_power <= HIGH_POWER_THRESHOLD_WATTS,
+            avg_power <= HIGH_POWER_THRESHOLD_WATTS * 1.5,
+        ],
+        [100, 100, 50],
+        default=10,
+    )
+    alerts = np.select([open_alerts == 0, open_alerts <= 2], [100, 60], default=20)
+
+    score = (
+        recency * HEALTH_WEIGHT_RECENCY
+        + voltage * HEALTH_WEIGHT_VOLTAGE
+        + power * HEALTH_WEIGHT_POWER
+        + alerts * HEALTH_WEIGHT_ALERTS
+    )
+    return np.clip(score.astype(np.int64), 0, 100)
+
+
+def recompute_fleet_health(now=None, raise_alerts=True, batch_size=BULK_WRITE_BATCH_SIZE):
+    """
+    Rescore every active device in one pass, including devices that have
+    stopped sending telemetry (whose recency factor keeps decaying).
+
+    Reads the last hour's per-device averages (see _hourly_averages) and
+    the open-alert counts with grouped queries, scores
+    the whole fleet with NumPy, writes back the scores that changed grouped
+    by value, and raises LOW_HEALTH alerts in bulk. open_alert_count is not
+    written: the count read here may already be stale, and alert creation
+    and acknowledgement adjust it concurrently. refresh_open_alert_counts
+    repairs drift.
+
+    Returns {'devices', 'changed', 'alerts_created', 'timings'} where
+    timings maps each phase to seconds.
+    """
+    import numpy as np
+
+    timings = {}
+    clock = [time.perf_counter()]
+
+    def lap(phase):
+        tick = time.perf_counter()
+        timings[phase] = tick - clock[0]
+        clock[0] = tick
+
+    now = now or timezone.now()
+
+    # ── Load ──────────────────────────────────────────
+    rows = list(
+        Device.objects.filter(is_active=True)
+        .order_by('id')
+        .values_list('id', 'last_seen_at', 'health_score')
+    )
+    result = {'devices': len(rows), 'changed': 0, 'alerts_created': 0, 'timings': timings}
+    if not rows:
+        return result
+    count = len(rows)
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+    last_seen_us = np.fromiter(
+        (epoch_us(row[1]) if row[1] else np.nan for row in rows), dtype=np.float64, count=count
+    )
+    current_scores = np.fromiter((row[2] for row in rows), dtype=np.int64, count=count)
+    lap('load')
+
+    def positions(device_ids):
+        """Index into `ids` of each device id, and a mask of the ids that were found."""
+        device_ids = np.asarray(device_ids, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(ids, device_ids), count - 1)
+        return pos, ids[pos] == device_ids
+
+    # ── Aggregates ────────────────────────────────────
+    avg_voltage = np.full(count, np.nan)
+    avg_power = np.full(count, np.nan)
+    stats = _hourly_averages(now, device__is_active=True)
+    if stats:
+        device_ids = list(stats)
+        voltages, powers = zip(*stats.values())
+        pos, found = positions(device_ids)
+        avg_voltage[pos[found]] = np.asarray(voltages, dtype=np.float64)[found]
+        avg_power[pos[found]] = np.asarray(powers, dtype=np.float64)[found]
+    lap('aggregates')
+
+    open_alerts = np.zeros(count, dtype=np.int64)
+    alert_counts = list(
+        Alert.objects.filter(device__is_active=True, is_acknowledged=False)
+        .values('device_id')
+        .annotate(count=Count('id'))
+        .values_list('device_id', 'count')
+        .order_by()
+    )
+    if alert_counts:
+        device_ids, counts = zip(*alert_counts)
+        pos, found = positions(device_ids)
+        open_alerts[pos[found]] = np.asarray(counts, dtype=np.int64)[found]
+    lap('open_alerts')
+
+    # ── Score ─────────────────────────────────────────
+    scores = _health_scores_array(
+        epoch_us(now), last_seen_us, avg_voltage, avg_power, open_alerts
+    )
+    lap('score')
+
+    # ── Write back ────────────────────────────────────
+    # Scores are integers 0–100, so the changed rows fall into at most 101
+    # groups. One `UPDATE ... WHERE id IN` per group and chunk is far
+    # cheaper than bulk_update's per-row CASE.
+    changed = np.flatnonzero(scores != current_scores)
+    groups = defaultdict(list)
+    for i in changed.tolist():
+        groups[int(scores[i])].append(int(ids[i]))
+    stamp = timezone.now()
+    with transaction.atomic():
+        for score, device_ids in groups.items():
+            for i in range(0, len(device_ids), batch_size):
+                Device.objects.filter(pk__in=device_ids[i:i + batch_size]).update(
+                    health_score=score, updated_at=stamp
+                )
+    result['changed'] = len(changed)
+    lap('write')
+
+    # ── LOW_HEALTH alerts ─────────────────────────────
+    if raise_alerts:
+        # The scores are stored now, so one anti-join finds the low-health
+        # devices that do not already have an open LOW_HEALTH alert
+        candidates = (
+            Device.objects.filter(is_active=True, health_score__lt=LOW_HEALTH_THRESHOLD)
+            .exclude(Exists(Alert.objects.filter(
+                device=OuterRef('pk'), alert_type='LOW_HEALTH', is_acknowledged=False,
+            )))
+            .select_related('slot__zone')
+            .order_by('id')
+        )
+        with transaction.atomic():
+            pending = []
+            for device in candidates.iterator(chunk_size=batch_size):
+                pending.append(_low_health_alert(device, device.slot.zone))
+                if len(pending) == batch_size:
+                    result['alerts_created'] += len(_create_alerts_if_new(pending))
+                    pending = []
+            result['alerts_created'] += len(_create_alerts_if_new(pending))
+    lap('alerts')
+    watermarks.touch()
+    return result
+
+
+# ── Occupancy state ───────────────────────────────────
+
+
+def apply_occupancy_event(device, is_occupied, timestamp):
+    """
+    Advance the materialized SlotOccupancy row for `device` to the given
+    event, unless the stored state is already newer (late, out-of-order
+    events are ignored). Must be called inside the transaction that writes
+    the ParkingLog. Returns True if the state row was changed.
+    """
+    stale = SlotOccupancy.objects.filter(device=device, timestamp__lte=timestamp)
+    changes = {'is_occupied': is_occupied, 'timestamp': timestamp, 'updated_at': timezone.now()}
+    if stale.update(**changes):
+        return True
+
+    # Either no state row yet, or the stored state is newer than this event.
+    try:
+        with transaction.atomic():
+            SlotOccupancy.objects.create(
+                device=device,
+                zone_id=device.slot.zone_id,
+                is_occupied=is_occupied,
+                timestamp=timestamp,
+            )
+    except IntegrityError:
+        # A concurrent writer created the row first; re-apply the guard.
+        return bool(stale.update(**changes))
+    return True
+
+
+def occupied_counts_by_zone(zone_ids=None):
+    """
+    Number of currently occupied active slots per zone, from one grouped
+    COUNT over SlotOccupancy. Returns {zone_id: count}; zones with no
+    occupied slots are absent.
+    """
+    qs = SlotOccupancy.objects.filter(is_occupied=True, device__slot__is_active=True)
+    if zone_ids is not None:
+        qs = qs.filter(zone_id__in=zone_ids)
+    return dict(
+        qs.values('zone_id').annotate(count=Count('pk')).values_list('zone_id', 'count')
+    )
+
+
+def rebuild_slot_occupancy(batch_size=BULK_WRITE_BATCH_SIZE):
+    """
+    Recompute every SlotOccupancy row from the latest ParkingLog of each
+    device. Runs in one transaction so readers never see a partial state.
+    Returns the number of rows written.
+    """
+    latest = ParkingLog.objects.filter(device=OuterRef('pk')).order_by('-timestamp', '-id')
+    rows = (
+        Device.objects.annotate(
+            last_occupied=Subquery(latest.values('is_occupied')[:1]),
+            last_timestamp=Subquery(latest.values('timestamp')[:1]),
+        )
+        .filter(last_timestamp__isnull=False)
+        .values_list('id', 'slot__zone_id', 'last_occupied', 'last_timestamp')
+        .order_by()
+    )
+
+    written = 0
+    with transaction.atomic():
+        # Devices left without a state row are reported to sync clients
+        vanished = set(SlotOccupancy.objects.values_list('device_id', flat=True))
+        SlotOccupancy.objects.all().delete()
+        batch = []
+        for device_id, zone_id, is_occupied, timestamp in rows.iterator(chunk_size=batch_size):
+            vanished.discard(device_id)
+            batch.append(SlotOccupancy(
+                device_id=device_id,
+                zone_id=zone_id,
+                is_occupied=is_occupied,
+                timestamp=timestamp,
+            ))
+            if len(batch) >= batch_size:
+                SlotOccupancy.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        SlotOccupancy.objects.bulk_create(batch)
+        written += len(batch)
+        sync.record_deleted(Tombstone.KIND_OCCUPANCY, sorted(vanished))
+    watermarks.reset()
+    return written
+
+
+# ── Hourly occupancy rollup ───────────────────────────
+
+
+def record_hourly_event(zone_id, timestamp, is_occupied):
+    """
+    Count one ParkingLog event into its (zone, date, hour) HourlyOccupancy
+    bucket. Buckets use the local date and hour of the zone's facility,
+    matching rebuild_hourly_occupancy(). Must be called inside the
+    transaction that writes the ParkingLog.
+    """
+    local = timezone.localtime(timestamp, zone_timezone(zone_id))
+    field = 'occupied_events' if is_occupied else 'vacated_events'
+    bucket = HourlyOccupancy.objects.filter(zone_id=zone_id, date=local.date(), hour=local.hour)
+    if bucket.update(**{field: F(field) + 1}):
+        return
+
+    try:
+        with transaction.atomic():
+            HourlyOccupancy.objects.create(
+                zone_id=zone_id, date=local.date(), hour=local.hour, **{field: 1}
+            )
+    except IntegrityError:
+        # A concurrent writer created the bucket first.
+        bucket.update(**{field: F(field) + 1})
+
+
+def usage_by_zone(dates, zone_ids=None):
+    """
+    Occupied events per zone and day from the hourly rollup, in one grouped
+    query. Returns {(zone_id, date): occupied_events}.
+    """
+    qs = HourlyOccupancy.objects.filter(date__in=dates)
+    if zone_ids is not None:
+        qs = qs.filter(zone_id__in=zone_ids)
+    return {
+        (row['zone_id'], row['date']): row['occupied']
+        for row in qs.values('zone_id', 'date').annotate(occupied=Sum('occupied_events')).order_by()
+    }
+
+
+def rebuild_hourly_occupancy(start_date=None, end_date=None, batch_size=BULK_WRITE_BATCH_SIZE):
+    """
+    Recompute HourlyOccupancy from ParkingLog for the given (inclusive)
+    date range, or for all history when no range is given. Dates and hours
+    are local to each facility, so logs are bucketed one facility time zone
+    at a time. Existing buckets in the range are replaced in one transaction.
+    Returns the number of buckets written.
+    """
+    buckets = HourlyOccupancy.objects.all()
+    if start_date:
+        buckets = buckets.filter(date__gte=start_date)
+    if end_date:
+        buckets = buckets.filter(date__lte=end_date)
+
+    def rows_in(tz_name):
+        tz = get_timezone(tz_name)
+        logs = ParkingLog.objects.filter(zone__facility__timezone=tz_name)
+        if start_date:
+            logs = logs.filter(timestamp__gte=day_bounds(start_date, tz)[0])
+        if end_date:
+            logs = logs.filter(timestamp__lt=day_bounds(end_date, tz)[1])
+        return (
+            logs.annotate(
+                day=TruncDate('timestamp', tzinfo=tz), hour=ExtractHour('timestamp', tzinfo=tz),
+            )
+            .values('zone_id', 'day', 'hour')
+            .annotate(
+                occupied=Count('id', filter=Q(is_occupied=True)),
+                vacated=Count('id', filter=Q(is_occupied=False)),
+            )
+            .order_by()
+            .iterator(chunk_size=batch_size)
+        )
+
+    timezones = ParkingFacility.objects.order_by().values_list('timezone', flat=True).distinct()
+    with transaction.atomic():
+        buckets.delete()
+        created = HourlyOccupancy.objects.bulk_create(
+            (
+                HourlyOccupancy(
+                    zone_id=row['zone_id'],
+                    date=row['day'],
+                    hour=row['hour'],
+                    occupied_events=row['occupied'],
+                    vacated_events=row['vacated'],
+                )
+                for tz_name in list(timezones)
+                for row in rows_in(tz_name)
+            ),
+            batch_size=batch_size,
+        )
+    watermarks.reset()
+    return len(created)
+
+
+# ── Dashboard ─────────────────────────────────────────
+
+
+def _percent(part, whole):
+    return round((part / whole) * 100, 1) if whole > 0 else 0
+
+
+def dashboard_summary(target_date, facility_id=None):
+    """
+    Dashboard overview for `target_date`, optionally scoped to one facility.
+    The date is local to that facility (or to the current time zone).
+
+    Runs a fixed number of queries however many zones and slots there are:
+    one aggregate each for slots, devices and alerts (conditional counts by
+    severity), one grouped query for the day's hourly rollup (event totals
+    and per-zone usage), and one query each for zones, targets and current
+    occupancy.
+    """
+    slot_qs = ParkingSlot.objects.filter(is_active=True)
+    device_qs = Device.objects.filter(is_active=True)
+    zone_qs = ParkingZone.objects.select_related('facility').filter(is_active=True)
+    target_qs = ParkingTarget.objects.filter(date=target_date)
+    hourly_qs = HourlyOccupancy.objects.filter(date=target_date)
+    alert_qs = Alert.objects.all()
+    if facility_id:
+        slot_qs = slot_qs.filter(zone__facility_id=facility_id)
+        device_qs = device_qs.filter(slot__zone__facility_id=facility_id)
+        zone_qs = zone_qs.filter(facility_id=facility_id)
+        target_qs = target_qs.filter(zone__facility_id=facility_id)
+        hourly_qs = hourly_qs.filter(zone__facility_id=facility_id)
+        alert_qs = alert_qs.filter(zone__facility_id=facility_id)
+
+    total_slots = slot_qs.count()
+    devices = device_qs.aggregate(count=Count('pk'), avg_health=Avg('health_score'))
+
+    # ── Events and usage for the date, one GROUP BY zone ──
+    usage = {}
+    total_parking_events = 0
+    for zone_id, occupied, vacated in (
+        hourly_qs
+        .values('zone_id')
+        .annotate(occupied=Sum('occupied_events'), vacated=Sum('vacated_events'))
+        .values_list('zone_id', 'occupied', 'vacated')
+        .order_by()
+    ):
+        usage[zone_id] = occupied
+        total_parking_events += occupied + vacated
+
+    # ── Alerts: open counts by severity + triggered on the date ──
+    start, end = day_bounds(target_date, facility_timezone(facility_id))
+    open_alert = Q(is_acknowledged=False)
+    on_date = Q(created_at__gte=start, created_at__lt=end)
+    # Only open alerts and the date's alerts are read, through
+    # alert_ack_created_idx and the created_at range, not the whole history.
+    # Value(False) renders "is_acknowledged = false" rather than
+    # "NOT is_acknowledged", which SQLite can only answer with a table scan.
+    alert_summary = alert_qs.filter(
+        Q(is_acknowledged=Value(False)) | on_date
+    ).aggregate(
+        total=Count('pk', filter=open_alert),
+        critical=Count('pk', filter=open_alert & Q(severity='CRITICAL')),
+        warning=Count('pk', filter=open_alert & Q(severity='WARNING')),
+        info=Count('pk', filter=open_alert & Q(severity='INFO')),
+        triggered_on_date=Count('pk', filter=on_date),
+    )
+
+    # ── Efficiency indicators ─────────────────────────
+    targets = dict(target_qs.values_list('zone_id', 'target_occupancy_count'))
+    total_target_usage = sum(targets.values())
+    total_actual_usage = sum(usage.get(zone_id, 0) for zone_id in targets)
+    efficiency_summary = {
+        'target_usage': total_target_usage,
+        'actual_usage': total_actual_usage,
+        'efficiency_percentage': _percent(total_actual_usage, total_target_usage) or 0.0,
+    }
+
+    # ── Zone breakdown ────────────────────────────────
+    zones = list(zone_qs)
+    occupied_counts = occupied_counts_by_zone([zone.id for zone in zones])
+    zone_data = []
+    total_occupied = 0
+    for zone in zones:
+        occupied = occupied_counts.get(zone.id, 0)
+        total_occupied += occupied
+        zone_target = targets.get(zone.id, 0)
+        zone_actual = usage.get(zone.id, 0)
+        zone_data.append({
+            'id': zone.id,
+            'name': zone.name,
+            'zone_type': zone.zone_type,
+            'facility_name': zone.facility.name,
+            'total_slots': zone.total_slots,
+            'occupied': occupied,
+            'available': zone.total_slots - occupied,
+            'occupancy_rate': _percent(occupied, zone.total_slots),
+            'target_usage': zone_target,
+            'actual_usage': zone_actual,
+            'efficiency_percentage': _percent(zone_actual, zone_target) or 0.0,
+        })
+
+    return {
+        'date': str(target_date),
+        'total_slots': total_slots,
+        'total_occupied': total_occupied,
+        'total_available': total_slots - total_occupied,
+        'occupancy_rate': _percent(total_occupied, total_slots),
+        'total_parking_events': total_parking_events,  # PRD requirement
+        'active_devices': devices['count'],
+        'avg_health_score': round(devices['avg_health'] or 0, 1),
+        'alerts': alert_summary,
+        'efficiency': efficiency_summary,  # PRD requirement
+        'zones': zone_data,
+    }
+
+
+def dashboard_hourly(target_date, zone_id=None):
+    """
+    Hourly chart for `target_date`: occupied events per hour, the same hour
+    last week (both from the hourly rollup, one query) and the day's target
+    spread evenly over 24 hours.
+    """
+    last_week_date = target_date - timedelta(days=7)
+    buckets = HourlyOccupancy.objects.filter(date__in=[target_date, last_week_date])
+    targets = ParkingTarget.objects.filter(date=target_date)
+    if zone_id:
+        buckets = buckets.filter(zone_id=zone_id)
+        targets = targets.filter(zone_id=zone_id)
+
+    hourly_map = {}
+    last_week_map = {}
+    for item in buckets.values('date', 'hour').annotate(count=Sum('occupied_events')).order_by():
+        if item['date'] == target_date:
+            hourly_map[item['hour']] = item['count']
+        else:
+            last_week_map[item['hour']] = item['count']
+
+    # Target per hour (daily target spread evenly across 24 hours)
+    total_target = sum(t.target_occupancy_count for t in targets)
+    target_per_hour = round(total_target / 24, 1) if total_target > 0 else 0
+
+    return {
+        'date': str(target_date),
+        'zone_id': zone_id,
+        'hourly': [
+            {
+                'hour': h,
+                'label': f'{h:02d}:00',
+                'occupied_events': hourly_map.get(h, 0),
+                'target': target_per_hour,
+                'last_week': last_week_map.get(h, 0),
+            }
+            for h in range(24)
+        ],
+    }
@@ -0,0 +1,354 @@
+"""
+Device fleet simulator for sizing the ingest tier (`manage.py simulate_fleet`).
+
+Every active device (or the first `devices` of them) reports on its own
+schedule: a telemetry reading every `interval` seconds, ± `jitter`, from
+a random starting phase. On top of that it produces the faults that the
+ingest path has to handle:
+
+    clock skew      each device's clock is off by up to ± `skew` seconds
+                    (a fixed offset per device).
+                    Beyond +5 minutes its readings are rejected as future.
+    duplicates      with probability `duplicate_rate`, the previous
+                    reading is sent again, as after a lost acknowledgement
+    bad voltages    with probability `invalid_rate`, the voltage is outside
+                    100–300 V, which raises INVALID_DATA
+    occupancy       with probability `flip_rate`, the slot changes state
+                    and a parking log is sent
+
+Readings go to POST /api/telemetry/ one at a time, or to
+/api/telemetry/bulk/ in batches of `bulk_size`. Occupancy changes go to
+/api/parking-log/.
+
+One scheduler coroutine queues the requests as they come due, and
+`concurrency` worker coroutines send them through a transport:
+
+    ClientTransport  Django's in-process AsyncClient, against the
+                     configured database. Sync views are serialized on one
+                     thread, so this measures the code path, not the
+                     server.
+    HttpTransport    keep-alive HTTP/1.1 connections to a running server
+                     (runserver, or uvicorn config.asgi:application)
+
+When the workers fall behind, the queue fills up and the scheduler waits.
+The delay is reported as `max_lag_s`; the offered load is no longer being
+met.
+"""
+import asyncio
+import heapq
+import json
+import random
+import time
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from .services import MAX_VOLTAGE_THRESHOLD, MIN_VOLTAGE_THRESHOLD
+
+TELEMETRY_PATH = '/api/telemetry/'
+BULK_PATH = '/api/telemetry/bulk/'
+PARKING_LOG_PATH = '/api/parking-log/'
+BULK_FLUSH_SECONDS = 1.0  # a partly filled batch is sent after this long
+
+
+class SimulatedDevice:
+    __slots__ = ('code', 'clock_offset', 'occupied', 'last_reading')
+
+    def __init__(self, code, clock_offset, occupied):
+        self.code = code
+        self.clock_offset = clock_offset
+        self.occupied = occupied
+        self.last_reading = None
+
+
+# ── Transports ────────────────────────────────────────
+
+
+class ClientTransport:
+    """Requests through Django's in-process AsyncClient."""
+
+    def __init__(self):
+        from django.test import AsyncClient
+
+        self.client = AsyncClient()
+
+    async def post(self, path, body):
+        response = await self.client.post(path, body, content_type='application/json')
+        return response.status_code, _json(response.content)
+
+    async def close(self):
+        pass
+
+
+class HttpTransport:
+    """Minimal keep-alive HTTP/1.1 JSON client on asyncio streams."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        if parts.scheme != 'http':
+            raise ValueError('Only http:// URLs are supported.')
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self._idle = []
+
+    async def post(self, path, body):
+        payload = json.dumps(body).encode()
+        head = (
+            f'POST {self.prefix}{path} HTTP/1.1\r\n'
+            f'Host: {self.host}:{self.port}\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(payload)}\r\n\r\n'
+        ).encode()
+        reused = bool(self._idle)
+        try:
+            return await self._exchange(head + payload)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            if not reused:
+                raise
+            # The server closed an idle keep-alive connection; retry on a new one
+            return await self._exchange(head + payload, fresh=True)
+
+    async def _exchange(self, request, fresh=False):
+        if self._idle and not fresh:
+            reader, writer = self._idle.pop()
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write(request)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            writer.close()
+            raise ConnectionError('connection closed')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+
+        keep_alive = headers.get('connection') != 'close'
+        if 'content-length' in headers:
+            content = await reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding') == 'chunked':
+            content = b''
+            while size := int((await reader.readline()).strip() or b'0', 16):
+                content += await reader.readexactly(size)
+                await reader.readline()
+            await reader.readline()
+        else:
+            content = await reader.read()
+            keep_alive = False
+
+        if keep_alive:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        return status, _json(content)
+
+    async def close(self):
+        for _reader, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+def _json(content):
+    try:
+        return json.loads(content)
+    except ValueError:
+        return None
+
+
+# ── Statistics ────────────────────────────────────────
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # path → seconds
+        self.statuses = defaultdict(Counter)  # path → {status: count}
+        self.readings_sent = 0
+        self.readings_rejected = 0
+        self.max_lag = 0.0
+
+    def record(self, path, elapsed, status, payload, readings):
+        self.latencies[path].append(elapsed)
+        self.statuses[path][status] += 1
+        self.readings_sent += readings
+        if path == BULK_PATH and status == 201 and isinstance(payload, dict):
+            self.readings_rejected += payload.get('failed_count', 0)
+        elif path != PARKING_LOG_PATH and status != 201:
+            self.readings_rejected += readings
+
+    def summary(self, seconds, alerts_created):
+        requests = sum(sum(counter.values()) for counter in self.statuses.values())
+        bad_requests = sum(counter[400] for counter in self.statuses.values())
+        errors = sum(
+            count for counter in self.statuses.values()
+            for status, count in counter.items() if status >= 500 or status == 0
+        )
+        endpoints = {}
+        for path, latencies in sorted(self.latencies.items()):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+            endpoints[path] = {
+                'requests': len(latencies),
+                'p50_ms': round(float(p50), 2),
+                'p95_ms': round(float(p95), 2),
+                'p99_ms': round(float(p99), 2),
+                'statuses': {str(status): count for status, count in sorted(self.statuses[path].items())},
+            }
+        return {
+            'seconds': round(seconds, 1),
+            'requests': requests,
+            'requests_per_second': round(requests / seconds, 1),
+            'readings': self.readings_sent,
+            'readings_per_second': round(self.readings_sent / seconds, 1),
+            'readings_rejected': self.readings_rejected,
+            'bad_request_rate': round(bad_requests / requests, 4) if requests else 0.0,
+            'error_rate': round(errors / requests, 4) if requests else 0.0,
+            'alerts_created': alerts_created,
+            'alerts_per_second': round(alerts_created / seconds, 2),
+            'max_lag_s': round(self.max_lag, 2),
+            'endpoints': endpoints,
+        }
+
+
+# ── Simulation ────────────────────────────────────────
+
+
+def load_devices(limit=None, skew=0.0):
+    """
+    SimulatedDevices for the active devices, in id order, starting in their
+    current slot state. A device's clock offset is derived from its code, so
+    it is the same in every run and consecutive runs do not collide in the
+    duplicate window.
+    """
+    from .models import Device
+
+    rows = (
+        Device.objects.filter(is_active=True)
+        .order_by('id')
+        .values_list('device_code', 'occupancy__is_occupied')
+    )
+    if limit:
+        rows = rows[:limit]
+    return [
+        SimulatedDevice(code, skew * (2 * zlib.crc32(code.encode()) / 0xFFFFFFFF - 1), bool(occupied))
+        for code, occupied in rows
+    ]
+
+
+class Simulation:
+    def __init__(self, devices, transport, duration, interval=120.0, jitter=0.1,
+                 bulk_size=0, concurrency=16, duplicate_rate=0.01, invalid_rate=0.005,
+                 flip_rate=0.05, seed=None):
+        self.devices = devices
+        self.transport = transport
+        self.duration = duration
+        self.interval = interval
+        self.jitter = jitter
+        self.bulk_size = bulk_size
+        self.concurrency = concurrency
+        self.duplicate_rate = duplicate_rate
+        self.invalid_rate = invalid_rate
+        self.flip_rate = flip_rate
+        self.rng = random.Random(seed)
+        self.stats = Stats()
+
+    async def run(self):
+        """Run for `duration` seconds and return the Stats."""
+        queue = asyncio.Queue(maxsize=self.concurrency * 4)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        try:
+            await self._schedule(queue)
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self.transport.close()
+        return self.stats
+
+    async def _schedule(self, queue):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        end = start + self.duration
+        due = [(start + self.rng.uniform(0, self.interval), index) for index in range(len(self.devices))]
+        heapq.heapify(due)
+        batch, batch_started = [], start
+
+        while due and due[0][0] < end:
+            at, index = heapq.heappop(due)
+            now = loop.time()
+            if at > now:
+                if batch and batch_started + BULK_FLUSH_SECONDS < at:
+                    await asyncio.sleep(max(0.0, batch_started + BULK_FLUSH_SECONDS - now))
+                    await queue.put((BULK_PATH, batch, len(batch)))
+                    batch = []
+                await asyncio.sleep(max(0.0, at - loop.time()))
+            else:
+                self.stats.max_lag = max(self.stats.max_lag, now - at)
+
+            device = self.devices[index]
+            for path, body in self._messages(device):
+                if path == TELEMETRY_PATH and self.bulk_size > 1:
+                    if not batch:
+                        batch_started = loop.time()
+                    batch.append(body)
+                    if len(batch) >= self.bulk_size:
+                        await queue.put((BULK_PATH, batch, len(batch)))
+                        batch = []
+                else:
+                    await queue.put((path, body, 1 if path == TELEMETRY_PATH else 0))
+
+            step = self.interval * (1 + self.rng.uniform(-self.jitter, self.jitter))
+            heapq.heappush(due, (at + step, index))
+
+        if batch:
+            await queue.put((BULK_PATH, batch, len(batch)))
+
+    def _messages(self, device):
+        """The (path, body) messages a device sends this round."""
+        rng = self.rng
+        stamp = (
+            datetime.now(dt_timezone.utc) + timedelta(seconds=device.clock_offset)
+        ).isoformat()
+        if device.last_reading and rng.random() < self.duplicate_rate:
+            yield TELEMETRY_PATH, device.last_reading
+
+        if rng.random() < self.invalid_rate:
+            voltage = rng.choice((0.0, rng.uniform(20, MIN_VOLTAGE_THRESHOLD - 1),
+                                  rng.uniform(MAX_VOLTAGE_THRESHOLD + 1, 480)))
+        else:
+            voltage = rng.gauss(220, 4)
+        reading = {
+            'device_code': device.code,
+            'voltage': round(voltage, 1),
+            'current': round(max(0.0, rng.gauss(1.5, 0.3)), 2),
+            'power_factor': round(rng.uniform(0.85, 0.99), 2),
+            'timestamp': stamp,
+        }
+        device.last_reading = reading
+        yield TELEMETRY_PATH, reading
+
+        if rng.random() < self.flip_rate:
+            device.occupied = not device.occupied
+            yield PARKING_LOG_PATH, {
+                'device_code': device.code, 'is_occupied': device.occupied, 'timestamp': stamp,
+            }
+
+    async def _worker(self, queue):
+        while True:
+            path, body, readings = await queue.get()
+            start = time.perf_counter()
+            try:
+                status, payload = await self.transport.post(path, body)
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                status, payload = 0, None
+            self.stats.record(path, time.perf_counter() - start, status, payload, readings)
+            queue.task_done()
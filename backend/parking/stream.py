@@ -0,0 +1,183 @@
+"""
+Live change feed behind GET /api/stream/ (Server-Sent Events).
+
+Writers publish small events once their transaction commits:
+
+    occupancy           a slot's materialized occupancy changed (parking log)
+    alert               an alert was raised (per alert)
+    alerts_raised       a set-based scan raised many alerts at once (count only)
+    alert_acknowledged  an alert was acknowledged
+
+Each event carries the facility_id and zone_id it belongs to, so a stream
+subscribed with ?facility= / ?zone= only receives its own. Events without
+a zone (alerts_raised) go to every subscriber.
+
+The broker is chosen by settings.STREAM_BROKER. The default
+InProcessBroker fans events out to the subscribers of this process only.
+The ingest writes and the stream must therefore be served by the same
+ASGI process (config/asgi.py). A cross-process broker only needs
+publish(), subscribe() and unsubscribe().
+
+Event ids are "<boot>-<seq>". The broker keeps the last
+STREAM_HISTORY_SIZE events, so a client reconnecting with Last-Event-ID
+gets what it missed replayed. If the id is from another process lifetime
+or has already fallen out of the history, the client gets a `reset` event
+instead and should refetch over REST.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+RESET = 'reset'
+
+
+class Event:
+    __slots__ = ('id', 'seq', 'type', 'facility_id', 'zone_id', 'data')
+
+    def __init__(self, id, seq, type, facility_id, zone_id, data):
+        self.id = id
+        self.seq = seq
+        self.type = type
+        self.facility_id = facility_id
+        self.zone_id = zone_id
+        self.data = data
+
+    def matches(self, facility_ids, zone_ids):
+        if facility_ids and self.facility_id is not None and self.facility_id not in facility_ids:
+            return False
+        if zone_ids and self.zone_id is not None and self.zone_id not in zone_ids:
+            return False
+        return True
+
+    def encode(self):
+        payload = json.dumps(
+            {'facility_id': self.facility_id, 'zone_id': self.zone_id, **self.data},
+            cls=DjangoJSONEncoder,
+        )
+        return f'id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n'
+
+
+class Subscription:
+    """One stream's bounded queue on its event loop; fed from any thread."""
+
+    def __init__(self, loop, size):
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # loop already closed; unsubscribe is on its way
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog and tell the client to resync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class InProcessBroker:
+    """Fan-out to the subscribers of this process, with a replay buffer."""
+
+    def __init__(self, history_size=None, queue_size=None):
+        self.boot = format(time.time_ns() // 1_000_000, 'x')
+        self.history = deque(maxlen=history_size or settings.STREAM_HISTORY_SIZE)
+        self.queue_size = queue_size or settings.STREAM_QUEUE_SIZE
+        self.subscribers = set()
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def publish(self, type, data, facility_id=None, zone_id=None):
+        with self._lock:
+            self._seq += 1
+            event = Event(f'{self.boot}-{self._seq}', self._seq, type, facility_id, zone_id, data)
+            self.history.append(event)
+            for subscription in self.subscribers:
+                subscription.deliver(event)
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """
+        Register a subscription on the running event loop. Returns
+        (subscription, backlog), where backlog holds the events after
+        `last_event_id`, or None if they can no longer be replayed.
+        """
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self.subscribers.add(subscription)
+            backlog = [] if last_event_id is None else self._replay(last_event_id)
+        return subscription, backlog
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.subscribers.discard(subscription)
+
+    def _replay(self, last_event_id):
+        boot, _, seq = last_event_id.partition('-')
+        if boot != self.boot or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if self.history and seq < self.history[0].seq - 1:
+            return None
+        return [event for event in self.history if event.seq > seq]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.STREAM_BROKER)()
+    return _broker
+
+
+def publish(type, data, facility_id=None, zone_id=None):
+    """Publish an event once the current transaction commits."""
+    transaction.on_commit(lambda: get_broker().publish(type, data, facility_id, zone_id))
+
+
+async def event_stream(facility_ids=(), zone_ids=(), last_event_id=None, heartbeat=None):
+    """
+    SSE body: the replayed backlog (or a `reset`), then live events matching
+    the filters, with a comment line every `heartbeat` seconds to keep
+    proxies from closing an idle connection.
+    """
+    broker = get_broker()
+    heartbeat = heartbeat or settings.STREAM_HEARTBEAT_SECONDS
+    subscription, backlog = broker.subscribe(last_event_id)
+    try:
+        yield f'retry: {settings.STREAM_RETRY_MS}\n\n'
+        if backlog is None:
+            yield f'event: {RESET}\ndata: {{}}\n\n'
+            backlog = []
+        for event in backlog:
+            if event.matches(facility_ids, zone_ids):
+                yield event.encode()
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event is None:
+                yield f'event: {RESET}\ndata: {{}}\n\n'
+                return
+            if event.matches(facility_ids, zone_ids):
+                yield event.encode()
+    finally:
+        broker.unsubscribe(subscription)
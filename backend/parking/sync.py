@@ -0,0 +1,154 @@
+"""
+Incremental "changes since cursor" sync behind GET /api/sync/.
+
+Clients keep a local copy of the fleet (devices), the open alerts and the
+slot occupancy states, and instead of re-downloading them on every poll
+send back the cursor of their previous sync:
+
+    GET /api/sync/                     full snapshot + cursor
+    GET /api/sync/?cursor=<cursor>     rows changed since, tombstones, new cursor
+
+A cursor is the server time of the sync in epoch microseconds. Rows are
+selected by their indexed `updated_at` column (Device, Alert,
+SlotOccupancy) and deletions by Tombstone.deleted_at. Every write path
+stamps updated_at, including the set-based ones (QuerySet.update,
+bulk_update, raw INSERTs) that skip auto_now.
+
+updated_at is stamped before the writing transaction commits, so a row can
+become visible after a sync whose cursor is already past its stamp. Each
+sync therefore looks back SYNC_CURSOR_OVERLAP_SECONDS before the cursor,
+bounds included (a row stamped exactly at the cursor is not missed even
+without overlap); a row changed in that window may be sent twice, and
+clients apply rows by id, so repeats are harmless.
+
+What counts as a change is chosen so that a quiet fleet syncs to an empty
+delta:
+  - a device's last_seen_at advancing on every message does not count,
+    unless the device was silent for OFFLINE_TIMEOUT_MINUTES before (it
+    came back online). A device going offline shows up through its
+    DEVICE_OFFLINE alert and open_alert_count.
+  - the snapshot carries open alerts only; acknowledgements come through
+    as changed rows with is_acknowledged=true. Acknowledged alerts purged
+    by retention get no tombstones, since clients no longer hold them.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Value
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+from .models import Alert, Device, SlotOccupancy, Tombstone
+from .timeutils import epoch_us
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(moment):
+    return str(epoch_us(moment))
+
+
+def decode_cursor(value):
+    try:
+        micros = int(value)
+    except (TypeError, ValueError):
+        raise InvalidCursor(f"Invalid cursor: {value!r}.") from None
+    if micros < 0:
+        raise InvalidCursor(f"Invalid cursor: {value!r}.")
+    return datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(microseconds=micros)
+
+
+def device_reconnected(previous_seen, seen):
+    """
+    Whether advancing a device's last_seen_at from `previous_seen` to `seen`
+    is a sync change: only when the device had been silent long enough to
+    count as offline.
+    """
+    from .services import OFFLINE_TIMEOUT_MINUTES
+
+    if previous_seen is None:
+        return True
+    return seen - previous_seen > timedelta(minutes=OFFLINE_TIMEOUT_MINUTES)
+
+
+# ── Change sets ───────────────────────────────────────
+
+
+def changes_since(cursor=None, now=None):
+    """
+    Payload of GET /api/sync/: everything (cursor None, or older than the
+    tombstone horizon) or the rows changed since `cursor`, plus the cursor
+    to send next time.
+    """
+    from .serializers import AlertSerializer, DeviceSerializer
+
+    now = now or timezone.now()
+    since = None
+    if cursor is not None:
+        since = decode_cursor(cursor) - timedelta(seconds=settings.SYNC_CURSOR_OVERLAP_SECONDS)
+        retention = settings.SYNC_TOMBSTONE_RETENTION_DAYS
+        if retention and since < now - timedelta(days=retention):
+            since = None  # tombstones since then may already be purged
+
+    devices = Device.objects.select_related('slot', 'slot__zone', 'slot__zone__facility')
+    alerts = Alert.objects.select_related('device', 'zone')
+    occupancy = SlotOccupancy.objects.all()
+    if since is None:
+        # "= false" (not "NOT is_acknowledged") so SQLite searches
+        # alert_ack_created_idx too; newest first, like GET /api/alerts/
+        alerts = alerts.filter(is_acknowledged=Value(False)).order_by('-created_at', '-id')
+    else:
+        devices = devices.filter(updated_at__gte=since)
+        alerts = alerts.filter(updated_at__gte=since).order_by('updated_at', 'id')
+        occupancy = occupancy.filter(updated_at__gte=since)
+
+    deleted = {kind: [] for kind, _ in Tombstone.KINDS}
+    if since is not None:
+        for kind, object_id in (
+            Tombstone.objects.filter(deleted_at__gte=since)
+            .order_by('deleted_at')
+            .values_list('kind', 'object_id')
+        ):
+            deleted[kind].append(object_id)
+
+    return {
+        'cursor': encode_cursor(now),
+        'reset': since is None,
+        'devices': DeviceSerializer(devices.order_by('id'), many=True).data,
+        'alerts': AlertSerializer(alerts, many=True).data,
+        'occupancy': [
+            {'device_id': device_id, 'zone_id': zone_id, 'is_occupied': is_occupied,
+             'timestamp': timestamp}
+            for device_id, zone_id, is_occupied, timestamp in occupancy.order_by('device_id')
+            .values_list('device_id', 'zone_id', 'is_occupied', 'timestamp')
+        ],
+        'deleted': deleted,
+    }
+
+
+# ── Tombstones ────────────────────────────────────────
+
+
+def record_deleted(kind, object_ids):
+    """Write tombstones for `object_ids` of `kind` (in the caller's transaction)."""
+    now = timezone.now()
+    Tombstone.objects.bulk_create(
+        [Tombstone(kind=kind, object_id=object_id, deleted_at=now) for object_id in object_ids],
+        batch_size=1000,
+    )
+
+
+_KIND_BY_MODEL = {Device: Tombstone.KIND_DEVICE, Alert: Tombstone.KIND_ALERT}
+
+
+def _row_deleted(sender, instance, **kwargs):
+    record_deleted(_KIND_BY_MODEL[sender], [instance.pk])
+
+
+def connect_signals():
+    # SlotOccupancy rows only disappear with their device (covered by the
+    # device's tombstone) or in rebuild_slot_occupancy, which records its own
+    for model in _KIND_BY_MODEL:
+        post_delete.connect(_row_deleted, sender=model, dispatch_uid=f'sync_{model.__name__}')
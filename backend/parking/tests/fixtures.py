@@ -0,0 +1,23 @@
+"""Shared fixtures for the parking tests."""
+from django.core.cache import cache
+from django.utils import timezone
+
+from parking import topology
+from parking.models import Device
+from parking.seeding import create_fleet
+
+
+def reset_process_state():
+    """Drop the per-process state a previous test may have left behind."""
+    cache.clear()
+    topology.clear_local()
+
+
+def make_fleet(devices=1, zones=1, facilities=1, now=None):
+    """
+    Create a fleet with seeding.create_fleet (last_seen_at = `now`) and
+    return its devices by id, with slot and zone loaded.
+    """
+    create_fleet(facilities, zones, devices, now or timezone.now())
+    topology.clear_local()
+    return list(Device.objects.select_related('slot__zone').order_by('id'))
@@ -0,0 +1,163 @@
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from parking import services
+from parking.models import Alert, Device
+
+from .fixtures import make_fleet, reset_process_state
+
+
+class ConcurrentAlertDedupTests(TransactionTestCase):
+    """
+    Many workers raising the same (device, alert_type) at once leave exactly
+    one open alert: ON CONFLICT DO NOTHING on PostgreSQL, the savepoint
+    retry elsewhere, both backed by the alert_open_device_type_uniq index.
+    """
+
+    workers = 8
+
+    def setUp(self):
+        reset_process_state()
+        self.device = make_fleet()[0]
+
+    def race(self, create):
+        barrier = threading.Barrier(self.workers)
+        results, errors = [], []
+
+        def work():
+            try:
+                device = Device.objects.select_related('slot__zone').get(pk=self.device.pk)
+                barrier.wait()
+                while True:
+                    try:
+                        results.append(create(device))
+                        break
+                    except OperationalError as exc:
+                        # SQLite has one writer; a blocked one retries, as with a busy timeout
+                        if connection.vendor != 'sqlite' or 'locked' not in str(exc):
+                            raise
+            except Exception as exc:  # surfaced by the assertion below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def assert_one_open_alert(self):
+        self.assertEqual(
+            Alert.objects.filter(device=self.device, alert_type='HIGH_POWER', is_acknowledged=False).count(), 1,
+        )
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.open_alert_count, 1)
+
+    def test_single_alert_path(self):
+        results = self.race(lambda device: services._create_alert_if_new(
+            **services._high_power_alert(device, device.slot.zone, 2000)
+        ))
+        self.assertEqual(sorted(results), [False] * (self.workers - 1) + [True])
+        self.assert_one_open_alert()
+
+    def test_bulk_alert_path(self):
+        results = self.race(lambda device: len(services._create_alerts_if_new([
+            services._high_power_alert(device, device.slot.zone, 2000),
+        ])))
+        self.assertEqual(sorted(results), [0] * (self.workers - 1) + [1])
+        self.assert_one_open_alert()
+
+    @skipUnless(connection.vendor == 'postgresql', 'SQLite always takes the fallback path')
+    def test_savepoint_fallback_path(self):
+        # _insert_alerts picks its path by vendor; make PostgreSQL take the other one
+        with mock.patch.object(services, 'connection', mock.Mock(vendor='other')):
+            results = self.race(lambda device: services._create_alert_if_new(
+                **services._high_power_alert(device, device.slot.zone, 2000)
+            ))
+        self.assertEqual(sorted(results), [False] * (self.workers - 1) + [True])
+        self.assert_one_open_alert()
+
+    def test_acknowledged_alert_does_not_block_a_new_one(self):
+        device = Device.objects.select_related('slot__zone').get(pk=self.device.pk)
+        alert = services._high_power_alert(device, device.slot.zone, 2000)
+        self.assertTrue(services._create_alert_if_new(**alert))
+        services.acknowledge_alerts(Alert.objects.filter(device=device))
+        self.assertTrue(services._create_alert_if_new(**alert))
+        self.assertFalse(services._create_alert_if_new(**alert))
+        self.assert_one_open_alert()
+
+
+class OfflineDetectionTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        self.now = timezone.now()
+        long_ago = self.now - timedelta(hours=1)
+        self.online, self.silent, self.never, self.new, self.retired = make_fleet(devices=5, now=self.now)
+        Device.objects.filter(pk=self.silent.pk).update(last_seen_at=self.now - timedelta(minutes=10))
+        # Never reported: offline only once installed for longer than the timeout
+        Device.objects.filter(pk=self.never.pk).update(last_seen_at=None, installed_at=long_ago)
+        Device.objects.filter(pk=self.new.pk).update(last_seen_at=None, installed_at=self.now)
+        Device.objects.filter(pk=self.retired.pk).update(last_seen_at=long_ago, is_active=False)
+
+    def open_offline(self):
+        """{device_id: open_alert_count} of the devices with an open DEVICE_OFFLINE alert."""
+        device_ids = Alert.objects.filter(alert_type='DEVICE_OFFLINE', is_acknowledged=False).values('device_id')
+        return dict(Device.objects.filter(pk__in=device_ids).values_list('pk', 'open_alert_count'))
+
+    def test_new_offline_devices_are_alerted_once(self):
+        result = services.detect_offline_devices(now=self.now)
+
+        self.assertEqual(result, {'offline': 2, 'created': 2, 'resolved': 0})
+        self.assertEqual(self.open_offline(), {self.silent.pk: 1, self.never.pk: 1})
+        messages = dict(Alert.objects.values_list('device_id', 'message'))
+        self.assertIn('has not sent data for over', messages[self.silent.pk])
+        self.assertIn('since installation', messages[self.never.pk])
+
+    def test_reruns_are_idempotent(self):
+        services.detect_offline_devices(now=self.now)
+
+        # The same scan again (same `now`), and a later one
+        for now in (self.now, self.now + timedelta(minutes=1)):
+            with self.subTest(now=now):
+                result = services.detect_offline_devices(now=now)
+                self.assertEqual(result['created'], 0)
+                self.assertEqual(self.open_offline(), {self.silent.pk: 1, self.never.pk: 1})
+        self.assertEqual(Alert.objects.count(), 2)
+
+    def test_a_device_going_offline_later_is_added(self):
+        services.detect_offline_devices(now=self.now)
+
+        result = services.detect_offline_devices(now=self.now + timedelta(minutes=5))
+
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(
+            self.open_offline(),
+            {self.online.pk: 1, self.silent.pk: 1, self.never.pk: 1, self.new.pk: 1},
+        )
+
+    def test_auto_resolve_closes_alerts_of_recovered_devices(self):
+        services.detect_offline_devices(now=self.now)
+        Device.objects.filter(pk=self.silent.pk).update(last_seen_at=self.now)
+
+        result = services.detect_offline_devices(auto_resolve=True, now=self.now)
+
+        self.assertEqual(result, {'offline': 1, 'created': 0, 'resolved': 1})
+        self.assertEqual(self.open_offline(), {self.never.pk: 1})
+        self.silent.refresh_from_db()
+        self.assertEqual(self.silent.open_alert_count, 0)
+        self.assertTrue(Alert.objects.get(device=self.silent).is_acknowledged)
+
+    def test_without_auto_resolve_recovered_devices_keep_their_alert(self):
+        services.detect_offline_devices(now=self.now)
+        Device.objects.filter(pk=self.silent.pk).update(last_seen_at=self.now)
+
+        self.assertEqual(services.detect_offline_devices(now=self.now)['resolved'], 0)
+        self.assertEqual(self.open_offline(), {self.silent.pk: 1, self.never.pk: 1})
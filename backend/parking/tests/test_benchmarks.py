@@ -0,0 +1,112 @@
+from django.test import SimpleTestCase
+
+from parking import benchmarks
+
+
+def result(queries, p99_ms=10.0, status=200):
+    return {'p50_ms': p99_ms / 2, 'p99_ms': p99_ms, 'queries': queries, 'peak_kib': 64.0, 'status': status}
+
+
+def report(**tiers):
+    """A report of `tiers`: {tier: {route: result}}, sized as in benchmarks.TIERS."""
+    return {'tiers': {
+        tier: {'devices': benchmarks.TIERS[tier].devices, 'routes': routes} for tier, routes in tiers.items()
+    }}
+
+
+class CheckBudgetsTests(SimpleTestCase):
+    def test_within_budget(self):
+        routes = {'zone-list': result(3), 'device-list': result(1), 'unbudgeted': result(40)}
+
+        self.assertEqual(benchmarks.check_budgets(report(**{'50': routes, '5k': routes})), [])
+
+    def test_over_the_query_budget(self):
+        violations = benchmarks.check_budgets(report(**{'50': {'zone-list': result(4)}}))
+
+        self.assertEqual(violations, ['50 zone-list: 4 queries, budget 3'])
+
+    def test_queries_growing_with_the_tier(self):
+        # Within budget at every tier, but one statement more per tier is an N+1
+        violations = benchmarks.check_budgets(report(**{
+            '5k': {'sync': result(9), 'unbudgeted': result(30)},
+            '50': {'sync': result(8), 'unbudgeted': result(20)},
+        }))
+
+        self.assertEqual(violations, [
+            '5k sync: 9 queries vs 8 at 50 devices (grows with data)',
+            '5k unbudgeted: 30 queries vs 20 at 50 devices (grows with data)',
+        ])
+
+    def test_fewer_queries_on_a_larger_tier(self):
+        violations = benchmarks.check_budgets(report(**{
+            '50': {'detect-offline': result(8)}, '50k': {'detect-offline': result(4)},
+        }))
+
+        self.assertEqual(violations, [])
+
+    def test_error_status(self):
+        violations = benchmarks.check_budgets(report(**{'50': {'alert-acknowledge': result(2, status=404)}}))
+
+        self.assertEqual(violations, ['50 alert-acknowledge: HTTP 404'])
+
+    def test_p99_budget(self):
+        data = report(**{'50': {'zone-list': result(3, p99_ms=25.0), 'device-list': result(1, p99_ms=5.0)}})
+
+        self.assertEqual(benchmarks.check_budgets(data), [])
+        self.assertEqual(
+            benchmarks.check_budgets(data, p99_budget_ms=20),
+            ['50 zone-list: p99 25.0 ms, budget 20 ms'],
+        )
+
+    def test_empty_report(self):
+        self.assertEqual(benchmarks.check_budgets({'tiers': {}}), [])
+
+
+class CompareTests(SimpleTestCase):
+    baseline = report(**{'50': {
+        'zone-list': result(3, p99_ms=10.0),
+        'device-list': result(1, p99_ms=4.0),
+        'sync': result(8, p99_ms=0.0),
+    }})
+
+    def test_unchanged(self):
+        self.assertEqual(benchmarks.compare(self.baseline, self.baseline), [])
+
+    def test_query_count_change(self):
+        current = report(**{'50': {'zone-list': result(5), 'device-list': result(0, p99_ms=4.0)}})
+
+        self.assertEqual(benchmarks.compare(self.baseline, current), [
+            '50 zone-list: queries 3 → 5',
+            '50 device-list: queries 1 → 0',
+        ])
+
+    def test_p99_moves_beyond_the_threshold(self):
+        current = report(**{'50': {
+            'zone-list': result(3, p99_ms=12.5),  # +25%
+            'device-list': result(1, p99_ms=3.0),  # -25%
+        }})
+
+        self.assertEqual(benchmarks.compare(self.baseline, current), [
+            '50 zone-list: p99 10.0 → 12.5 ms',
+            '50 device-list: p99 4.0 → 3.0 ms',
+        ])
+        self.assertEqual(benchmarks.compare(self.baseline, current, threshold=0.3), [])
+
+    def test_within_the_threshold(self):
+        current = report(**{'50': {'zone-list': result(3, p99_ms=11.9), 'device-list': result(1, p99_ms=3.3)}})
+
+        self.assertEqual(benchmarks.compare(self.baseline, current), [])
+
+    def test_zero_baseline_latency_is_not_compared(self):
+        current = report(**{'50': {'sync': result(8, p99_ms=30.0)}})
+
+        self.assertEqual(benchmarks.compare(self.baseline, current), [])
+
+    def test_routes_and_tiers_missing_from_the_baseline(self):
+        current = report(**{
+            '50': {'alert-list': result(3)},
+            '5k': {'zone-list': result(9, p99_ms=99.0)},
+        })
+
+        self.assertEqual(benchmarks.compare(self.baseline, current), [])
+        self.assertEqual(benchmarks.compare({}, current), [])
@@ -0,0 +1,77 @@
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from parking import services
+from parking.models import ParkingTarget, ParkingZone
+
+from .fixtures import make_fleet, reset_process_state
+
+SUMMARY_QUERIES = 7
+
+
+class DashboardSummaryQueryCountMixin:
+    """
+    GET /api/dashboard/summary/ runs SUMMARY_QUERIES statements whatever the
+    zone count. Two facilities of `zones` zones each, with the same events
+    and alerts, so scoped totals must leave the other facility out.
+    """
+
+    zones = None
+
+    def setUp(self):
+        reset_process_state()
+        now = timezone.now()
+        devices = make_fleet(devices=self.zones * 4, zones=self.zones, facilities=2)
+        self.facility_id = devices[0].slot.zone.facility_id
+        for device in devices[::2]:
+            services.apply_occupancy_event(device, True, now)
+            services.record_hourly_event(device.slot.zone_id, now, True)
+        alerted = devices[::5]
+        services._create_alerts_if_new([
+            services._high_power_alert(device, device.slot.zone, 2000) for device in alerted
+        ])
+        self.alerts = len(alerted)
+        self.facility_alerts = sum(device.slot.zone.facility_id == self.facility_id for device in alerted)
+        ParkingTarget.objects.bulk_create([
+            ParkingTarget(zone=zone, date=timezone.localdate(), target_occupancy_count=4, target_usage_hours=8)
+            for zone in ParkingZone.objects.all()
+        ])
+
+    def get_summary(self, **params):
+        with self.assertNumQueries(SUMMARY_QUERIES):
+            response = self.client.get('/api/dashboard/summary/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assertTotals(self, summary, zones, alerts):
+        self.assertEqual(len(summary['zones']), zones)
+        self.assertEqual(summary['total_occupied'], zones)
+        self.assertEqual(summary['total_parking_events'], zones)
+        self.assertEqual(sum(zone['actual_usage'] for zone in summary['zones']), zones)
+        self.assertEqual(summary['efficiency']['target_usage'], 4 * zones)
+        self.assertEqual(summary['efficiency']['actual_usage'], zones)
+        self.assertEqual(
+            (summary['alerts']['total'], summary['alerts']['warning'], summary['alerts']['triggered_on_date']),
+            (alerts, alerts, alerts),
+        )
+
+    def test_query_count(self):
+        self.assertTotals(self.get_summary(), 2 * self.zones, self.alerts)
+
+    def test_query_count_for_one_facility(self):
+        self.assertLess(self.facility_alerts, self.alerts)
+
+        self.assertTotals(self.get_summary(facility=self.facility_id), self.zones, self.facility_alerts)
+
+
+no_response_cache = override_settings(RESPONSE_CACHE_TTL_SECONDS=0, REQUEST_TIMING_SAMPLE_RATE=0)
+
+
+@no_response_cache
+class TenZoneDashboardTests(DashboardSummaryQueryCountMixin, TestCase):
+    zones = 10
+
+
+@no_response_cache
+class FiveHundredZoneDashboardTests(DashboardSummaryQueryCountMixin, TestCase):
+    zones = 500
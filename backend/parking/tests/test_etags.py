@@ -0,0 +1,116 @@
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from parking import services
+from parking.models import Alert, ParkingZone
+from parking.views import _not_modified
+
+from .fixtures import make_fleet, reset_process_state
+
+
+class NotModifiedTests(SimpleTestCase):
+    def check(self, header, etag='W/"abc"'):
+        request = RequestFactory().get('/', headers={'If-None-Match': header} if header else {})
+        return _not_modified(request, etag)
+
+    def test_weak_comparison(self):
+        for header in ('W/"abc"', '"abc"', '"x", W/"abc"', '*'):
+            with self.subTest(header=header):
+                response = self.check(header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], 'W/"abc"')
+
+    def test_other_tags_or_no_header(self):
+        for header in (None, '', 'W/"abd"', '"x", "y"'):
+            with self.subTest(header=header):
+                self.assertIsNone(self.check(header))
+
+    def test_no_etag_when_the_cache_is_disabled(self):
+        self.assertIsNone(self.check('*', etag=None))
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        self.devices = make_fleet(devices=4)
+        self.alerts = [
+            services._create_alerts_if_new([services._high_power_alert(device, device.slot.zone, 2000)])[0]
+            for device in self.devices
+        ]
+
+    def get(self, path, etag=None):
+        """(status, ETag) of a GET, conditional on `etag` if given."""
+        headers = {'If-None-Match': etag} if etag else {}
+        response = self.client.get(path, headers=headers)
+        self.assertIn(response.status_code, (200, 304), response.content)
+        if response.status_code == 304:
+            self.assertEqual(response.content, b'')
+        return response.status_code, response['ETag']
+
+    def assert_changed(self, path, change):
+        """`path` answers 304 while unchanged, then 200 with a new ETag after `change`."""
+        _, etag = self.get(path)
+        self.assertEqual(self.get(path, etag), (304, etag))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+
+        status, new_etag = self.get(path, etag)
+        self.assertEqual(status, 200)
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(self.get(path, new_etag), (304, new_etag))
+
+    def test_alerts_after_a_new_alert(self):
+        device = self.devices[0]
+        self.assert_changed('/api/alerts/', lambda: services._create_alerts_if_new(
+            [services._low_health_alert(device, device.slot.zone)]
+        ))
+
+    def test_alerts_after_an_acknowledgement(self):
+        def acknowledge():
+            response = self.client.patch(f'/api/alerts/{self.alerts[1].pk}/acknowledge/')
+            self.assertEqual(response.status_code, 200)
+
+        self.assert_changed('/api/alerts/', acknowledge)
+
+    def test_alerts_after_a_delete(self):
+        # Neither end of the id range, and already acknowledged
+        services.acknowledge_alerts(Alert.objects.all())
+        self.assert_changed('/api/alerts/', lambda: Alert.objects.filter(pk=self.alerts[1].pk).delete())
+
+    def test_alerts_after_a_topology_change(self):
+        zone = self.devices[0].slot.zone
+
+        def rename():
+            zone.name = 'Renamed'
+            zone.save()
+
+        self.assert_changed('/api/alerts/', rename)
+
+    def test_devices_after_a_topology_change(self):
+        self.assert_changed('/api/devices/', lambda: ParkingZone.objects.get(pk=self.devices[0].slot.zone_id).save())
+
+    def test_devices_after_ingest(self):
+        device = self.devices[0]
+
+        def ingest():
+            response = self.client.post('/api/telemetry/', {
+                'device_code': device.device_code, 'voltage': 230, 'current': 1, 'power_factor': 0.9,
+                'timestamp': timezone.now().isoformat(),
+            }, content_type='application/json')
+            self.assertEqual(response.status_code, 201, response.content)
+
+        self.assert_changed('/api/devices/', ingest)
+
+    def test_summary_after_a_parking_event(self):
+        device = self.devices[0]
+
+        def park():
+            response = self.client.post('/api/parking-log/', {
+                'device_code': device.device_code, 'is_occupied': True,
+                'timestamp': timezone.now().isoformat(),
+            }, content_type='application/json')
+            self.assertEqual(response.status_code, 201, response.content)
+
+        self.assert_changed('/api/dashboard/summary/', park)
@@ -0,0 +1,303 @@
+import itertools
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.db.models import Avg
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from parking import services
+from parking.models import Alert, Device, DeviceHealthState, TelemetryData, TelemetryRollup
+from parking.rollups import bucket_start, record_telemetry_rollups
+
+from .fixtures import make_fleet, reset_process_state
+
+
+def add_telemetry(device, readings):
+    """Store (timestamp, voltage, current) readings and fold them into the rollups, as ingest does."""
+    rows = []
+    for timestamp, voltage, current in readings:
+        telemetry = TelemetryData(
+            device=device, voltage=voltage, current=current, power_factor=0.9, timestamp=timestamp,
+        )
+        telemetry.save()
+        rows.append(telemetry)
+    record_telemetry_rollups(rows)
+    return rows
+
+
+def raw_hour_score(device, now):
+    """The baseline score: a raw AVG over telemetry with timestamp >= now - 1h."""
+    stats = TelemetryData.objects.filter(device=device, timestamp__gte=now - timedelta(hours=1)).aggregate(
+        avg_voltage=Avg('voltage'), avg_power=Avg('power_consumption'),
+    )
+    open_alerts = device.alerts.filter(is_acknowledged=False).count()
+    return services._health_score(
+        now, device.last_seen_at, stats['avg_voltage'], stats['avg_power'], open_alerts,
+    )
+
+
+class HealthWindowTests(TestCase):
+    """query_health_scores reads rollups and raw rows but averages exactly the last hour."""
+
+    def setUp(self):
+        reset_process_state()
+        # Half past a minute, so the hour-ago cut falls inside a rollup bucket
+        self.now = bucket_start(timezone.now(), TelemetryRollup.TIER_1MIN) + timedelta(seconds=30)
+        self.device = make_fleet(now=self.now)[0]
+        hour_ago = self.now - timedelta(hours=1)
+        add_telemetry(self.device, [
+            (hour_ago - timedelta(seconds=80), 90.0, 1.0),   # the minute before the cut's
+            (hour_ago - timedelta(seconds=20), 60.0, 2.0),   # the cut's minute, before it: outside
+            (hour_ago + timedelta(seconds=10), 205.0, 20.0),  # the cut's minute, after it: inside
+            (self.now - timedelta(minutes=40), 230.0, 4.0),
+            (self.now - timedelta(minutes=39, seconds=55), 226.0, 5.0),
+            (self.now - timedelta(minutes=3), 240.0, 8.0),
+        ])
+
+    def test_averages_match_a_raw_avg_over_the_hour(self):
+        voltage, power = services._hourly_averages(self.now, device=self.device)[self.device.id]
+        raw = TelemetryData.objects.filter(
+            device=self.device, timestamp__gte=self.now - timedelta(hours=1),
+        ).aggregate(avg_voltage=Avg('voltage'), avg_power=Avg('power_consumption'))
+        self.assertAlmostEqual(voltage, raw['avg_voltage'])
+        self.assertAlmostEqual(power, raw['avg_power'])
+        self.assertAlmostEqual(voltage, (205 + 230 + 226 + 240) / 4)
+
+    def test_score_matches_the_raw_avg_formula(self):
+        scores = services.query_health_scores([self.device], now=self.now)
+        self.assertEqual(scores[self.device.id], raw_hour_score(self.device, self.now))
+        # 225 V, 1816 W: the partial first minute's 3690 W reading lifts the
+        # power over the threshold, and the 60 V one before the cut stays out
+        self.assertEqual(scores[self.device.id], 90)
+
+    def test_streaming_window_matches_the_raw_avg_formula(self):
+        state = DeviceHealthState(device=self.device)
+        state.add_samples(
+            TelemetryData.objects.filter(device=self.device), services._health_window_start(self.now),
+        )
+        self.assertEqual(len(state.buckets), 4)  # the readings before the cut are dropped
+        self.device.health_state = state
+        self.assertEqual(
+            services.streaming_health_score(self.device, self.now), raw_hour_score(self.device, self.now),
+        )
+        # Thirty seconds later the cut passes the 205 V reading, and only it
+        later = self.now + timedelta(seconds=30)
+        self.assertEqual(services.streaming_health_score(self.device, later), raw_hour_score(self.device, later))
+        self.assertEqual(state.averages(services._health_window_start(later))[0], (230 + 226 + 240) / 3)
+
+    def test_cut_on_a_minute_boundary(self):
+        now = self.now + timedelta(seconds=30)
+        scores = services.query_health_scores([self.device], now=now)
+        self.assertEqual(scores[self.device.id], raw_hour_score(self.device, now))
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+class StreamingHealthTests(TestCase):
+    """The streaming window must score devices as the query-based reference does."""
+
+    def setUp(self):
+        reset_process_state()
+        self.devices = make_fleet(devices=3, now=timezone.now() - timedelta(minutes=30))
+        now = timezone.now()
+        quiet, busy, faulty = self.devices
+        readings = {
+            quiet: [(230.0, 1.0)],
+            busy: [(228.0, 6.0), (241.0, 9.0), (236.5, 7.5), (219.0, 8.0)],  # > 1500 W once
+            faulty: [(232.0, 2.0), (95.0, 1.0), (311.0, 1.5)],               # invalid voltage twice
+        }
+        for device, values in readings.items():
+            for i, (voltage, current) in enumerate(values):
+                response = self.client.post('/api/telemetry/', {
+                    'device_code': device.device_code, 'voltage': voltage, 'current': current,
+                    'power_factor': 0.9, 'timestamp': (now - timedelta(minutes=50 - 7 * i)).isoformat(),
+                }, content_type='application/json')
+                self.assertEqual(response.status_code, 201, response.content)
+        response = self.client.post('/api/telemetry/bulk/', [
+            {
+                'device_code': quiet.device_code, 'voltage': 224.0 + i, 'current': 0.5,
+                'power_factor': 0.95, 'timestamp': (now - timedelta(minutes=20 - 3 * i)).isoformat(),
+            }
+            for i in range(4)
+        ], content_type='application/json')
+        self.assertEqual(response.json()['created_count'], 4, response.content)
+
+    def test_streaming_matches_the_raw_avg_formula(self):
+        now = timezone.now()
+        devices = list(Device.objects.select_related('health_state').order_by('id'))
+        expected = {device.id: raw_hour_score(device, now) for device in devices}
+        self.assertEqual(
+            {device.id: services.streaming_health_score(device, now) for device in devices}, expected,
+        )
+        self.assertEqual(services.query_health_scores(devices, now=now), expected)
+        self.assertGreater(devices[1].open_alert_count, 0)
+
+    def test_stored_scores_match_the_raw_avg_formula(self):
+        # Scored at ingest time; a few seconds later the formula gives the same
+        for device in Device.objects.all():
+            self.assertEqual(device.health_score, raw_hour_score(device, timezone.now()))
+
+    def test_window_averages_match_a_raw_avg_over_the_hour(self):
+        now = timezone.now()
+        window_start = services._health_window_start(now)
+        for device in Device.objects.select_related('health_state'):
+            raw = TelemetryData.objects.filter(device=device, timestamp__gte=now - timedelta(hours=1)).aggregate(
+                avg_voltage=Avg('voltage'), avg_power=Avg('power_consumption'),
+            )
+            voltage, power = device.health_state.averages(window_start)
+            self.assertAlmostEqual(voltage, raw['avg_voltage'], places=6)
+            self.assertAlmostEqual(power, raw['avg_power'], places=6)
+
+
+@skipUnless(connection.features.has_select_for_update, 'needs row locks')
+class ConcurrentHealthWindowTests(TransactionTestCase):
+    """Concurrent ingest for one device keeps every sample in its health window."""
+
+    writers = 8
+
+    def setUp(self):
+        reset_process_state()
+        self.device = make_fleet()[0]
+
+    def test_concurrent_writers_merge_their_samples(self):
+        now = timezone.now()
+        barrier = threading.Barrier(self.writers)
+        errors = []
+
+        def write(n):
+            try:
+                device = Device.objects.select_related('slot__zone').get(pk=self.device.pk)
+                services.load_ingest_state([device])  # every writer reads the same window
+                sample = TelemetryData(
+                    device=device, voltage=230.0, current=1.0, power_factor=0.9,
+                    power_consumption=207.0, timestamp=now - timedelta(minutes=n),
+                )
+                barrier.wait()
+                services.record_device_health([sample])
+            except Exception as exc:  # surfaced by the assertion below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(self.writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        state = DeviceHealthState.objects.get(device=self.device)
+        self.assertEqual(sum(bucket[1] for bucket in state.buckets), self.writers)
+
+
+class FleetRecomputeTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        # Silent for two hours: the stored score of 100 is stale
+        self.devices = make_fleet(devices=2, now=timezone.now() - timedelta(hours=2))
+
+    def test_alert_raised_during_the_pass_keeps_its_count(self):
+        device = self.devices[0]
+        score_fleet = services._health_scores_array
+
+        def alert_mid_pass(*args):
+            # An ingest worker raises an alert after the open-alert counts were read
+            services._create_alert_if_new(**services._high_power_alert(device, device.slot.zone, 2000))
+            return score_fleet(*args)
+
+        with mock.patch.object(services, '_health_scores_array', alert_mid_pass):
+            result = services.recompute_fleet_health(raise_alerts=False)
+
+        self.assertEqual(result['changed'], 2)
+        device.refresh_from_db()
+        self.assertEqual(device.open_alert_count, 1)
+        # Scored from the counts read before the alert; the next pass catches up
+        self.assertEqual(device.health_score, 60)
+
+
+class HealthScoresArrayTests(SimpleTestCase):
+    def test_matches_the_scalar_score(self):
+        import numpy as np
+
+        now = timezone.now()
+        # Around each threshold of the four factors; None is never seen / no telemetry
+        last_seen = [None] + [now - timedelta(seconds=s) for s in (0, 60, 120, 121, 1800, 3420, 3599, 3600, 3660, 7200)]
+        voltages = [None, 0.0, 99.99, 100.0, 149.99, 150.0, 199.99, 200.0, 250.0, 250.01, 300.0, 300.01]
+        powers = [None, 0.0, 1500.0, 1500.01, 2250.0, 2250.01, 5000.0]
+        open_alerts = [0, 1, 2, 3, 10]
+        cases = list(itertools.product(last_seen, voltages, powers, open_alerts))
+
+        def column(values, convert, dtype=np.float64):
+            return np.array([np.nan if v is None else convert(v) for v in values], dtype=dtype)
+
+        scores = services._health_scores_array(
+            services.epoch_us(now),
+            column([case[0] for case in cases], services.epoch_us),
+            column([case[1] for case in cases], float),
+            column([case[2] for case in cases], float),
+            column([case[3] for case in cases], int, np.int64),
+        )
+
+        expected = [services._health_score(now, *case) for case in cases]
+        mismatches = [(case, score, want) for case, score, want in zip(cases, scores.tolist(), expected) if score != want]
+        self.assertEqual(mismatches, [])
+
+
+class FleetRecomputeMixedFleetTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        self.now = timezone.now()
+        devices = make_fleet(devices=10, now=self.now)
+        # (last seen minutes ago, reading minutes ago, voltage, watts, open alerts)
+        fleet = [
+            (None, None, None, None, 0),       # never seen, no telemetry
+            (120, None, None, None, 0),        # offline, no telemetry in the hour
+            (2, 2, 200.0, 1500.0, 0),          # offline timeout, ideal and power limits
+            (57, 57, 250.0, 2250.0, 1),        # recency reaches 0, upper bounds
+            (61, 61, 230.0, 200.0, 0),         # the reading is just outside the hour
+            (30, 30, 150.0, 2250.01, 2),
+            (10, 10, 99.9, 1500.01, 0),        # below the valid voltage range
+            (0, 1, 300.01, 300.0, 0),
+            (58, 58, 300.5, 4000.0, 3),        # low, with LOW_HEALTH already open
+            (58, 58, 95.0, 4000.0, 2),         # low
+        ]
+        kinds = [
+            lambda device: services._high_power_alert(device, device.slot.zone, 4000.0),
+            lambda device: services._invalid_data_alert(device, device.slot.zone, 95.0),
+            lambda device: services._low_health_alert(device, device.slot.zone),
+        ]
+        for device, (seen, read, voltage, watts, alerts) in zip(devices, fleet):
+            Device.objects.filter(pk=device.pk).update(
+                last_seen_at=self.now - timedelta(minutes=seen) if seen is not None else None,
+            )
+            if read is not None:
+                # power_consumption = voltage × current × 0.9, rounded to 2 places
+                add_telemetry(device, [(self.now - timedelta(minutes=read), voltage, watts / voltage / 0.9)])
+            services._create_alerts_if_new([kind(device) for kind in kinds[:alerts]])
+        self.devices = list(Device.objects.select_related('slot__zone').order_by('id'))
+
+    def test_scores_match_the_scalar_score(self):
+        expected = {device.pk: raw_hour_score(device, self.now) for device in self.devices}
+
+        services.recompute_fleet_health(now=self.now, raise_alerts=False)
+
+        self.assertEqual(dict(Device.objects.values_list('pk', 'health_score')), expected)
+        self.assertEqual(sorted(score for score in expected.values() if score < services.LOW_HEALTH_THRESHOLD), [10, 18])
+
+    def test_low_health_is_raised_once(self):
+        low = [device.pk for device in self.devices[-2:]]
+        open_before = dict(Device.objects.values_list('pk', 'open_alert_count'))
+
+        first = services.recompute_fleet_health(now=self.now)
+        second = services.recompute_fleet_health(now=self.now)
+
+        self.assertEqual((first['alerts_created'], second['alerts_created']), (1, 0))
+        low_health = Alert.objects.filter(alert_type='LOW_HEALTH', is_acknowledged=False)
+        self.assertEqual(sorted(low_health.values_list('device_id', flat=True)), low)
+        open_after = dict(Device.objects.values_list('pk', 'open_alert_count'))
+        self.assertEqual(
+            {pk: open_after[pk] - open_before[pk] for pk in open_before if open_after[pk] != open_before[pk]},
+            {low[1]: 1},
+        )
@@ -0,0 +1,135 @@
+import json
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from parking.models import Alert, Device, TelemetryData
+
+from .fixtures import make_fleet, reset_process_state
+
+
+def reading(device, minutes_ago, voltage=230.0, current=1.0, now=None):
+    return {
+        'device_code': device.device_code, 'voltage': voltage, 'current': current,
+        'power_factor': 0.9, 'timestamp': ((now or timezone.now()) - timedelta(minutes=minutes_ago)).isoformat(),
+    }
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+class BulkIngestQueryCountTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        self.devices = make_fleet(devices=20, zones=2)
+        # Warm up: the first batch also loads the topology snapshot, creates
+        # the health-state rows and raises the alerts that later batches dedupe
+        self.post_batch(20, 58)
+
+    def post_batch(self, size, offset):
+        """`size` readings spread over the fleet, two minutes apart per device, with alerts in each batch."""
+        records = []
+        for i in range(size):
+            device = self.devices[i % len(self.devices)]
+            records.append(reading(device, offset - 2 * (i // len(self.devices))))
+        records[0]['current'] = 9.0    # HIGH_POWER
+        records[1]['voltage'] = 95.0   # INVALID_DATA
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/telemetry/bulk/', records, content_type='application/json')
+        self.assertEqual(response.json()['created_count'], size, response.content)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        # Each batch in its own slice of the past, so none is a duplicate, and
+        # older than the health window, so no batch moves a score (the score
+        # UPDATE only runs for changed scores). At most 140 rows: SQLite caps
+        # a statement at 999 parameters, so a larger bulk_create is split
+        # into several INSERTs there
+        counts = {size: self.post_batch(size, offset) for size, offset in ((20, 400), (60, 300), (140, 200))}
+        self.assertEqual(len(set(counts.values())), 1, counts)
+        self.assertEqual(TelemetryData.objects.count(), 240)
+
+    def test_query_count_is_pinned(self):
+        # Budgeted in benchmarks.QUERY_BUDGETS['telemetry-bulk']
+        from parking.benchmarks import QUERY_BUDGETS
+
+        self.assertLessEqual(self.post_batch(100, 50), QUERY_BUDGETS['telemetry-bulk'])
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+class BulkIngestErrorTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        self.device, self.other = make_fleet(devices=2)
+        now = timezone.now()
+        self.client.post('/api/telemetry/', reading(self.device, 30, now=now), content_type='application/json')
+        self.records = [
+            reading(self.device, 20, now=now),
+            reading(self.device, 30, now=now) | {'voltage': 231.0},       # duplicate of a stored reading
+            {'device_code': 'NOPE-1', 'voltage': 230, 'current': 1, 'power_factor': 0.9,
+             'timestamp': now.isoformat()},                                 # unknown device
+            reading(self.other, -10, now=now),                              # future timestamp
+            {'device_code': self.other.device_code, 'voltage': 'high'},     # bad and missing fields
+            reading(self.other, 10, now=now),
+            reading(self.other, 10, now=now) | {'current': 2.0},            # duplicate within the batch
+            reading(self.device, 19.5, now=now),                            # within a minute of index 0
+            'not an object',
+        ]
+
+    def one_by_one(self):
+        """What the per-record endpoint answers for each record, in order, then rolled back."""
+        results = []
+        with transaction.atomic():
+            for index, record in enumerate(self.records):
+                # json.dumps: the test client posts a bare string as-is, not as JSON
+                response = self.client.post('/api/telemetry/', json.dumps(record), content_type='application/json')
+                if response.status_code != 201:
+                    results.append({'index': index, 'data': record, 'errors': response.json()['errors']})
+            transaction.set_rollback(True)
+        return results
+
+    def test_errors_match_the_per_record_responses(self):
+        expected = self.one_by_one()
+        response = self.client.post('/api/telemetry/bulk/', self.records, content_type='application/json')
+
+        body = response.json()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(body['errors'], expected)
+        self.assertEqual([error['index'] for error in body['errors']], [1, 2, 3, 4, 6, 7, 8])
+        self.assertEqual(body['created_count'], 2)
+        self.assertEqual(body['failed_count'], 7)
+
+    def test_rejects_a_non_list_or_empty_payload(self):
+        for payload in ({'device_code': self.device.device_code}, []):
+            response = self.client.post('/api/telemetry/bulk/', payload, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(list(response.json()['errors']), ['non_field_errors'])
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+class BulkIngestLowHealthTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        # Silent for two hours, but the stored score is still a healthy 100
+        self.device = make_fleet(now=timezone.now() - timedelta(hours=2))[0]
+
+    def test_low_health_sees_the_batch_score(self):
+        # 50 minutes old, 95 V and 2565 W: the batch itself drags the score down
+        response = self.client.post('/api/telemetry/bulk/', [
+            reading(self.device, 52, voltage=95.0, current=30.0),
+            reading(self.device, 50, voltage=95.0, current=30.0),
+        ], content_type='application/json')
+        self.assertEqual(response.json()['created_count'], 2, response.content)
+
+        device = Device.objects.get(pk=self.device.pk)
+        self.assertLess(device.health_score, 30)
+        self.assertEqual(
+            sorted(Alert.objects.filter(device=device).values_list('alert_type', flat=True)),
+            ['HIGH_POWER', 'INVALID_DATA', 'LOW_HEALTH'],
+        )
+        self.assertEqual(device.open_alert_count, 3)
+
+    def test_healthy_batch_raises_no_low_health(self):
+        self.client.post('/api/telemetry/bulk/', [reading(self.device, 1)], content_type='application/json')
+        self.assertFalse(Alert.objects.filter(alert_type='LOW_HEALTH').exists())
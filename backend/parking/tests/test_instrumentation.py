@@ -0,0 +1,87 @@
+import json
+import re
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from parking.instrumentation import RequestTiming, sampled
+
+from .fixtures import make_fleet, reset_process_state
+
+# name;dur=<ms with one decimal>, db first with its query count, total last
+SERVER_TIMING = re.compile(
+    r'db;dur=\d+\.\d;desc="\d+ (query|queries)"'
+    r'(, [a-z]+;dur=\d+\.\d)*'
+    r', total;dur=\d+\.\d'
+)
+
+
+class RequestTimingMiddlewareTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        make_fleet(devices=2, facilities=2)
+
+    def get(self, path):
+        """A sampled GET: the response, its captured queries and its 'parking.timing' log records."""
+        with sampled(), self.assertLogs('parking.timing', 'INFO') as logs, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response, queries, logs.records
+
+    def test_counts_every_query_of_the_request(self):
+        response, queries, _logs = self.get('/api/facilities/')
+
+        self.assertEqual(response.timing.queries, len(queries))
+        self.assertGreater(response.timing.queries, 0)
+        self.assertGreater(response.timing.total, response.timing.db)
+
+    def test_server_timing_header(self):
+        response, queries, _logs = self.get('/api/facilities/')
+
+        header = response['Server-Timing']
+        self.assertTrue(SERVER_TIMING.fullmatch(header), header)
+        self.assertIn(f'desc="{len(queries)} queries"', header)
+        names = [part.split(';')[0] for part in header.split(', ')]
+        self.assertEqual(names, ['db', 'serialize', 'render', 'total'])
+
+    def test_logs_one_json_line(self):
+        with override_settings(REQUEST_TIMING_SLOW_QUERIES=2):
+            response, _queries, logs = self.get('/api/facilities/')
+
+        line, = logs
+        entry = json.loads(line.getMessage())
+        self.assertEqual(
+            (entry['method'], entry['path'], entry['route'], entry['status']),
+            ('GET', '/api/facilities/', 'facility-list', 200),
+        )
+        self.assertEqual(entry['queries'], response.timing.queries)
+        self.assertEqual(len(entry['slow_queries']), min(2, response.timing.queries))
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_untouched(self):
+        with self.assertNoLogs('parking.timing', 'INFO'):
+            response = self.client.get('/api/facilities/')
+
+        self.assertFalse(hasattr(response, 'timing'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class RequestTimingTests(SimpleTestCase):
+    def test_server_timing_format(self):
+        timing = RequestTiming()
+        timing.add_query('SELECT 1', 0.00125)
+        timing.add_span('render', 0.0004)
+        timing.add_span('render', 0.0004)
+        timing.total = 0.01
+
+        self.assertEqual(timing.server_timing(), 'db;dur=1.2;desc="1 query", render;dur=0.8, total;dur=10.0')
+
+    def test_keeps_the_slowest_queries(self):
+        timing = RequestTiming(slow_queries=2)
+        for n, elapsed in enumerate([0.003, 0.001, 0.005, 0.002]):
+            timing.add_query(f'SELECT {n}', elapsed)
+
+        self.assertEqual(timing.queries, 4)
+        self.assertEqual(timing.slowest(), [(0.005, 'SELECT 2'), (0.003, 'SELECT 0')])
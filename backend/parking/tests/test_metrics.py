@@ -0,0 +1,211 @@
+import json
+import os
+import re
+import tempfile
+import threading
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from parking import metrics
+
+from .fixtures import make_fleet, reset_process_state
+
+# Prometheus text format 0.0.4
+NAME = r'[a-zA-Z_:][a-zA-Z0-9_:]*'
+LABEL = r'[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\[\\"n])*"'
+SAMPLE = re.compile(
+    rf'(?P<name>{NAME})(?P<labels>\{{{LABEL}(?:,{LABEL})*\}})? '
+    r'(?P<value>[+-]?(?:\d+(?:\.\d*)?(?:e[+-]?\d+)?|Inf|NaN))'
+)
+COMMENT = re.compile(rf'# (?P<kind>HELP|TYPE) (?P<name>{NAME}) (?P<text>.*)')
+
+
+def parse(text):
+    """
+    Check `text` against the exposition format; {family: (type, [(name,
+    labels, value)])}. Fails on a line that does not parse, a sample before
+    its family's TYPE, or a family that is split or declared twice.
+    """
+    assert text.endswith('\n'), 'no trailing newline'
+    families, current = {}, None
+    for line in text[:-1].split('\n'):
+        comment = COMMENT.fullmatch(line)
+        if comment:
+            name = comment['name']
+            if comment['kind'] == 'HELP':
+                assert name not in families, f'{name} declared twice'
+                families[name] = [None, []]
+                current = name
+            else:
+                assert current == name and families[name][0] is None, f'stray TYPE for {name}'
+                assert comment['text'] in ('counter', 'gauge', 'histogram'), line
+                families[name][0] = comment['text']
+            continue
+        sample = SAMPLE.fullmatch(line)
+        assert sample, f'not a sample: {line!r}'
+        assert current and families[current][0], f'sample before TYPE: {line!r}'
+        suffixes = ('_bucket', '_sum', '_count') if families[current][0] == 'histogram' else ('',)
+        assert sample['name'] in {current + suffix for suffix in suffixes}, f'{line!r} outside {current}'
+        labels = dict(re.findall(r'([a-zA-Z_]\w*)="((?:[^"\\]|\\.)*)"', sample['labels'] or ''))
+        families[current][1].append((sample['name'], labels, float(sample['value'])))
+    return {name: tuple(family) for name, family in families.items()}
+
+
+class MetricTestMixin:
+    def metric(self, cls, *args, **kwargs):
+        """A metric registered for this test only."""
+        metric = cls(*args, **kwargs)
+        self.addCleanup(metrics.REGISTRY.remove, metric)
+        return metric
+
+
+class ShardTests(MetricTestMixin, SimpleTestCase):
+    def run_threads(self, count, target):
+        # All alive at once, so none can reuse another's thread-local shard
+        barrier = threading.Barrier(count)
+
+        def run(n):
+            barrier.wait()
+            target(n)
+
+        threads = [threading.Thread(target=run, args=(n,)) for n in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_counter_shards_sum_over_threads(self):
+        counter = self.metric(metrics.Counter, 'test_total', 'Test.', ['kind'])
+
+        def work(n):
+            for _ in range(1000):
+                counter.inc('even' if n % 2 == 0 else 'odd')
+            counter.inc('thread', amount=n)
+
+        self.run_threads(8, work)
+        counter.inc('even')
+
+        self.assertEqual(len(counter._shards), 9)
+        self.assertEqual(counter.collect(), {('even',): 4001, ('odd',): 4000, ('thread',): 28})
+
+    def test_histogram_shards_sum_over_threads(self):
+        histogram = self.metric(metrics.Histogram, 'test_seconds', 'Test.', buckets=(1, 2))
+
+        self.run_threads(4, lambda n: [histogram.observe(value) for value in (0.5, 1, 1.5, 3)])
+
+        # Per bucket (≤1, ≤2, +Inf), then sum and count
+        self.assertEqual(histogram.collect(), {(): [8, 4, 4, 24.0, 16]})
+
+    def test_reset_keeps_the_shards(self):
+        counter = self.metric(metrics.Counter, 'test_total', 'Test.')
+        self.run_threads(2, lambda n: counter.inc())
+
+        counter.reset()
+        counter.inc()
+
+        self.assertEqual(counter.collect(), {(): 1})
+
+
+class ExpositionTests(MetricTestMixin, TestCase):
+    def setUp(self):
+        reset_process_state()
+        for metric in metrics.REGISTRY:
+            metric.reset()
+        for device, score in zip(make_fleet(devices=3), (30, 70, 75)):
+            device.health_score = score
+            device.save(update_fields=['health_score'])
+
+    def test_valid_text_format(self):
+        metrics.TELEMETRY_ACCEPTED.inc('bulk', amount=5)
+        metrics.TELEMETRY_REJECTED.inc('single', 'unknown_device')
+        for seconds in (0.001, 0.03, 0.03, 20.0):
+            metrics.HTTP_DURATION.observe(seconds, 'api-summary')
+        odd = self.metric(metrics.Counter, 'test_odd_labels_total', 'Labels to escape.', ['value'])
+        odd.inc('a "quoted"\\back\nslash')
+
+        families = parse(metrics.exposition())
+
+        self.assertEqual(
+            families['parking_telemetry_accepted_total'],
+            ('counter', [('parking_telemetry_accepted_total', {'endpoint': 'bulk'}, 5.0)]),
+        )
+        self.assertEqual(families['test_odd_labels_total'][1][0][1], {'value': r'a \"quoted\"\\back\nslash'})
+        self.assertEqual(
+            families['parking_devices_by_health_score'],
+            ('gauge', [
+                ('parking_devices_by_health_score', {'le': str(bound)}, count)
+                for bound, count in zip(metrics.HEALTH_BUCKETS, (0, 1, 1, 3, 3))
+            ]),
+        )
+        self.assertEqual(
+            set(families),
+            {metric.name for metric in metrics.REGISTRY} | {'parking_devices_by_health_score'},
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        for seconds in (0.001, 0.03, 0.03, 20.0):
+            metrics.HTTP_DURATION.observe(seconds, 'api-summary')
+
+        kind, samples = parse(metrics.exposition())['parking_http_request_duration_seconds']
+
+        self.assertEqual(kind, 'histogram')
+        buckets = [(labels['le'], value) for name, labels, value in samples if name.endswith('_bucket')]
+        self.assertEqual([le for le, _ in buckets], [repr(float(b)) for b in metrics.LATENCY_BUCKETS] + ['+Inf'])
+        counts = [value for _, value in buckets]
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(counts[:4] + counts[-2:], [1, 1, 1, 3, 3, 4])
+        totals = {name: value for name, _, value in samples if not name.endswith('_bucket')}
+        self.assertEqual(totals['parking_http_request_duration_seconds_count'], 4)
+        self.assertAlmostEqual(totals['parking_http_request_duration_seconds_sum'], 20.061)
+
+    def test_sums_the_snapshots_of_other_processes(self):
+        metrics.TELEMETRY_ACCEPTED.inc('bulk', amount=2)
+        metrics.HTTP_DURATION.observe(0.001, 'api-summary')
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROCESS_DIR=directory):
+            other = {
+                'parking_telemetry_accepted_total': [[['bulk'], 3], [['single'], 1]],
+                'parking_http_request_duration_seconds': [[['api-summary'], [1] + [0] * 11 + [0.002, 1]]],
+                'parking_gone_total': [[[], 9]],  # from an older release
+            }
+            with open(metrics._snapshot_path(directory, os.getpid() + 1), 'w') as f:
+                json.dump(other, f)
+
+            families = parse(metrics.exposition())
+
+        self.assertEqual(
+            [(labels, value) for _, labels, value in families['parking_telemetry_accepted_total'][1]],
+            [({'endpoint': 'bulk'}, 5.0), ({'endpoint': 'single'}, 1.0)],
+        )
+        count, = [
+            value for name, _, value in families['parking_http_request_duration_seconds'][1]
+            if name.endswith('_count')
+        ]
+        self.assertEqual(count, 2)
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=0, METRICS_ALLOWED_NETWORKS=['127.0.0.0/8', '10.1.0.0/16'])
+class MetricsAccessTests(TestCase):
+    def scrape(self, address, **headers):
+        return self.client.get('/metrics', REMOTE_ADDR=address, headers=headers)
+
+    def test_allowed_networks(self):
+        for address, allowed in (('127.0.0.1', True), ('10.1.2.3', True), ('10.2.0.1', False), ('::1', False)):
+            with self.subTest(address=address):
+                response = self.scrape(address)
+                self.assertEqual(response.status_code, 200 if allowed else 403)
+                if allowed:
+                    self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+                    parse(response.content.decode())
+
+    @override_settings(METRICS_ALLOWED_NETWORKS=[])
+    def test_nobody_by_address(self):
+        self.assertEqual(self.scrape('127.0.0.1').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_bearer_token_from_any_address(self):
+        self.assertEqual(self.scrape('203.0.113.9', Authorization='Bearer s3cret').status_code, 200)
+        self.assertEqual(self.scrape('203.0.113.9', Authorization='Bearer wrong').status_code, 403)
+        self.assertEqual(self.scrape('203.0.113.9').status_code, 403)
+
+    def test_token_unset_accepts_no_bearer(self):
+        self.assertEqual(self.scrape('203.0.113.9', Authorization='Bearer ').status_code, 403)
@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from parking import services
+from parking.models import Alert, ParkingLog
+
+from .fixtures import make_fleet, reset_process_state
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        self.devices = make_fleet(devices=4, zones=2)
+        self.now = timezone.now().replace(microsecond=123_456)
+        # 14 logs on 5 distinct timestamps: page boundaries fall inside runs of equal keys
+        ParkingLog.objects.bulk_create([
+            ParkingLog(
+                device=self.devices[n % 4], zone_id=self.devices[n % 4].slot.zone_id,
+                is_occupied=n % 2 == 0, timestamp=self.now - timedelta(minutes=n // 3),
+            )
+            for n in range(14)
+        ])
+
+    def walk(self, url, link='next'):
+        """Follow `link` from `url` to the end; the ids of every page, in order."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            body = response.json()
+            pages.append([row['id'] for row in body['results']])
+            url = body[link]
+        return pages, body
+
+    def expected(self, queryset, key):
+        return list(queryset.order_by(f'-{key}', '-id').values_list('id', flat=True))
+
+    def test_every_log_exactly_once_in_order(self):
+        pages, _ = self.walk('/api/parking-logs/?page_size=4')
+
+        self.assertEqual([len(page) for page in pages], [4, 4, 4, 2])
+        self.assertEqual(sum(pages, []), self.expected(ParkingLog.objects, 'timestamp'))
+
+    def test_previous_links_walk_back_over_the_same_pages(self):
+        forward, last = self.walk('/api/parking-logs/?page_size=4')
+
+        backward, first = self.walk(last['previous'], link='previous')
+
+        self.assertEqual(backward, forward[-2::-1])
+        self.assertIsNone(first['previous'])
+
+    def test_filtered_by_zone(self):
+        zone_id = self.devices[0].slot.zone_id
+
+        pages, _ = self.walk(f'/api/parking-logs/?page_size=3&zone={zone_id}')
+
+        self.assertEqual(sum(pages, []), self.expected(ParkingLog.objects.filter(zone_id=zone_id), 'timestamp'))
+
+    def test_new_rows_do_not_shift_later_pages(self):
+        response = self.client.get('/api/parking-logs/?page_size=4')
+        first = [row['id'] for row in response.json()['results']]
+        device = self.devices[0]
+        ParkingLog.objects.create(device=device, is_occupied=True, timestamp=self.now + timedelta(minutes=1))
+
+        pages, _ = self.walk(response.json()['next'])
+
+        self.assertEqual(first + sum(pages, []), self.expected(ParkingLog.objects, 'timestamp')[1:])
+
+    def test_alerts_sharing_created_at(self):
+        for device in self.devices:
+            services._create_alerts_if_new([
+                services._high_power_alert(device, device.slot.zone, 2000),
+                services._invalid_data_alert(device, device.slot.zone, 90),
+            ])
+        # The same scan raised them all at once
+        Alert.objects.update(created_at=self.now)
+
+        pages, _ = self.walk('/api/alerts/?page_size=3')
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+        self.assertEqual(sum(pages, []), self.expected(Alert.objects, 'created_at'))
+
+    def test_invalid_cursor(self):
+        for cursor in ('garbage', 'az1pZD0x'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/parking-logs/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
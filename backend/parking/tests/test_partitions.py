@@ -0,0 +1,102 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from parking import partitions
+from parking.models import TelemetryData
+
+from .fixtures import make_fleet, reset_process_state
+
+
+@skipUnless(connection.vendor == 'postgresql', 'partitioning is PostgreSQL-only')
+class PartitionTests(TestCase):
+    """Conversion, routing, pruning and maintenance of the telemetry partitions (DDL rolls back)."""
+
+    table = TelemetryData._meta.db_table
+
+    def setUp(self):
+        reset_process_state()
+        self.device = make_fleet()[0]
+        self.now = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        self.today = self.now.date()
+
+    def add(self, *moments):
+        return TelemetryData.objects.bulk_create([
+            TelemetryData(
+                device=self.device, voltage=230.0, current=1.0, power_factor=0.9,
+                power_consumption=207.0, timestamp=moment,
+            )
+            for moment in moments
+        ])
+
+    def name(self, day):
+        return partitions.partition_name(self.table, day, 'daily')
+
+    def partition_of(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tableoid::regclass::text FROM {self.table} WHERE id = %s', [pk])
+            return cursor.fetchone()[0]
+
+    def convert(self, premake_days=1):
+        self.add(self.now - timedelta(days=2), self.now - timedelta(days=1), self.now)
+        with connection.cursor() as cursor:
+            # Run the deferred FK checks now; ALTER TABLE refuses pending ones
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        return partitions.convert_to_partitioned(self.table, 'daily', premake_days)
+
+    def test_convert_routes_rows_to_daily_partitions(self):
+        created = self.convert()
+        self.assertTrue(partitions.is_partitioned(self.table))
+        days = [self.today + timedelta(days=offset) for offset in range(-2, 2)]
+        self.assertEqual(
+            sorted(created), sorted([self.table + partitions.DEFAULT_SUFFIX] + [self.name(d) for d in days])
+        )
+        self.assertEqual(TelemetryData.objects.count(), 3)
+        for row in TelemetryData.objects.all():
+            self.assertEqual(self.partition_of(row.pk), self.name(row.timestamp.date()))
+
+        # The ORM still addresses rows by id
+        row = self.add(self.now + timedelta(hours=1))[0]
+        self.assertEqual(TelemetryData.objects.get(pk=row.pk).timestamp, row.timestamp)
+
+    def test_range_filter_prunes_other_partitions(self):
+        self.convert()
+        yesterday = self.today - timedelta(days=1)
+        plan = TelemetryData.objects.filter(
+            timestamp__gte=self.now - timedelta(days=1, hours=1),
+            timestamp__lt=self.now - timedelta(hours=13),
+        ).explain()
+        self.assertIn(self.name(yesterday), plan)
+        for day in (self.today - timedelta(days=2), self.today):
+            self.assertNotIn(self.name(day), plan)
+        self.assertNotIn(partitions.DEFAULT_SUFFIX, plan)
+
+    def test_new_partition_takes_its_rows_from_the_default(self):
+        self.convert(premake_days=0)
+        later = self.today + timedelta(days=3)
+        stray = self.add(self.now + timedelta(days=3))[0]
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        self.assertEqual(self.partition_of(stray.pk), self.table + partitions.DEFAULT_SUFFIX)
+
+        created = partitions.create_partitions(self.table, later, later, 'daily')
+
+        self.assertEqual(created, [self.name(later)])
+        self.assertEqual(self.partition_of(stray.pk), self.name(later))
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {self.table}{partitions.DEFAULT_SUFFIX}')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_expired_partitions_are_dropped(self):
+        self.convert()
+        oldest = self.name(self.today - timedelta(days=2))
+        expired = partitions.expired_partitions(self.table, self.today - timedelta(days=1))
+        self.assertEqual(expired, [oldest])
+
+        partitions.drop_partitions(self.table, expired)
+
+        self.assertNotIn(oldest, partitions.list_partitions(self.table))
+        self.assertEqual(TelemetryData.objects.count(), 2)
@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from parking import profiling
+from parking.models import RequestProfile
+
+from .fixtures import make_fleet, reset_process_state
+
+SHARED_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+@mock.patch.object(profiling, '_warned_per_process_cache', False)
+class PerProcessCacheWarningTests(SimpleTestCase):
+    @override_settings(DEBUG=False)
+    def test_locmem_cache_warns_once(self):
+        with self.assertLogs('parking.profiling', 'WARNING') as logs:
+            profiling.ProfilingMiddleware(lambda request: None)
+            profiling.ProfilingMiddleware(lambda request: None)
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('per-process', logs.output[0])
+
+    @override_settings(DEBUG=False, CACHES=SHARED_CACHE)
+    def test_shared_cache_does_not_warn(self):
+        with self.assertNoLogs('parking.profiling', 'WARNING'):
+            profiling.ProfilingMiddleware(lambda request: None)
+
+    @override_settings(DEBUG=True)
+    def test_debug_does_not_warn(self):
+        with self.assertNoLogs('parking.profiling', 'WARNING'):
+            profiling.ProfilingMiddleware(lambda request: None)
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=0, PROFILE_DEFAULT_MODE='cprofile', PROFILE_RATE_LIMIT=6)
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        make_fleet()
+        profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, profile_dir)
+        settings = override_settings(PROFILE_DIR=profile_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def get(self, path='/api/facilities/', **headers):
+        response = self.client.get(path, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assert_profiled(self, response, requested_by, suffix='.prof'):
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(
+            (profile.path, profile.status_code, profile.requested_by),
+            ('/api/facilities/', 200, requested_by),
+        )
+        self.assertTrue(profile.file_name.endswith(suffix))
+        self.assertTrue(os.path.exists(profiling.profile_path(profile)))
+        return profile
+
+    def assert_not_profiled(self, response, skipped=False):
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(response.get('X-Profile'), 'skipped' if skipped else None)
+
+    def login(self, **flags):
+        user = get_user_model().objects.create_user('ops', password='secret', **flags)
+        self.client.force_login(user)
+        return user
+
+    def test_signed_token_is_accepted(self):
+        response = self.get(X_Profile=profiling.make_token())
+
+        profile = self.assert_profiled(response, 'token')
+        self.assertGreater(os.path.getsize(profiling.profile_path(profile)), 0)
+
+    def test_sample_mode(self):
+        response = self.get(X_Profile=profiling.make_token(), X_Profile_Mode='sample')
+
+        self.assertEqual(self.assert_profiled(response, 'token', '.collapsed').mode, 'sample')
+
+    def test_bad_or_expired_token_is_rejected(self):
+        with mock.patch('time.time', return_value=time.time() - 7200):
+            expired = profiling.make_token()
+        for token in (profiling.make_token() + 'x', 'profile:abc:def', expired):
+            with self.subTest(token=token):
+                self.assert_not_profiled(self.get(X_Profile=token))
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_staff_query_parameter(self):
+        self.login(is_staff=True)
+
+        self.assert_profiled(self.get('/api/facilities/?profile=1'), 'ops')
+
+    def test_query_parameter_needs_staff(self):
+        self.assert_not_profiled(self.get('/api/facilities/?profile=1'))
+        self.login()
+        self.assert_not_profiled(self.get('/api/facilities/?profile=1'))
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILE_RATE_LIMIT=2)
+    def test_rate_limit(self):
+        token = profiling.make_token()
+        # Stay in one rate window
+        with mock.patch.object(profiling.time, 'time', return_value=time.time()):
+            responses = [self.get(X_Profile=token) for _ in range(3)]
+
+        self.assertEqual(['X-Profile-Id' in response for response in responses], [True, True, False])
+        self.assert_not_profiled(responses[2], skipped=True)
+        self.assertEqual(RequestProfile.objects.count(), 2)
+
+    def test_one_profile_at_a_time(self):
+        # Another request of this process is being profiled
+        with profiling._active:
+            response = self.get(X_Profile=profiling.make_token())
+
+        self.assert_not_profiled(response, skipped=True)
+        self.assertFalse(RequestProfile.objects.exists())
+        self.assert_profiled(self.get(X_Profile=profiling.make_token()), 'token')
+
+    @override_settings(PROFILE_KEEP=2)
+    def test_only_the_newest_are_kept(self):
+        token = profiling.make_token()
+        profiles = [self.assert_profiled(self.get(X_Profile=token), 'token') for _ in range(3)]
+
+        self.assertEqual(list(RequestProfile.objects.order_by('pk')), profiles[1:])
+        self.assertFalse(os.path.exists(profiling.profile_path(profiles[0])))
+
+    def test_listed_and_downloaded_in_admin(self):
+        profile = self.assert_profiled(self.get(X_Profile=profiling.make_token()), 'token')
+        self.login(is_staff=True, is_superuser=True)
+
+        listing = self.client.get('/admin/parking/requestprofile/')
+        self.assertContains(listing, profile.file_name)
+
+        download = self.client.get(f'/admin/parking/requestprofile/{profile.pk}/download/')
+        self.assertEqual(download.status_code, 200)
+        with open(profiling.profile_path(profile), 'rb') as f:
+            self.assertEqual(b''.join(download.streaming_content), f.read())
@@ -0,0 +1,52 @@
+from django.db import connection
+from django.test import TestCase
+
+from parking import services
+from parking.models import Device, TelemetryData
+from parking.queryplans import PROBES, FailedRequest, check_query_plans
+
+from .fixtures import make_fleet, reset_process_state
+
+
+class CheckQueryPlansTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+
+    def assert_clean(self, results):
+        self.assertEqual([name for name, _statements, _findings in results], list(PROBES))
+        for name, statements, findings in results:
+            with self.subTest(probe=name):
+                self.assertEqual([str(finding) for finding in findings], [])
+                self.assertTrue(statements)
+
+    def test_empty_database_is_seeded_and_rolled_back(self):
+        results = check_query_plans()
+
+        self.assert_clean(results)
+        self.assertFalse(Device.objects.exists())
+        self.assertFalse(TelemetryData.objects.exists())
+
+    def test_populated_database(self):
+        device = make_fleet(devices=4, zones=2)[0]
+        services._create_alerts_if_new([services._high_power_alert(device, device.slot.zone, 1800.0)])
+
+        self.assert_clean(check_query_plans())
+
+    def test_ingest_probes_write_their_readings(self):
+        results = {name: statements for name, statements, _findings in check_query_plans(
+            ['telemetry', 'telemetry-bulk'],
+        )}
+
+        table = connection.ops.quote_name(TelemetryData._meta.db_table)
+        for name, statements in results.items():
+            with self.subTest(probe=name):
+                self.assertTrue(any(sql.startswith(f'INSERT INTO {table}') for sql, _params in statements))
+
+    def test_failed_request_is_a_finding(self):
+        make_fleet()
+        # No open alert to acknowledge
+        (_name, _statements, findings), = check_query_plans(['acknowledge'])
+
+        self.assertEqual(len(findings), 1)
+        self.assertIsInstance(findings[0], FailedRequest)
+        self.assertEqual(findings[0].status, 404)
@@ -0,0 +1,55 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from parking import retention
+from parking.models import TelemetryData
+
+from .fixtures import make_fleet, reset_process_state
+
+
+class PurgeQuerysetTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        device = make_fleet()[0]
+        now = timezone.now()
+        # 40 rows; every fourth one is old, so the expired ids are sparse
+        TelemetryData.objects.bulk_create([
+            TelemetryData(
+                device=device, voltage=230.0, current=1.0, power_factor=0.9, power_consumption=207.0,
+                timestamp=now - timedelta(days=60 if i % 4 == 0 else 1, minutes=i),
+            )
+            for i in range(40)
+        ])
+        self.expired = TelemetryData.objects.filter(timestamp__lt=now - timedelta(days=30))
+
+    def purge(self):
+        windows = []
+        deleted = retention.purge_queryset(
+            self.expired, batch_size=3, progress=lambda *args: windows.append(args),
+        )
+        return deleted, windows
+
+    def test_windows_hold_batch_size_matching_rows(self):
+        deleted, windows = self.purge()
+        self.assertEqual(deleted, 10)
+        # ceil(10 / 3) windows, none of them empty
+        self.assertEqual([count for count, _, _ in windows], [3, 6, 9, 10])
+        self.assertEqual(windows[-1][1], windows[-1][2])
+        self.assertFalse(self.expired.exists())
+        self.assertEqual(TelemetryData.objects.count(), 30)
+
+    def test_fallback_delete_without_private_api(self):
+        with mock.patch.object(retention, '_RAW_DELETE_CHECKED', ((0, 0), (0, 0))), \
+                mock.patch.object(TelemetryData.objects.none().__class__, '_raw_delete') as raw:
+            deleted, windows = self.purge()
+        raw.assert_not_called()
+        self.assertEqual(deleted, 10)
+        self.assertEqual(len(windows), 4)
+        self.assertEqual(TelemetryData.objects.count(), 30)
+
+    def test_nothing_to_purge(self):
+        self.expired.delete()
+        self.assertEqual(self.purge(), (0, []))
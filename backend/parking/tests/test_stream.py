@@ -0,0 +1,151 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from parking import stream
+
+
+def events(backlog):
+    return [(event.type, event.data['n']) for event in backlog]
+
+
+class InProcessBrokerTests(SimpleTestCase):
+    def setUp(self):
+        self.broker = stream.InProcessBroker(history_size=3, queue_size=4)
+
+    def publish(self, count, start=1, **scope):
+        return [self.broker.publish('occupancy', {'n': n}, **scope) for n in range(start, start + count)]
+
+    async def test_subscribers_get_published_events(self):
+        first, _ = self.broker.subscribe()
+        second, _ = self.broker.subscribe()
+
+        event, = self.publish(1)
+
+        for subscription in (first, second):
+            self.assertIs(await asyncio.wait_for(subscription.queue.get(), 1), event)
+
+    async def test_unsubscribed_get_nothing(self):
+        subscription, _ = self.broker.subscribe()
+        self.broker.unsubscribe(subscription)
+
+        self.publish(1)
+        await asyncio.sleep(0)
+
+        self.assertTrue(subscription.queue.empty())
+
+    async def test_replays_history_after_last_event_id(self):
+        published = self.publish(3)
+
+        _, backlog = self.broker.subscribe(published[0].id)
+        self.assertEqual(events(backlog), [('occupancy', 2), ('occupancy', 3)])
+
+        _, backlog = self.broker.subscribe(published[-1].id)
+        self.assertEqual(backlog, [])
+
+        _, backlog = self.broker.subscribe()
+        self.assertEqual(backlog, [])
+
+    async def test_replays_all_history_from_just_before_it(self):
+        published = self.publish(5)
+
+        # History holds 3–5; the client saw 2, so nothing was lost
+        _, backlog = self.broker.subscribe(published[1].id)
+
+        self.assertEqual(events(backlog), [('occupancy', 3), ('occupancy', 4), ('occupancy', 5)])
+
+    async def test_cursor_out_of_history_needs_a_reset(self):
+        published = self.publish(5)
+        other_process = stream.InProcessBroker(history_size=3).publish('occupancy', {'n': 1})
+
+        for last_event_id in (published[0].id, other_process.id, f'{self.broker.boot}-x', 'garbage'):
+            with self.subTest(last_event_id=last_event_id):
+                _, backlog = self.broker.subscribe(last_event_id)
+                self.assertIsNone(backlog)
+
+    async def test_slow_subscriber_is_reset(self):
+        subscription, _ = self.broker.subscribe()
+
+        self.publish(5)
+        await asyncio.sleep(0)
+
+        # The backlog was dropped for a single reset marker
+        self.assertIsNone(subscription.queue.get_nowait())
+        self.assertTrue(subscription.queue.empty())
+
+
+class EventStreamTests(SimpleTestCase):
+    def setUp(self):
+        self.broker = stream.InProcessBroker(history_size=3, queue_size=4)
+        patcher = mock.patch.object(stream, '_broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def read(self, body, count):
+        return [await asyncio.wait_for(body.__anext__(), 1) for _ in range(count)]
+
+    def parse(self, chunk):
+        fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+        return fields.get('id'), fields['event'], json.loads(fields['data'])
+
+    async def test_replays_then_streams_matching_events(self):
+        missed = [
+            self.broker.publish('occupancy', {'n': 1}, facility_id=1, zone_id=10),
+            self.broker.publish('occupancy', {'n': 2}, facility_id=2, zone_id=20),
+        ]
+        body = stream.event_stream(facility_ids={1}, last_event_id=f'{self.broker.boot}-0')
+        try:
+            retry, replayed = await self.read(body, 2)
+            self.assertTrue(retry.startswith('retry: '))
+            self.assertEqual(self.parse(replayed), (missed[0].id, 'occupancy', {'facility_id': 1, 'zone_id': 10, 'n': 1}))
+
+            self.broker.publish('occupancy', {'n': 3}, facility_id=2, zone_id=20)
+            live = self.broker.publish('alert', {'n': 4}, facility_id=1, zone_id=11)
+            unscoped = self.broker.publish('alerts_raised', {'n': 5})
+
+            chunks = await self.read(body, 2)
+            self.assertEqual([self.parse(chunk)[0] for chunk in chunks], [live.id, unscoped.id])
+        finally:
+            await body.aclose()
+        self.assertEqual(self.broker.subscribers, set())
+
+    async def test_reset_when_the_cursor_fell_out_of_history(self):
+        first = self.broker.publish('occupancy', {'n': 1})
+        for n in range(2, 6):
+            self.broker.publish('occupancy', {'n': n})
+
+        body = stream.event_stream(last_event_id=first.id)
+        try:
+            _retry, reset = await self.read(body, 2)
+            self.assertEqual(self.parse(reset), (None, stream.RESET, {}))
+
+            # Live events follow the reset
+            live = self.broker.publish('occupancy', {'n': 6})
+            self.assertEqual(self.parse((await self.read(body, 1))[0])[0], live.id)
+        finally:
+            await body.aclose()
+
+    async def test_keepalive_while_idle(self):
+        body = stream.event_stream(heartbeat=0.01)
+        try:
+            self.assertEqual((await self.read(body, 2))[1], ': keepalive\n\n')
+        finally:
+            await body.aclose()
+
+
+class PublishOnCommitTests(TestCase):
+    def test_published_when_the_transaction_commits(self):
+        broker = stream.InProcessBroker(history_size=3)
+
+        with mock.patch.object(stream, '_broker', broker):
+            with self.captureOnCommitCallbacks() as callbacks:
+                stream.publish('occupancy', {'n': 1}, facility_id=1, zone_id=2)
+            self.assertEqual(len(broker.history), 0)
+
+            for callback in callbacks:
+                callback()
+
+        event, = broker.history
+        self.assertEqual((event.type, event.facility_id, event.zone_id, event.data), ('occupancy', 1, 2, {'n': 1}))
@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from parking import services, sync
+from parking.models import Alert, Device, Tombstone
+
+from .fixtures import make_fleet, reset_process_state
+
+
+@override_settings(SYNC_CURSOR_OVERLAP_SECONDS=5, REQUEST_TIMING_SAMPLE_RATE=0)
+class ChangesSinceTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        self.now = timezone.now()
+        self.devices = make_fleet(devices=3)
+        self.alerts = [
+            services._create_alerts_if_new([services._high_power_alert(device, device.slot.zone, 2000)])[0]
+            for device in self.devices[:2]
+        ]
+        # Everything last changed an hour ago
+        for model in (Device, Alert):
+            model.objects.update(updated_at=self.now - timedelta(hours=1))
+
+    def sync(self, cursor, seconds_later=0):
+        """changes_since(`cursor`) run `seconds_later` after self.now; (ids by kind, next cursor)."""
+        payload = sync.changes_since(cursor, now=self.now + timedelta(seconds=seconds_later))
+        ids = {
+            'devices': [row['id'] for row in payload['devices']],
+            'alerts': [row['id'] for row in payload['alerts']],
+            'deleted': {kind: ids for kind, ids in payload['deleted'].items() if ids},
+        }
+        return ids, payload['cursor']
+
+    def stamp(self, model, pk, seconds):
+        """Set `updated_at` of one row to `seconds` after self.now."""
+        model.objects.filter(pk=pk).update(updated_at=self.now + timedelta(seconds=seconds))
+
+    def test_snapshot_then_empty_delta(self):
+        snapshot, cursor = self.sync(None)
+        self.assertEqual(snapshot['devices'], [device.pk for device in self.devices])
+        self.assertEqual(sorted(snapshot['alerts']), [alert.pk for alert in self.alerts])
+
+        delta, _ = self.sync(cursor, 30)
+        self.assertEqual(delta, {'devices': [], 'alerts': [], 'deleted': {}})
+
+    def test_changed_rows_since_the_cursor(self):
+        _, cursor = self.sync(None)
+        self.stamp(Device, self.devices[2].pk, 20)
+        self.stamp(Alert, self.alerts[0].pk, 20)
+
+        delta, _ = self.sync(cursor, 30)
+
+        self.assertEqual((delta['devices'], delta['alerts']), ([self.devices[2].pk], [self.alerts[0].pk]))
+
+    def test_late_commit_within_the_overlap(self):
+        _, cursor = self.sync(None)
+        # Stamped before the cursor, committed after the first sync read
+        self.stamp(Alert, self.alerts[0].pk, -3)
+        self.stamp(Alert, self.alerts[1].pk, -10)
+
+        delta, _ = self.sync(cursor, 30)
+
+        self.assertEqual(delta['alerts'], [self.alerts[0].pk])
+
+    @override_settings(SYNC_CURSOR_OVERLAP_SECONDS=0)
+    def test_rows_sharing_a_timestamp_are_not_missed(self):
+        # The first sync ran at the very moment two rows were stamped, and
+        # saw only one of them committed
+        self.stamp(Alert, self.alerts[0].pk, 0)
+        _, cursor = self.sync(None)
+        self.stamp(Alert, self.alerts[1].pk, 0)
+
+        delta, _ = self.sync(cursor, 30)
+
+        self.assertIn(self.alerts[1].pk, delta['alerts'])
+
+    def test_deletes_leave_tombstones(self):
+        _, cursor = self.sync(None)
+        alert, device = self.alerts[0], self.devices[2]
+
+        Alert.objects.filter(pk=alert.pk).delete()
+        Device.objects.filter(pk=device.pk).delete()
+        Tombstone.objects.update(deleted_at=self.now + timedelta(seconds=10))
+
+        delta, _ = self.sync(cursor, 30)
+        self.assertEqual(delta['deleted'], {Tombstone.KIND_ALERT: [alert.pk], Tombstone.KIND_DEVICE: [device.pk]})
+        self.assertNotIn(device.pk, delta['devices'])
+
+    def test_device_delete_tombstones_its_alerts(self):
+        _, cursor = self.sync(None)
+        device_id = self.devices[1].pk
+
+        self.devices[1].delete()
+        Tombstone.objects.update(deleted_at=self.now + timedelta(seconds=10))
+
+        delta, _ = self.sync(cursor, 30)
+        self.assertEqual(delta['deleted'], {Tombstone.KIND_ALERT: [self.alerts[1].pk], Tombstone.KIND_DEVICE: [device_id]})
+
+    @override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=7)
+    def test_cursor_older_than_the_tombstones_resets(self):
+        payload = sync.changes_since(sync.encode_cursor(self.now - timedelta(days=8)), now=self.now)
+
+        self.assertTrue(payload['reset'])
+        self.assertEqual(len(payload['devices']), 3)
+
+    def test_cursor_round_trip(self):
+        moment = self.now.replace(microsecond=999_999)
+
+        self.assertEqual(sync.decode_cursor(sync.encode_cursor(moment)), moment)
+
+    def test_invalid_cursor(self):
+        for cursor in ('abc', '-1'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/sync/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
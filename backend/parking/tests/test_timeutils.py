@@ -0,0 +1,110 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from parking import timeutils
+from parking.models import ParkingLog
+
+from .fixtures import make_fleet, reset_process_state
+
+UTC = dt_timezone.utc
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=UTC)
+
+
+class DayBoundsTests(SimpleTestCase):
+    berlin = timeutils.get_timezone('Europe/Berlin')
+
+    def test_spring_forward_day_is_23_hours(self):
+        start, end = timeutils.day_bounds(date(2026, 3, 29), self.berlin)
+
+        self.assertEqual((start, end), (utc(2026, 3, 28, 23), utc(2026, 3, 29, 22)))
+        self.assertEqual(end - start, timedelta(hours=23))
+
+    def test_fall_back_day_is_25_hours(self):
+        start, end = timeutils.day_bounds(date(2026, 10, 25), self.berlin)
+
+        self.assertEqual((start, end), (utc(2026, 10, 24, 22), utc(2026, 10, 25, 23)))
+        self.assertEqual(end - start, timedelta(hours=25))
+
+    def test_midnight_that_does_not_exist(self):
+        # São Paulo skipped from 00:00 to 01:00 (-02) on 2018-11-04
+        start, end = timeutils.day_bounds(date(2018, 11, 4), timeutils.get_timezone('America/Sao_Paulo'))
+
+        self.assertEqual((start, end), (utc(2018, 11, 4, 3), utc(2018, 11, 5, 2)))
+
+    def test_consecutive_days_tile_across_transitions(self):
+        for tz_name in ('Europe/Berlin', 'America/Sao_Paulo', 'Australia/Lord_Howe', 'Asia/Kolkata'):
+            tz = timeutils.get_timezone(tz_name)
+            for first in (date(2018, 11, 3), date(2026, 3, 28), date(2026, 10, 3), date(2026, 10, 24)):
+                with self.subTest(tz=tz_name, day=first):
+                    _, end = timeutils.day_bounds(first, tz)
+                    start, _ = timeutils.day_bounds(first + timedelta(days=1), tz)
+                    self.assertEqual(end, start)
+
+    def test_defaults_to_the_current_time_zone(self):
+        self.assertEqual(timeutils.day_bounds(date(2026, 3, 29)), (utc(2026, 3, 29), utc(2026, 3, 30)))
+
+        with override_settings(TIME_ZONE='Europe/Berlin'):
+            self.assertEqual(timeutils.day_bounds(date(2026, 3, 29))[0], utc(2026, 3, 28, 23))
+
+    def test_day_filter(self):
+        self.assertEqual(
+            timeutils.day_filter('timestamp', date(2026, 10, 25), self.berlin),
+            {'timestamp__gte': utc(2026, 10, 24, 22), 'timestamp__lt': utc(2026, 10, 25, 23)},
+        )
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+class FacilityDayTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        utc_device, self.device = make_fleet(devices=2, facilities=2)
+        self.utc_facility = utc_device.slot.zone.facility_id
+        self.facility = self.device.slot.zone.facility
+        self.facility.timezone = 'Asia/Tokyo'
+        self.facility.save()
+        reset_process_state()
+
+        # 17th 00:30 in Tokyo, still the 16th in UTC
+        self.log = ParkingLog.objects.create(device=self.device, is_occupied=True, timestamp=utc(2026, 10, 16, 15, 30))
+
+    def test_facility_and_zone_time_zones(self):
+        tokyo = timeutils.get_timezone('Asia/Tokyo')
+
+        self.assertEqual(timeutils.facility_timezone(self.facility.id), tokyo)
+        self.assertEqual(timeutils.facility_timezone(str(self.facility.id)), tokyo)
+        self.assertEqual(timeutils.zone_timezone(self.device.slot.zone_id), tokyo)
+        self.assertEqual(timeutils.facility_timezone(self.utc_facility), timeutils.get_timezone('UTC'))
+        for unknown in (None, '', 'abc', 999999):
+            with self.subTest(facility=unknown):
+                self.assertEqual(timeutils.facility_timezone(unknown), timeutils.get_timezone('UTC'))
+
+    def test_day_filter_in_the_facility_time_zone(self):
+        tz = timeutils.facility_timezone(self.facility.id)
+        logs = ParkingLog.objects.filter(device=self.device)
+
+        self.assertTrue(logs.filter(**timeutils.day_filter('timestamp', date(2026, 10, 17), tz)).exists())
+        self.assertFalse(logs.filter(**timeutils.day_filter('timestamp', date(2026, 10, 16), tz)).exists())
+        # The same row in UTC
+        self.assertTrue(logs.filter(**timeutils.day_filter('timestamp', date(2026, 10, 16))).exists())
+
+    def test_log_list_uses_the_zone_date(self):
+        def ids(day, **params):
+            response = self.client.get('/api/parking-logs/', {'date': day, **params})
+            self.assertEqual(response.status_code, 200, response.content)
+            return [row['id'] for row in response.json()['results']]
+
+        zone = self.device.slot.zone_id
+        self.assertEqual(ids('2026-10-17', zone=zone), [self.log.id])
+        self.assertEqual(ids('2026-10-16', zone=zone), [])
+        # Unscoped lists use the project's UTC
+        self.assertEqual(ids('2026-10-16'), [self.log.id])
+
+    def test_local_today(self):
+        self.assertEqual(
+            timeutils.local_today(timeutils.get_timezone('Pacific/Kiritimati')),
+            (datetime.now(UTC) + timedelta(hours=14)).date(),
+        )
@@ -0,0 +1,153 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from parking import topology
+from parking.models import Device, ParkingFacility, ParkingSlot, ParkingZone
+
+from .fixtures import make_fleet, reset_process_state
+
+
+@override_settings(TOPOLOGY_CACHE_TTL_SECONDS=60)
+class ResolveDevicesTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        self.device = make_fleet(facilities=2)[0]
+        self.other_facility = ParkingFacility.objects.exclude(pk=self.device.slot.zone.facility_id).get()
+        topology.get_topology()  # warm
+
+    def ref(self, code=None):
+        """The snapshot's (device, slot, zone, facility) ids for `code`, or None if it does not resolve."""
+        code = code or self.device.device_code
+        device = topology.resolve_devices([code]).get(code)
+        if device is None:
+            return None
+        return device.id, device.slot_id, device.slot.zone_id, device.slot.zone.facility_id
+
+    def commit(self, change):
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+
+    def test_resolves_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.ref(),
+                (self.device.id, self.device.slot_id, self.device.slot.zone_id, self.device.slot.zone.facility_id),
+            )
+            self.assertIsNone(self.ref('NOPE'))
+
+    def test_device_create(self):
+        slot = ParkingSlot.objects.create(zone=self.device.slot.zone, slot_number='X1')
+
+        self.commit(lambda: Device.objects.create(device_code='NEW-1', slot=slot))
+
+        self.assertEqual(self.ref('NEW-1')[1:], (slot.id, slot.zone_id, self.device.slot.zone.facility_id))
+
+    def test_device_moved_to_another_facility(self):
+        zone = ParkingZone.objects.filter(facility=self.other_facility).first()
+        slot = ParkingSlot.objects.create(zone=zone, slot_number='X1')
+
+        def move():
+            self.device.slot = slot
+            self.device.save()
+
+        self.commit(move)
+
+        self.assertEqual(self.ref()[1:], (slot.id, zone.id, self.other_facility.id))
+
+    def test_device_deactivated_and_deleted(self):
+        def deactivate():
+            self.device.is_active = False
+            self.device.save()
+
+        self.commit(deactivate)
+        self.assertIsNone(self.ref())
+        self.assertIsNotNone(topology.get_topology().get(self.device.device_code))
+
+        self.commit(self.device.delete)
+        self.assertIsNone(topology.get_topology().get(self.device.device_code))
+
+    def test_zone_create_update_and_delete(self):
+        zone = self.device.slot.zone
+        created = []
+        self.commit(lambda: created.append(ParkingZone.objects.create(facility=self.other_facility, name='New')))
+        self.assertEqual(topology.get_topology().facility_of_zone(created[0].id), self.other_facility.id)
+
+        def move():
+            zone.facility, zone.name = self.other_facility, 'Moved'
+            zone.save()
+
+        self.commit(move)
+        self.assertEqual(self.ref()[3], self.other_facility.id)
+        self.assertEqual(topology.get_topology().facility_of_zone(zone.id), self.other_facility.id)
+
+        self.commit(zone.delete)
+        self.assertIsNone(topology.get_topology().facility_of_zone(zone.id))
+        self.assertIsNone(self.ref())
+
+    def test_facility_time_zone(self):
+        facility = self.other_facility
+
+        def change():
+            facility.timezone = 'Asia/Tokyo'
+            facility.save()
+
+        self.commit(change)
+
+        self.assertEqual(topology.get_topology().timezone_of_facility(facility.id), 'Asia/Tokyo')
+
+    def test_ingest_saves_keep_the_snapshot(self):
+        version = topology.current_version()
+
+        self.commit(lambda: self.device.save(update_fields=list(topology.INGEST_FIELDS)))
+
+        self.assertEqual(topology.current_version(), version)
+        with self.assertNumQueries(0):
+            self.ref()
+
+    def test_bulk_writes_need_invalidate(self):
+        Device.objects.filter(pk=self.device.pk).update(is_active=False)
+        self.assertIsNotNone(self.ref())
+
+        self.commit(topology.invalidate)
+
+        self.assertIsNone(self.ref())
+
+
+@override_settings(TOPOLOGY_CACHE_TTL_SECONDS=60)
+class StaleSnapshotTests(TestCase):
+    """Another worker's edit: the shared version moves, this worker's snapshot does not drop."""
+
+    def setUp(self):
+        reset_process_state()
+        make_fleet()
+        self.clock = 1000.0
+        patcher = mock.patch.object(topology, 'time', mock.Mock(monotonic=lambda: self.clock))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.snapshot = topology.get_topology()
+
+    def edit_elsewhere(self):
+        zone = ParkingZone.objects.first()
+        slot = ParkingSlot.objects.create(zone=zone, slot_number='X1')
+        Device.objects.bulk_create([Device(device_code='OTHER-1', slot=slot)])
+        topology._bump_version()
+
+    def test_rebuilt_once_the_ttl_passed(self):
+        self.edit_elsewhere()
+
+        self.clock += 30
+        with self.assertNumQueries(0):
+            self.assertIs(topology.get_topology(), self.snapshot)
+
+        self.clock += 31
+        fresh = topology.get_topology()
+        self.assertIsNot(fresh, self.snapshot)
+        self.assertEqual(fresh.version, topology.current_version())
+        self.assertIsNotNone(fresh.get('OTHER-1'))
+
+    def test_unchanged_version_is_not_reloaded(self):
+        self.clock += 61
+
+        with self.assertNumQueries(1):  # the version check
+            self.assertIs(topology.get_topology(), self.snapshot)
@@ -0,0 +1,133 @@
+import hashlib
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from parking import watermarks
+
+from .fixtures import make_fleet, reset_process_state
+
+
+class CachedResponseTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return {'n': self.calls}
+
+    def get(self, facility_id=None, closed=False, extra=()):
+        # Like the views, the facility is part of the cache key
+        return watermarks.cached_response(
+            'test', (facility_id, *extra), self.compute, facility_id=facility_id, closed=closed,
+        )
+
+    def touch(self, *args, **kwargs):
+        """watermarks.touch(), committed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            watermarks.touch(*args, **kwargs)
+
+    def test_served_from_cache_while_the_version_is_unchanged(self):
+        first = self.get(1)
+        second = self.get(1)
+
+        self.assertEqual(second, first)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(first[1], watermarks.data_version(1))
+        # Different params are a different entry
+        self.assertEqual(self.get(1, extra=('other',))[0], {'n': 2})
+
+    def test_a_committed_write_invalidates(self):
+        payload, version = self.get(1)
+
+        self.touch([1])
+
+        self.assertEqual(self.get(1), ({'n': 2}, watermarks.data_version(1)))
+        self.assertNotEqual(watermarks.data_version(1), version)
+
+    def test_an_uncommitted_write_does_not_invalidate(self):
+        self.get(1)
+
+        with self.captureOnCommitCallbacks(execute=False):
+            watermarks.touch([1])
+
+        self.assertEqual(self.get(1)[0], {'n': 1})
+
+    def test_writes_are_scoped_to_their_facility(self):
+        self.get(1)
+        self.get(None)
+
+        self.touch([2])
+
+        self.assertEqual(self.get(1)[0], {'n': 1})
+        # Unscoped responses cover every facility
+        self.assertEqual(self.get(None)[0], {'n': 3})
+
+    def test_closed_dates_only_follow_history(self):
+        self.get(1, closed=True)
+
+        self.touch([1])
+        self.assertEqual(self.get(1, closed=True)[0], {'n': 1})
+
+        self.touch([1], dates=[timezone.localdate() - timedelta(days=1)])
+        self.assertEqual(self.get(1, closed=True)[0], {'n': 2})
+
+    def test_reset_invalidates_everything(self):
+        self.get(1)
+        self.get(1, closed=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            watermarks.reset()
+
+        self.assertEqual((self.get(1)[0], self.get(1, closed=True)[0]), ({'n': 3}, {'n': 4}))
+
+    def test_previous_payload_is_served_while_another_request_recomputes(self):
+        stale = self.get(1)
+        self.touch([1])
+        # Held by the request recomputing the entry
+        lock = watermarks._key('resp', 'test', hashlib.md5(repr((1,)).encode()).hexdigest()) + ':lock'
+        cache.add(lock, 1)
+
+        self.assertEqual(self.get(1), stale)
+        self.assertEqual(self.calls, 1)
+
+        cache.delete(lock)
+        self.assertEqual(self.get(1)[0], {'n': 2})
+
+    @override_settings(RESPONSE_CACHE_TTL_SECONDS=0)
+    def test_disabled(self):
+        self.assertEqual(self.get(1), ({'n': 1}, None))
+        self.assertEqual(self.get(1), ({'n': 2}, None))
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+class ZoneListCacheTests(TestCase):
+    def setUp(self):
+        reset_process_state()
+        self.device = make_fleet()[0]
+
+    def occupied(self):
+        response = self.client.get('/api/zones/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()[0]['occupied_count']
+
+    def test_invalidated_after_a_write(self):
+        self.assertEqual(self.occupied(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/parking-log/', {
+                'device_code': self.device.device_code, 'is_occupied': True,
+                'timestamp': timezone.now().isoformat(),
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        self.assertEqual(self.occupied(), 1)
+
+    def test_served_from_cache_until_then(self):
+        self.occupied()
+
+        with self.assertNumQueries(0):
+            self.occupied()
@@ -0,0 +1,89 @@
+"""
+Date helpers that keep time-series filters sargable and site-local.
+
+`timestamp__date=day` compiles to a per-row cast of the timestamp, which
+cannot use the timestamp index and prevents PostgreSQL from pruning
+partitions. Filtering on a half-open [start, end) range of aware datetimes
+does both.
+
+Dates are local to a site: each ParkingFacility has a `timezone`, and "the
+17th" of a facility is [17th 00:00, 18th 00:00) in that zone, converted to
+UTC bounds. Views scoped to a facility or zone use its zone; unscoped ones
+use the current time zone (settings.TIME_ZONE).
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+
+def default_timezone_name():
+    """Time zone of a new facility: the project's TIME_ZONE."""
+    return settings.TIME_ZONE
+
+
+def validate_timezone(value):
+    try:
+        get_timezone(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f"'{value}' is not an IANA time zone name.")
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    return ZoneInfo(name)
+
+
+def facility_timezone(facility_id=None):
+    """tzinfo of a facility; the current time zone if None or unknown."""
+    if facility_id is not None and str(facility_id).isdigit():
+        from .topology import get_topology
+
+        name = get_topology().timezone_of_facility(int(facility_id))
+        if name:
+            return get_timezone(name)
+    return timezone.get_current_timezone()
+
+
+def zone_timezone(zone_id=None):
+    """tzinfo of the facility a zone belongs to; the current time zone if None or unknown."""
+    if zone_id is not None and str(zone_id).isdigit():
+        from .topology import get_topology
+
+        return facility_timezone(get_topology().facility_of_zone(int(zone_id)))
+    return timezone.get_current_timezone()
+
+
+def local_today(tz=None):
+    """Today's date in `tz` (default: the current time zone)."""
+    return timezone.localdate(timezone=tz)
+
+
+def day_bounds(day, tz=None):
+    """
+    Half-open [start, end) covering `day` in `tz` (default: current time
+    zone), as UTC datetimes: `end - start` is the day's real length (23 or
+    25 hours across a DST change), which same-zone arithmetic would not give.
+    """
+    tz = tz or timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+    return start.astimezone(dt_timezone.utc), end.astimezone(dt_timezone.utc)
+
+
+def day_filter(field, day, tz=None):
+    """Queryset filter kwargs selecting rows whose `field` falls on `day` in `tz`."""
+    start, end = day_bounds(day, tz)
+    return {f'{field}__gte': start, f'{field}__lt': end}
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def epoch_us(moment):
+    """Epoch microseconds of an aware datetime, as an exact integer."""
+    delta = moment - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
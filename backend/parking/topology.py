@@ -0,0 +1,237 @@
+"""
+In-process snapshot of the device topology for the ingest path.
+
+Every telemetry or parking-log message names a device_code, and ingest
+needs that device's id and the ids of its slot, zone and facility. Those
+mappings change only when someone edits the fleet, so each worker keeps one
+snapshot of the whole topology in memory:
+
+    device_code → row index
+    row index   → device_id, slot_id, zone_id, facility_id  (array('q') columns)
+                  is_active flags for all four             (one bytearray)
+    zone_id     → facility_id, facility_id → time zone name (small dicts)
+
+Resolving a code is a dict lookup with no queries. The snapshot is tagged
+with the TopologyVersion counter it was loaded at. Saving or deleting a
+facility, zone, slot or device bumps that counter (on commit) and drops the
+local snapshot; other workers re-read the counter at most every
+settings.TOPOLOGY_CACHE_TTL_SECONDS and reload when it moved, so an admin
+edit reaches every worker within that delay. Bulk writes that skip model
+signals (bulk_create, QuerySet.update) must call invalidate() themselves.
+
+Saves of a device's per-message fields (last_seen_at, health_score,
+open_alert_count and their updated_at stamp) do not touch the topology and
+are ignored.
+"""
+import threading
+import time
+from array import array
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+
+from .models import Device, ParkingFacility, ParkingSlot, ParkingZone, TopologyVersion
+
+DEVICE_ACTIVE = 1
+SLOT_ACTIVE = 2
+ZONE_ACTIVE = 4
+FACILITY_ACTIVE = 8
+
+# Device fields read and written per message; saving only these leaves the
+# topology as is
+INGEST_FIELDS = ('last_seen_at', 'health_score', 'open_alert_count', 'updated_at')
+
+
+class DeviceRef(NamedTuple):
+    device_id: int
+    slot_id: int
+    zone_id: int
+    facility_id: int
+    flags: int
+
+    @property
+    def is_active(self):
+        return bool(self.flags & DEVICE_ACTIVE)
+
+
+class Topology:
+    """Immutable code → DeviceRef snapshot with column-wise storage."""
+
+    __slots__ = (
+        'version', '_index', '_device', '_slot', '_zone', '_facility', '_flags',
+        '_zone_facility', '_facility_timezone',
+    )
+
+    def __init__(self, version, rows, zone_facility=None, facility_timezone=None):
+        self.version = version
+        self._index = {}
+        self._device = array('q')
+        self._slot = array('q')
+        self._zone = array('q')
+        self._facility = array('q')
+        self._flags = bytearray()
+        self._zone_facility = dict(zone_facility or {})
+        self._facility_timezone = dict(facility_timezone or {})
+        for code, device_id, slot_id, zone_id, facility_id, flags in rows:
+            self._zone_facility.setdefault(zone_id, facility_id)
+            self._index[code] = len(self._device)
+            self._device.append(device_id)
+            self._slot.append(slot_id)
+            self._zone.append(zone_id)
+            self._facility.append(facility_id)
+            self._flags.append(flags)
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, code):
+        """DeviceRef for `code`, or None if no such device exists."""
+        row = self._index.get(code)
+        if row is None:
+            return None
+        return DeviceRef(
+            self._device[row], self._slot[row], self._zone[row],
+            self._facility[row], self._flags[row],
+        )
+
+    def facility_of_zone(self, zone_id):
+        """Facility id of a zone, or None if no such zone exists."""
+        return self._zone_facility.get(zone_id)
+
+    def timezone_of_facility(self, facility_id):
+        """Time zone name of a facility, or None if no such facility exists."""
+        return self._facility_timezone.get(facility_id)
+
+
+def load_topology():
+    """Read the current version, every device's topology row and the zone → facility → time zone maps."""
+    version = current_version()
+    rows = (
+        (
+            code, device_id, slot_id, zone_id, facility_id,
+            (DEVICE_ACTIVE if device_active else 0)
+            | (SLOT_ACTIVE if slot_active else 0)
+            | (ZONE_ACTIVE if zone_active else 0)
+            | (FACILITY_ACTIVE if facility_active else 0),
+        )
+        for (
+            code, device_id, slot_id, zone_id, facility_id,
+            device_active, slot_active, zone_active, facility_active,
+        ) in Device.objects.order_by().values_list(
+            'device_code', 'id', 'slot_id', 'slot__zone_id', 'slot__zone__facility_id',
+            'is_active', 'slot__is_active', 'slot__zone__is_active',
+            'slot__zone__facility__is_active',
+        ).iterator(chunk_size=5000)
+    )
+    return Topology(
+        version,
+        rows,
+        zone_facility=ParkingZone.objects.order_by().values_list('id', 'facility_id'),
+        facility_timezone=ParkingFacility.objects.order_by().values_list('id', 'timezone'),
+    )
+
+
+# ── Versioning ────────────────────────────────────────
+
+
+def current_version():
+    row = TopologyVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+    return row or 0
+
+
+def _bump_version():
+    if not TopologyVersion.objects.filter(pk=1).update(version=F('version') + 1):
+        TopologyVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+
+
+# ── Process-wide snapshot ─────────────────────────────
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+
+
+def get_topology():
+    """
+    This worker's snapshot. Re-reads TopologyVersion once every
+    TOPOLOGY_CACHE_TTL_SECONDS and reloads only when it changed.
+    """
+    global _snapshot, _checked_at
+    ttl = settings.TOPOLOGY_CACHE_TTL_SECONDS
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _checked_at < ttl:
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - _checked_at < ttl:
+            return snapshot
+        if snapshot is None or current_version() != snapshot.version:
+            snapshot = _snapshot = load_topology()
+        _checked_at = now
+        return snapshot
+
+
+def clear_local():
+    """Drop this worker's snapshot; the next lookup reloads it."""
+    global _snapshot
+    _snapshot = None
+
+
+def invalidate():
+    """Bump the shared version and drop the local snapshot once the transaction commits."""
+    def bump():
+        _bump_version()
+        clear_local()
+
+    transaction.on_commit(bump)
+
+
+# ── Lookups ───────────────────────────────────────────
+
+
+def device_stub(code, ref):
+    """
+    Unsaved-looking Device with its slot and zone cached from `ref`, so
+    device.slot.zone and the FK ids used on ingest cost no queries.
+    Only ids, device_code and is_active are real; per-message fields are
+    filled in by services.load_ingest_state().
+    """
+    zone = ParkingZone(id=ref.zone_id, facility_id=ref.facility_id)
+    slot = ParkingSlot(id=ref.slot_id, zone=zone)
+    device = Device(id=ref.device_id, slot=slot, device_code=code, is_active=ref.is_active)
+    for instance in (zone, slot, device):
+        instance._state.adding = False
+    return device
+
+
+def resolve_devices(codes):
+    """{code: Device stub} for the active devices among `codes`."""
+    topology = get_topology()
+    devices = {}
+    for code in codes:
+        ref = topology.get(code)
+        if ref is not None and ref.is_active:
+            devices[code] = device_stub(code, ref)
+    return devices
+
+
+# ── Invalidation signals ──────────────────────────────
+
+
+def _topology_changed(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if sender is Device and update_fields and set(update_fields) <= set(INGEST_FIELDS):
+        return
+    invalidate()
+
+
+def connect_signals():
+    for model in (ParkingFacility, ParkingZone, ParkingSlot, Device):
+        uid = f'topology_{model.__name__}'
+        post_save.connect(_topology_changed, sender=model, dispatch_uid=uid)
+        post_delete.connect(_topology_changed, sender=model, dispatch_uid=uid)
@@ -12,7 +12,9 @@ urlpatterns = [
     path('facilities/', views.FacilityListView.as_view(), name='facility-list'),
     path('zones/', views.ZoneListView.as_view(), name='zone-list'),
     path('devices/', views.DeviceListView.as_view(), name='device-list'),
+    path('sync/', views.SyncView.as_view(), name='sync'),
     path('dashboard/summary/', views.DashboardSummaryView.as_view(), name='dashboard-summary'),
     path('dashboard/hourly/', views.DashboardHourlyView.as_view(), name='dashboard-hourly'),
     path('targets/', views.TargetListView.as_view(), name='target-list'),
+    path('stream/', views.EventStreamView.as_view(), name='event-stream'),
 ]
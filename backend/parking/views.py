@@ -1,3 +1,8 @@
+import datetime
+
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.views import View
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -19,10 +24,36 @@ from .models import (
     ParkingFacility,
     ParkingZone,
     Device,
-    ParkingSlot,
     TelemetryData,
     ParkingTarget,
 )
+from .instrumentation import serialized
+from .pagination import AlertPagination, ParkingLogPagination
+from .timeutils import day_filter, facility_timezone, local_today, zone_timezone
+
+
+def _not_modified(request, etag):
+    """
+    A 304 response if the request's If-None-Match already names `etag`
+    (weak comparison), else None. Checked before building the response.
+    """
+    if etag is None:
+        return None
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return None
+    current = etag.removeprefix("W/")
+    if any(tag == "*" or tag.removeprefix("W/") == current for tag in parse_etags(header)):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response["ETag"] = etag
+        return response
+    return None
+
+
+def _with_etag(response, etag):
+    if etag is not None:
+        response["ETag"] = etag
+    return response
 
 
 class TelemetryCreateView(APIView):
@@ -108,7 +139,10 @@ class ParkingLogCreateView(APIView):
 class ParkingLogListView(APIView):
     """
     GET /api/parking-logs/
-    List parking logs with optional zone and date filters.
+    List parking logs, newest first, with optional zone and date filters.
+    The date is local to the zone's facility (without a zone, to the
+    server's TIME_ZONE). Keyset-paginated on (timestamp, id): follow
+    `next` / `previous`.
     """
 
     def get(self, request):
@@ -116,28 +150,44 @@ class ParkingLogListView(APIView):
             "device", "device__slot", "device__slot__zone"
         ).all()
 
-        # Filter by zone
+        # Filter by zone (the log's own zone, so parkinglog_zone_ts_idx serves the page)
         zone_id = request.query_params.get("zone")
         if zone_id:
-            logs = logs.filter(device__slot__zone_id=zone_id)
+            logs = logs.filter(zone_id=zone_id)
 
-        # Filter by date
-        date = request.query_params.get("date")
-        if date:
-            logs = logs.filter(timestamp__date=date)
+        # Filter by date (as a timestamp range, so the index / partitions are used)
+        date_str = request.query_params.get("date")
+        if date_str:
+            try:
+                date = datetime.date.fromisoformat(date_str)
+            except ValueError:
+                return Response(
+                    {"error": "Invalid date format. Use YYYY-MM-DD."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            logs = logs.filter(**day_filter("timestamp", date, zone_timezone(zone_id)))
 
-        logs = logs[:200]  # Limit results
-        serializer = ParkingLogListSerializer(logs, many=True)
-        return Response(serializer.data)
+        paginator = ParkingLogPagination()
+        page = paginator.paginate_queryset(logs, request, view=self)
+        serializer = ParkingLogListSerializer(page, many=True)
+        return paginator.get_paginated_response(serialized(serializer))
 
 
 class AlertListView(APIView):
     """
     GET /api/alerts/
-    List alerts with optional filters: severity, alert_type, is_acknowledged.
+    List alerts, newest first, with optional filters: severity, alert_type,
+    is_acknowledged. Keyset-paginated on (created_at, id).
     """
 
     def get(self, request):
+        from .watermarks import alerts_etag
+
+        tag = alerts_etag(sorted(request.query_params.items()))
+        response = _not_modified(request, tag)
+        if response:
+            return response
+
         alerts = Alert.objects.select_related("device", "zone").all()
 
         severity = request.query_params.get("severity")
@@ -152,9 +202,10 @@ class AlertListView(APIView):
         if acknowledged is not None:
             alerts = alerts.filter(is_acknowledged=acknowledged.lower() == "true")
 
-        alerts = alerts[:200]
-        serializer = AlertSerializer(alerts, many=True)
-        return Response(serializer.data)
+        paginator = AlertPagination()
+        page = paginator.paginate_queryset(alerts, request, view=self)
+        serializer = AlertSerializer(page, many=True)
+        return _with_etag(paginator.get_paginated_response(serialized(serializer)), tag)
 
 
 class AlertAcknowledgeView(APIView):
@@ -178,11 +229,10 @@ class AlertAcknowledgeView(APIView):
                 status=status.HTTP_200_OK,
             )
 
-        from django.utils import timezone as tz
+        from .services import acknowledge_alerts
 
-        alert.is_acknowledged = True
-        alert.acknowledged_at = tz.now()
-        alert.save(update_fields=["is_acknowledged", "acknowledged_at"])
+        acknowledge_alerts(Alert.objects.filter(pk=alert.pk))
+        alert.refresh_from_db(fields=["is_acknowledged", "acknowledged_at"])
 
         return Response(
             {
@@ -200,36 +250,54 @@ class FacilityListView(APIView):
     def get(self, request):
         facilities = ParkingFacility.objects.prefetch_related("zones").all()
         serializer = FacilitySerializer(facilities, many=True)
-        return Response(serializer.data)
+        return Response(serialized(serializer))
 
 
 class ZoneListView(APIView):
     """GET /api/zones/ — List zones with optional facility filter."""
 
     def get(self, request):
-        zones = (
-            ParkingZone.objects.select_related("facility")
-            .prefetch_related("slots", "slots__device", "slots__device__parking_logs")
-            .all()
-        )
+        from .services import occupied_counts_by_zone
+        from .watermarks import cached_response
+
+        zones = ParkingZone.objects.select_related("facility").all()
 
         facility_id = request.query_params.get("facility")
         if facility_id:
             zones = zones.filter(facility_id=facility_id)
 
-        serializer = ZoneSerializer(zones, many=True)
-        return Response(serializer.data)
+        def compute():
+            serializer = ZoneSerializer(
+                zones,
+                many=True,
+                context={"occupied_counts": occupied_counts_by_zone()},
+            )
+            return serialized(serializer)
+
+        payload, _ = cached_response("zones", (facility_id,), compute, facility_id=facility_id)
+        return Response(payload)
 
 
 class DeviceListView(APIView):
     """GET /api/devices/ — List devices with optional zone, active, and search filters."""
 
     def get(self, request):
+        from .topology import get_topology
+        from .watermarks import etag
+
+        zone_id = request.query_params.get("zone")
+        facility_id = None
+        if zone_id and zone_id.isdigit():
+            facility_id = get_topology().facility_of_zone(int(zone_id))
+        tag = etag("devices", sorted(request.query_params.items()), facility_id)
+        response = _not_modified(request, tag)
+        if response:
+            return response
+
         devices = Device.objects.select_related(
             "slot", "slot__zone", "slot__zone__facility"
         ).all()
 
-        zone_id = request.query_params.get("zone")
         if zone_id:
             devices = devices.filter(slot__zone_id=zone_id)
 
@@ -242,13 +310,33 @@ class DeviceListView(APIView):
             devices = devices.filter(device_code__icontains=search)
 
         serializer = DeviceSerializer(devices, many=True)
-        return Response(serializer.data)
+        return _with_etag(Response(serialized(serializer)), tag)
+
+
+class SyncView(APIView):
+    """
+    GET /api/sync/?cursor=<cursor>
+    Devices, alerts and slot occupancy changed since `cursor`, with
+    tombstones for deleted rows and the cursor for the next call. Without a
+    cursor (or with one older than the tombstone retention) returns a full
+    snapshot with "reset": true.
+    """
+
+    def get(self, request):
+        from .sync import InvalidCursor, changes_since
+
+        try:
+            payload = changes_since(request.query_params.get("cursor") or None)
+        except InvalidCursor as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(payload)
 
 
 class DashboardSummaryView(APIView):
     """
-    GET /api/dashboard/summary/?date=YYYY-MM-DD
-    Returns an aggregate dashboard overview for a specific date.
+    GET /api/dashboard/summary/?date=YYYY-MM-DD&facility=1
+    Returns an aggregate dashboard overview for a specific date, local to
+    the facility (default: the facility's today).
 
     PRD Requirements:
     - Total parking events
@@ -259,10 +347,13 @@ class DashboardSummaryView(APIView):
     """
 
     def get(self, request):
-        from django.db.models import Avg, Count, Q, Sum
-        import datetime
+        from .services import dashboard_summary
+        from .watermarks import cached_response, etag
 
-        # Parse date parameter (defaults to today)
+        # Optional facility filter
+        facility_id = request.query_params.get("facility")
+
+        # Parse date parameter (defaults to today at the facility)
         date_str = request.query_params.get("date")
         if date_str:
             try:
@@ -273,161 +364,42 @@ class DashboardSummaryView(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
         else:
-            target_date = datetime.date.today()
-
-        # Parse optional facility filter
-        facility_id = request.query_params.get("facility")
-
-        # Base querysets scoped by facility if provided
-        slot_qs = ParkingSlot.objects.filter(is_active=True)
-        device_qs = Device.objects.filter(is_active=True)
-        zone_qs = (
-            ParkingZone.objects.select_related("facility")
-            .prefetch_related("slots", "slots__device", "slots__device__parking_logs")
-            .filter(is_active=True)
+            target_date = local_today(facility_timezone(facility_id))
+
+        params = (str(target_date), facility_id)
+        response = _not_modified(request, etag("summary", params, facility_id))
+        if response:
+            return response
+
+        payload, version = cached_response(
+            "summary",
+            params,
+            lambda: dashboard_summary(target_date, facility_id),
+            facility_id=facility_id,
         )
-        if facility_id:
-            slot_qs = slot_qs.filter(zone__facility_id=facility_id)
-            device_qs = device_qs.filter(slot__zone__facility_id=facility_id)
-            zone_qs = zone_qs.filter(facility_id=facility_id)
-
-        # Global counts
-        total_slots = slot_qs.count()
-        total_devices = device_qs.count()
-        avg_health = device_qs.aggregate(avg=Avg("health_score"))["avg"] or 0
-
-        # ── Total parking events for the date (PRD requirement) ──
-        total_parking_events = ParkingLog.objects.filter(
-            timestamp__date=target_date
-        ).count()
-
-        # ── Alerts triggered on the date (PRD requirement) ──
-        alerts_triggered_on_date = Alert.objects.filter(
-            created_at__date=target_date
-        ).count()
-
-        # Alert counts (open alerts)
-        open_alerts = Alert.objects.filter(is_acknowledged=False)
-        alert_summary = {
-            "total": open_alerts.count(),
-            "critical": open_alerts.filter(severity="CRITICAL").count(),
-            "warning": open_alerts.filter(severity="WARNING").count(),
-            "info": open_alerts.filter(severity="INFO").count(),
-            "triggered_on_date": alerts_triggered_on_date,
-        }
-
-        # ── Efficiency Indicators (PRD requirement) ──
-        # Get targets for the date
-        targets = ParkingTarget.objects.filter(date=target_date).select_related("zone")
-        if facility_id:
-            targets = targets.filter(zone__facility_id=facility_id)
-        total_target_usage = 0
-        total_actual_usage = 0
-
-        for target in targets:
-            actual_usage = ParkingLog.objects.filter(
-                device__slot__zone=target.zone,
-                timestamp__date=target_date,
-                is_occupied=True,
-            ).count()
-            total_target_usage += target.target_occupancy_count
-            total_actual_usage += actual_usage
-
-        overall_efficiency = 0.0
-        if total_target_usage > 0:
-            overall_efficiency = round(
-                (total_actual_usage / total_target_usage) * 100, 1
-            )
-
-        efficiency_summary = {
-            "target_usage": total_target_usage,
-            "actual_usage": total_actual_usage,
-            "efficiency_percentage": overall_efficiency,
-        }
-
-        # Zone breakdown
-        zones = zone_qs
-
-        zone_data = []
-        total_occupied = 0
-        for zone in zones:
-            occupied = 0
-            for slot in zone.slots.filter(is_active=True).select_related("device"):
-                device = getattr(slot, "device", None)
-                if device:
-                    last_log = device.parking_logs.first()
-                    if last_log and last_log.is_occupied:
-                        occupied += 1
-            total_occupied += occupied
-
-            # Get zone-specific efficiency for the date
-            zone_target = targets.filter(zone=zone).first()
-            zone_actual = ParkingLog.objects.filter(
-                device__slot__zone=zone,
-                timestamp__date=target_date,
-                is_occupied=True,
-            ).count()
-            zone_efficiency = 0.0
-            if zone_target and zone_target.target_occupancy_count > 0:
-                zone_efficiency = round(
-                    (zone_actual / zone_target.target_occupancy_count) * 100, 1
-                )
-
-            zone_data.append(
-                {
-                    "id": zone.id,
-                    "name": zone.name,
-                    "zone_type": zone.zone_type,
-                    "facility_name": zone.facility.name,
-                    "total_slots": zone.total_slots,
-                    "occupied": occupied,
-                    "available": zone.total_slots - occupied,
-                    "occupancy_rate": round((occupied / zone.total_slots) * 100, 1)
-                    if zone.total_slots > 0
-                    else 0,
-                    "target_usage": zone_target.target_occupancy_count
-                    if zone_target
-                    else 0,
-                    "actual_usage": zone_actual,
-                    "efficiency_percentage": zone_efficiency,
-                }
-            )
-
-        return Response(
-            {
-                "date": str(target_date),
-                "total_slots": total_slots,
-                "total_occupied": total_occupied,
-                "total_available": total_slots - total_occupied,
-                "occupancy_rate": round((total_occupied / total_slots) * 100, 1)
-                if total_slots > 0
-                else 0,
-                "total_parking_events": total_parking_events,  # PRD requirement
-                "active_devices": total_devices,
-                "avg_health_score": round(avg_health, 1),
-                "alerts": alert_summary,
-                "efficiency": efficiency_summary,  # PRD requirement
-                "zones": zone_data,
-            }
+        return _with_etag(
+            Response(payload), etag("summary", params, facility_id, version=version)
         )
 
 
 class DashboardHourlyView(APIView):
     """
     GET /api/dashboard/hourly/?zone=5&date=2026-02-17
-    Returns hourly parking usage for a given zone and date.
+    Returns hourly parking usage for a given zone and date, in the local
+    hours of the zone's facility.
     """
 
     def get(self, request):
-        from django.db.models.functions import ExtractHour
-        from django.db.models import Count
-        import datetime
+        from .services import dashboard_hourly
+        from .topology import get_topology
+        from .watermarks import cached_response
 
         zone_id = request.query_params.get("zone")
         date_str = request.query_params.get("date")
+        tz = zone_timezone(zone_id)
 
         if not date_str:
-            date_str = str(datetime.date.today())
+            date_str = str(local_today(tz))
 
         try:
             target_date = datetime.date.fromisoformat(date_str)
@@ -437,61 +409,18 @@ class DashboardHourlyView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        logs = ParkingLog.objects.filter(timestamp__date=target_date)
-        if zone_id:
-            logs = logs.filter(device__slot__zone_id=zone_id)
-
-        hourly = (
-            logs.filter(is_occupied=True)
-            .annotate(hour=ExtractHour("timestamp"))
-            .values("hour")
-            .annotate(count=Count("id"))
-            .order_by("hour")
-        )
+        facility_id = None
+        if zone_id and zone_id.isdigit():
+            facility_id = get_topology().facility_of_zone(int(zone_id))
 
-        # --- Last week's hourly data (same day of week, 7 days ago) ---
-        last_week_date = target_date - datetime.timedelta(days=7)
-        last_week_logs = ParkingLog.objects.filter(timestamp__date=last_week_date)
-        if zone_id:
-            last_week_logs = last_week_logs.filter(device__slot__zone_id=zone_id)
-
-        last_week_hourly = (
-            last_week_logs.filter(is_occupied=True)
-            .annotate(hour=ExtractHour("timestamp"))
-            .values("hour")
-            .annotate(count=Count("id"))
-            .order_by("hour")
-        )
-        last_week_map = {item["hour"]: item["count"] for item in last_week_hourly}
-
-        # --- Target per hour (daily target spread evenly across 24 hours) ---
-        target_filters = {"date": target_date}
-        if zone_id:
-            target_filters["zone_id"] = zone_id
-        targets = ParkingTarget.objects.filter(**target_filters)
-        total_target = sum(t.target_occupancy_count for t in targets)
-        target_per_hour = round(total_target / 24, 1) if total_target > 0 else 0
-
-        # Build full 24-hour array
-        hourly_map = {item["hour"]: item["count"] for item in hourly}
-        data = [
-            {
-                "hour": h,
-                "label": f"{h:02d}:00",
-                "occupied_events": hourly_map.get(h, 0),
-                "target": target_per_hour,
-                "last_week": last_week_map.get(h, 0),
-            }
-            for h in range(24)
-        ]
-
-        return Response(
-            {
-                "date": str(target_date),
-                "zone_id": zone_id,
-                "hourly": data,
-            }
+        payload, _ = cached_response(
+            "hourly",
+            (str(target_date), zone_id),
+            lambda: dashboard_hourly(target_date, zone_id),
+            facility_id=facility_id,
+            closed=target_date < local_today(tz),
         )
+        return Response(payload)
 
 
 class TargetListView(APIView):
@@ -501,12 +430,11 @@ class TargetListView(APIView):
     """
 
     def get(self, request):
-        import datetime
 
         date_str = request.query_params.get("date")
 
         if not date_str:
-            date_str = str(datetime.date.today())
+            date_str = str(local_today())
 
         try:
             target_date = datetime.date.fromisoformat(date_str)
@@ -516,6 +444,63 @@ class TargetListView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        from .services import usage_by_zone
+
         targets = ParkingTarget.objects.select_related("zone").filter(date=target_date)
-        serializer = ParkingTargetSerializer(targets, many=True)
-        return Response(serializer.data)
+        serializer = ParkingTargetSerializer(
+            targets,
+            many=True,
+            context={"actual_usage": usage_by_zone([target_date])},
+        )
+        return Response(serialized(serializer))
+
+
+class EventStreamView(View):
+    """
+    GET /api/stream/?facility=1&zone=3
+    Server-Sent Events feed of occupancy changes, new alerts and
+    acknowledgements. `facility` and `zone` may be repeated or
+    comma-separated. Resumes after the `Last-Event-ID` header (or
+    ?last_event_id=). Must be served through config/asgi.py.
+    """
+
+    async def get(self, request):
+        from .stream import event_stream
+
+        try:
+            facility_ids = _id_set(request.GET.getlist("facility"))
+            zone_ids = _id_set(request.GET.getlist("zone"))
+        except ValueError:
+            return JsonResponse(
+                {"error": "facility and zone must be integer ids."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+
+        response = StreamingHttpResponse(
+            event_stream(facility_ids, zone_ids, last_event_id),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # disable nginx response buffering
+        return response
+
+
+class MetricsView(View):
+    """
+    GET /metrics
+    Prometheus text exposition of the ingest, alert and request metrics
+    (see parking/metrics.py). Served outside /api/, where scrapers look;
+    only to METRICS_ALLOWED_NETWORKS or a METRICS_TOKEN bearer.
+    """
+
+    def get(self, request):
+        from .metrics import CONTENT_TYPE, exposition, scrape_allowed
+
+        if not scrape_allowed(request):
+            return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+        return HttpResponse(exposition(), content_type=CONTENT_TYPE)
+
+
+def _id_set(values):
+    return {int(part) for value in values for part in value.split(",") if part.strip()}
@@ -0,0 +1,213 @@
+"""
+Response cache for the polled dashboard and zone endpoints.
+
+Every open dashboard polls the summary, hourly chart and zone list every few
+seconds, but the underlying data only changes when something is ingested.
+Instead of a short TTL, cached responses are tagged with a data version
+("watermark") and stay valid until a write moves it:
+
+    parking:dv:epoch            everything (topology and target edits, rebuilds)
+    parking:dv:live:*           live figures of every facility
+    parking:dv:live:<facility>  live figures of one facility; :all for unscoped views
+    parking:dv:hist:*           closed past dates of every facility
+    parking:dv:hist:<facility>  closed past dates of one facility
+
+Telemetry, parking-log and alert writes call touch() for the facilities
+they affect once their transaction commits. A parking-log event dated
+before today also moves that facility's history version. Responses for
+closed past dates depend only on the history version and are stored
+without expiry. Live responses also expire after RESPONSE_CACHE_TTL_SECONDS
+as a safety net for writes made by other processes when the cache backend
+is per-process (locmem).
+
+When the version moves, the first request to notice takes a short lock and
+recomputes. Concurrent requests keep serving the previous payload until the
+new one is stored, so N open dashboards cost one computation per change.
+
+Everything goes through Django's cache framework (settings.CACHES), so it
+works with the locmem, file, database or Redis backends. Use a shared
+backend when running several processes.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import Alert, Device, ParkingFacility, ParkingSlot, ParkingTarget, ParkingZone
+from .topology import INGEST_FIELDS, get_topology
+
+ALL = 'all'
+LOCK_SECONDS = 10
+_WAIT_INTERVAL = 0.05
+
+
+def _key(*parts):
+    return 'parking:' + ':'.join(str(part) for part in parts)
+
+
+# ── Data versions ─────────────────────────────────────
+
+
+def _versions(keys):
+    """Current values of the version `keys`, seeding any that are missing."""
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            # Seed from the clock so a version evicted from the cache never
+            # comes back at a value an old response was stored under.
+            cache.add(key, time.time_ns(), timeout=None)
+            values[key] = cache.get(key)
+    return tuple(values[key] for key in keys)
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def data_version(facility_id=None, closed=False):
+    """Watermark of the data behind a response scoped to `facility_id` (None = all)."""
+    kind = 'hist' if closed else 'live'
+    return _versions([
+        _key('dv', 'epoch'), _key('dv', kind, '*'), _key('dv', kind, facility_id or ALL),
+    ])
+
+
+def touch(facility_ids=None, dates=(), tz=None):
+    """
+    Record a committed write to the live data of `facility_ids` (None = every
+    facility). Any of `dates` before today (in `tz`, the facilities' time
+    zone) also invalidates those facilities' closed-date responses. Runs
+    when the current transaction commits.
+    """
+    today = timezone.localdate(timezone=tz)
+    history = any(day < today for day in dates)
+
+    def bump():
+        kinds = ('live', 'hist') if history else ('live',)
+        if facility_ids is None:
+            _bump([_key('dv', kind, '*') for kind in kinds])
+        else:
+            scopes = [*{fid for fid in facility_ids if fid is not None}, ALL]
+            _bump([_key('dv', kind, scope) for kind in kinds for scope in scopes])
+
+    transaction.on_commit(bump)
+
+
+def reset():
+    """Invalidate every cached response (topology or target edits, rebuilds)."""
+    transaction.on_commit(lambda: _bump([_key('dv', 'epoch')]))
+
+
+# ── Cached responses ──────────────────────────────────
+
+
+def cached_response(endpoint, params, compute, facility_id=None, closed=False):
+    """
+    (payload, version) of `compute()` for (endpoint, params), recomputed
+    only when the data version of `facility_id` changed. `closed` marks a
+    past date whose payload depends only on history and is cached without
+    expiry. `version` is the data version the payload was computed at —
+    older than the current one while another request is recomputing — or
+    None when the cache is disabled.
+    """
+    ttl = settings.RESPONSE_CACHE_TTL_SECONDS
+    if not ttl:
+        return compute(), None
+
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    key = _key('resp', endpoint, digest)
+    lock = key + ':lock'
+    version = data_version(facility_id, closed)
+
+    entry = cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1], entry[0]
+
+    deadline = time.monotonic() + LOCK_SECONDS
+    while not cache.add(lock, 1, timeout=LOCK_SECONDS):
+        # Another request is recomputing: serve the previous payload, or
+        # wait for the new one if there is none yet.
+        if entry is not None:
+            return entry[1], entry[0]
+        if time.monotonic() >= deadline:
+            return compute(), version
+        time.sleep(_WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1], entry[0]
+
+    try:
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1], entry[0]
+        payload = compute()
+        cache.set(key, (version, payload), timeout=None if closed else ttl)
+    finally:
+        cache.delete(lock)
+    return payload, version
+
+
+# ── ETags ─────────────────────────────────────────────
+
+
+def make_etag(*parts):
+    return 'W/"%s"' % hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def etag(endpoint, params, facility_id=None, closed=False, version=None):
+    """
+    Weak ETag for (endpoint, params) derived from the data version of
+    `facility_id` (or the given `version`), without building the response.
+    Live ETags also roll over every RESPONSE_CACHE_TTL_SECONDS, so a write
+    made by another process is picked up even on a per-process cache.
+    None when the response cache is disabled.
+    """
+    ttl = settings.RESPONSE_CACHE_TTL_SECONDS
+    if not ttl:
+        return None
+    if version is None:
+        version = data_version(facility_id, closed)
+    window = None if closed else int(time.time() // ttl)
+    return make_etag(endpoint, params, version, window)
+
+
+def alerts_etag(params):
+    """
+    Weak ETag for the alert list from the alert table itself: the id range
+    moves on every insert, the row count on every delete and purge (also
+    of rows inside the range), and the open count (read from the partial
+    open-alert index) on every acknowledgement. Device and zone names come
+    in through the topology version.
+    """
+    bounds = Alert.objects.aggregate(first=Min('pk'), last=Max('pk'), total=Count('pk'))
+    open_count = Alert.objects.filter(is_acknowledged=False).count()
+    return make_etag(
+        'alerts', params, bounds['first'], bounds['last'], bounds['total'], open_count,
+        get_topology().version,
+    )
+
+
+# ── Invalidation signals ──────────────────────────────
+
+
+def _structure_changed(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if sender is Device and update_fields and set(update_fields) <= set(INGEST_FIELDS):
+        return
+    reset()
+
+
+def connect_signals():
+    for model in (ParkingFacility, ParkingZone, ParkingSlot, Device, ParkingTarget):
+        uid = f'watermarks_{model.__name__}'
+        post_save.connect(_structure_changed, sender=model, dispatch_uid=uid)
+        post_delete.connect(_structure_changed, sender=model, dispatch_uid=uid)
@@ -6,6 +6,44 @@ export const api = axios.create({
     headers: {
         'Content-Type': 'application/json',
     },
+    // 304 Not Modified is answered from the ETag cache below
+    validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+});
+
+// Conditional polling: remember the last ETag and body per GET URL (with
+// params) and send If-None-Match, so unchanged polls come back as an empty
+// 304 instead of the full JSON body.
+const etagCache = new Map<string, { etag: string; data: unknown }>();
+
+api.interceptors.request.use((config) => {
+    if ((config.method ?? 'get').toLowerCase() === 'get') {
+        const cached = etagCache.get(api.getUri(config));
+        if (cached) {
+            config.headers.set('If-None-Match', cached.etag);
+        }
+    }
+    return config;
+});
+
+api.interceptors.response.use((response) => {
+    if ((response.config.method ?? 'get').toLowerCase() !== 'get') {
+        return response;
+    }
+    const key = api.getUri(response.config);
+    if (response.status === 304) {
+        const cached = etagCache.get(key);
+        if (cached) {
+            return { ...response, status: 200, data: cached.data };
+        }
+        return response;
+    }
+    const etag = response.headers['etag'];
+    if (etag) {
+        etagCache.set(key, { etag, data: response.data });
+    } else {
+        etagCache.delete(key);
+    }
+    return response;
 });
 
 // Response interceptor to handle common errors (optional but recommended)
@@ -6,6 +6,7 @@ export interface Facility {
     id: number;
     name: string;
     address: string;
+    timezone: string;
     is_active: boolean;
 }
 
@@ -95,6 +96,13 @@ export interface ParkingTarget {
     efficiency: number;
 }
 
+// Keyset-paginated list responses (/alerts/, /parking-logs/)
+export interface Page<T> {
+    next: string | null;
+    previous: string | null;
+    results: T[];
+}
+
 // --- API Service Functions ---
 
 export const getFacilities = async () => {
@@ -114,8 +122,8 @@ export const getDevices = async (params: { zone?: number; active?: boolean; sear
 };
 
 export const getAlerts = async (params: { severity?: string; alert_type?: string; acknowledged?: boolean } = {}) => {
-    const response = await api.get<Alert[]>('/alerts/', { params });
-    return response.data;
+    const response = await api.get<Page<Alert>>('/alerts/', { params });
+    return response.data.results;
 };
 
 export const acknowledgeAlert = async (alertId: number) => {